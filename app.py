@@ -1,3 +1,5 @@
+import os
+import time
 import streamlit as st
 import pandas as pd
 from engines import data as data_eng
@@ -5,13 +7,64 @@ from engines import nl as nl_eng
 from engines import filters as filt_eng
 from engines import ui as ui_eng
 from engines import answers as ans_eng
+from engines import shared as shared_eng
+from engines import live as live_eng
+from engines import snapshot as snap_eng
 # siemanko
 
 st.set_page_config(page_title="Asystent Mieszkaniowy", page_icon="🏠", layout="wide")
 
-@st.cache_data(show_spinner=False)
-def load_data_cached(path: str = "mieszkania.csv") -> pd.DataFrame:
-    return data_eng.load_csv(path)
+# ASYSTENT_COMPACT=1: kategorie / węższe typy liczbowe (data.compact_df) – mniej RAM na ofertę
+COMPACT = os.getenv("ASYSTENT_COMPACT", "").lower() in ("1", "true", "tak")
+
+# cache_resource: jedna ramka na proces (bez kopii per rerun), więc indeksy
+# i słowniki budowane raz na ramkę (engines.data.derived) przeżywają kolejne zapytania.
+# Wątek pilnuje pliku i przy zmianie przenosi struktury pochodne na nową ramkę
+# aktualizując je tylko o deltę po id (engines.live). ASYSTENT_WATCH=0 wyłącza.
+WATCH_INTERVAL = float(os.getenv("ASYSTENT_WATCH", "5") or 0)
+
+
+@st.cache_resource(show_spinner=False)
+def live_dataset(path: str = "mieszkania.csv") -> live_eng.LiveDataset:
+    live = live_eng.LiveDataset(path, compact=COMPACT)
+    # indeks opisów budujemy przy wczytaniu; kolejne wersje ramki dostają go deltą
+    data_eng.text_index(live.df)
+    if WATCH_INTERVAL > 0:
+        live.watch(WATCH_INTERVAL)
+    return live
+
+
+# Przy kilku procesach serwera (ASYSTENT_SHM_DIR) ramka jest wspólna: jeden proces
+# ją publikuje, pozostałe mapują ją tylko do odczytu; nowa wersja = nowy klucz cache
+@st.cache_resource(show_spinner=False)
+def shared_store() -> shared_eng.SharedDatasetStore:
+    return shared_eng.SharedDatasetStore()
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def shared_frame(version: str, _df: pd.DataFrame) -> pd.DataFrame:
+    return _df
+
+
+# odcisk CSV (hash treści) liczymy raz na (rozmiar, mtime), nie przy każdym rerunie
+@st.cache_data(show_spinner=False, max_entries=4)
+def source_key(path: str, size: int, mtime_ns: int) -> str:
+    fp = snap_eng.source_fingerprint(path)
+    return f"{fp['hash']}-{'compact' if COMPACT else 'full'}"
+
+
+def current_df(path: str = "mieszkania.csv") -> pd.DataFrame:
+    if not os.getenv(shared_eng.SHARED_DIR_ENV):
+        return live_dataset(path).df
+    stat = os.stat(path)
+    # zmieniony CSV (inny odcisk) → nowa publikacja zamiast starej wersji z /dev/shm
+    version, df = shared_store().attach_or_publish(
+        lambda: data_eng.load_csv(path, compact=COMPACT),
+        source=source_key(path, stat.st_size, stat.st_mtime_ns),
+    )
+    # kluczem jest wersja, którą attach faktycznie zmapował (mogła się zmienić
+    # między odczytem CURRENT a mapowaniem pliku)
+    return shared_frame(version, df)
 
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
@@ -19,7 +72,7 @@ if "chat_history" not in st.session_state:
 st.title("🏠 Asystent Mieszkaniowy")
 st.caption("Naturalne zapytania → dopasowane oferty mieszkań")
 
-df = load_data_cached()
+df = current_df()
 
 # === Sidebar: ustawienia odpowiedzi ===
 with st.sidebar:
@@ -29,6 +82,7 @@ with st.sidebar:
     temperature = st.slider('Kreatywność (temperature)', 0.0, 1.0, 0.3, 0.1)
     show_why = st.checkbox("Pokaż 'dlaczego pasuje?'", value=True)
     allow_llm = st.checkbox('Użyj modelu językowego (jeśli dostępny)', value=True)
+    pipeline = st.checkbox('Pokaż wyniki od razu (odpowiedź LLM dochodzi w tle)', value=True)
 
 # === Główne pole zapytania ===
 user_input = st.text_input(
@@ -43,37 +97,108 @@ if user_input:
     if hasattr(st, "status"):
         with st.status("🧠 Analizuję…", expanded=False) as status:
             status.update(label="Parsuję zapytanie")
-            filters = nl_eng.parse_query(user_input, locations=data_eng.locations(df), cities=data_eng.cities(df))
+            filters = nl_eng.parse_query(user_input, gazetteer=data_eng.gazetteer(df))
 
             status.update(label="Filtruję i rankuję")
             results = filt_eng.filter_and_rank(df, filters)
-
-            status.update(label="Generuję odpowiedź", state="running")
-            summary, src = ans_eng.generate_answer(
-                filters, results, top_k=3, style=style, allow_llm=allow_llm,
-                length=length, temperature=temperature
-            )
             status.update(label="Gotowe ✅", state="complete")
     else:
         with st.spinner('🧠 Analizuję kryteria i dobieram oferty...'):
-            filters = nl_eng.parse_query(user_input, locations=data_eng.locations(df), cities=data_eng.cities(df))
+            filters = nl_eng.parse_query(user_input, gazetteer=data_eng.gazetteer(df))
             results = filt_eng.filter_and_rank(df, filters)
-            summary, src = ans_eng.generate_answer(
+
+    # nazwa dopasowana rozmycie nie zawęża wyników – pytamy, czy o nią chodziło
+    for col in ("miasto", "lokalizacja"):
+        hint = filters.get(f"{col}_fuzzy")
+        if hint:
+            st.info(f"Czy chodziło o „{hint}”? Oferty stamtąd są wyżej na liście – "
+                    "wpisz nazwę dokładnie, żeby zawęzić wyniki.")
+
+    version = data_eng.dataset_version(df)
+    if pipeline:
+        # Tryb potokowy: podsumowanie fallback i karty od razu, LLM liczy się w tle,
+        # a jego tekst podmienia podsumowanie w tym samym miejscu
+        fallback_text, stream = ans_eng.speculative_answer(
+            filters, results, top_k=3, style=style, allow_llm=allow_llm,
+            length=length, temperature=temperature, dataset_version=version
+        )
+        answer_box = st.empty()
+        answer_box.markdown(fallback_text)
+        ui_eng.render_debug(filters)
+        ui_eng.render_results(results, filters, show_why=show_why)
+
+        shown, last_draw = "", 0.0
+        for delta in stream.iter_sync():
+            shown += delta
+            if time.perf_counter() - last_draw > 0.05:  # nie przerysowujemy przy każdym tokenie
+                answer_box.markdown(shown)
+                last_draw = time.perf_counter()
+        summary, src = stream.text, stream.source
+        answer_box.markdown(summary)
+        st.session_state.chat_history.append(("Bot", summary))
+    else:
+        # Odpowiedź: strumieniowo (tokeny od razu na ekranie), bez write_stream – w całości
+        if hasattr(st, "write_stream"):
+            stream = ans_eng.generate_answer_stream(
                 filters, results, top_k=3, style=style, allow_llm=allow_llm,
-                length=length, temperature=temperature
+                length=length, temperature=temperature, dataset_version=version
             )
+            answer_box = st.empty()
+            with answer_box.container():
+                st.write_stream(stream.iter_sync())
+            summary, src = stream.text, stream.source
+            if stream.metrics.get("error") and src == "fallback":
+                # strumień urwał się w połowie – podmieniamy fragment na podsumowanie fallback
+                answer_box.markdown(summary)
+        else:
+            with st.spinner("Generuję odpowiedź…"):
+                summary, src = ans_eng.generate_answer(
+                    filters, results, top_k=3, style=style, allow_llm=allow_llm,
+                    length=length, temperature=temperature, dataset_version=version
+                )
+            st.markdown(summary)
+            stream = None
+
+        # zapis do historii i render
+        st.session_state.chat_history.append(("Bot", summary))
+        ui_eng.render_debug(filters)
+        ui_eng.render_results(results, filters, show_why=show_why)
 
-    # zapis do historii i render
-    st.session_state.chat_history.append(("Bot", summary))
-    st.markdown(summary)
-    ui_eng.render_debug(filters)
-    ui_eng.render_results(results, filters, show_why=show_why)
+    if stream is not None and src == "llm" and stream.metrics.get("ttft_ms") is not None:
+        st.caption(f"Pierwszy token po {stream.metrics['ttft_ms']:.0f} ms • całość {stream.metrics['total_ms']:.0f} ms")
+    # po renderze, żeby panel zawierał też czas kart tego zapytania
+    ui_eng.render_metrics()
 
 # === Sidebar: historia ===
 with st.sidebar:
     st.markdown("### 🧠 Historia rozmowy")
     for who, msg in st.session_state.chat_history[-10:]:
         st.markdown(f"**{who}:** {msg}")
-    st.caption("Źródło odpowiedzi: " + ("LLM" if 'src' in locals() and src=='llm' else "fallback"))
+    src_label = {"llm": "LLM", "llm-cache": "LLM (cache)"}.get(locals().get("src"), "fallback")
+    st.caption("Źródło odpowiedzi: " + src_label)
+    llm = ans_eng.llm_status()
+    if llm["state"] != "off":
+        breaker_label = {"closed": "OK", "half-open": "próba", "open": "otwarty → fallback"}[llm["state"]]
+        retry = f" (ponowna próba za {llm['retry_in']:.0f} s)" if llm["state"] == "open" else ""
+        st.caption(f"LLM: {llm['provider']}/{llm['model']} • bezpiecznik: {breaker_label}{retry}")
+    cache_stats = ans_eng.cache_stats()
+    if cache_stats.get("misses") or cache_stats.get("memory_hits") or cache_stats.get("disk_hits"):
+        st.caption(
+            f"Cache odpowiedzi: trafienia {cache_stats['hit_rate']:.0%} "
+            f"(pamięć {cache_stats['memory_hits']}, dysk {cache_stats['disk_hits']}, chybienia {cache_stats['misses']})"
+        )
+    ingest = data_eng.ingest_report()
+    if ingest:
+        st.caption(
+            f"Dane: {ingest['rows']} ofert • parser {ingest['parser']} • {ingest['seconds'] * 1000:.0f} ms"
+        )
+    refresh = live_dataset().last_refresh if not os.getenv(shared_eng.SHARED_DIR_ENV) else {}
+    if refresh.get("error"):
+        st.caption(f"Odświeżanie danych: błąd ({refresh['error']})")
+    elif refresh and not refresh.get("full"):
+        st.caption(
+            f"Odświeżono: +{refresh['added']} / ~{refresh['changed']} / -{refresh['removed']} ofert"
+            f" • {refresh['seconds'] * 1000:.0f} ms"
+        )
     st.divider()
     st.caption("Tip: *od/do, m², pokoje, piętro, balkon, winda, najtańsze/największe*")
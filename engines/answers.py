@@ -1,53 +1,210 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Dict, Any, Optional, Tuple
+import queue
+import threading
+import time
+from typing import AsyncIterator, Dict, Any, Iterator, Optional, Tuple
 import pandas as pd
 
-from .utils import pretty_pln, pretty_m2
+from .utils import pretty_pln, pretty_m2, is_missing
+from .llm_cache import AnswerCache, CACHE_ENV, cache_key
+from . import llm_pool, metrics
 
 # -----------------------------
 # Opcjonalny backend LLM
 # -----------------------------
+_SYSTEM_PROMPT = "Jesteś asystentem nieruchomości. Odpowiadasz krótko, konkretnie, po polsku."
+
+
+_DEFAULT_MODELS = {"openai": "gpt-4o-mini", "ollama": "llama3", "http": "default", "stub": "stub"}
+
+
+def _messages(prompt: str):
+    return [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _llm_config() -> Tuple[str, str]:
+    """(provider, model) z LLM_PROVIDER / LLM_MODEL."""
+    provider = os.getenv("LLM_PROVIDER", "").lower()
+    return provider, os.getenv("LLM_MODEL", _DEFAULT_MODELS.get(provider, ""))
+
+
+def _stub_delay() -> float:
+    return float(os.getenv("LLM_STUB_DELAY", "0") or 0)
+
+
+def _stub_answer(prompt: str) -> str:
+    """
+    Lokalny provider "stub" (LLM_PROVIDER=stub) do testów i pomiarów bez sieci:
+    deterministycznie streszcza kandydatów z promptu. LLM_STUB_DELAY = czas generowania (s).
+    """
+    cands = [l for l in prompt.splitlines() if l.startswith("- ")]
+    head = "Oto najlepiej dopasowane oferty:" if cands else "Brak ofert dla tych kryteriów."
+    return "\n".join([head] + cands[:3] + ["Wskazówka: doprecyzuj liczbę pokoi lub piętro."])
+
+
+def _llm_ready(provider: str) -> bool:
+    if provider == "openai":
+        # bez klucza tylko wobec własnego serwera (LLM_BASE_URL)
+        return bool(os.getenv("LLM_API_KEY") or llm_pool.base_url())
+    if provider == "http":
+        return bool(llm_pool.base_url())
+    return provider in ("ollama", "stub")
+
+
+def _complete(provider: str, model: str, prompt: str, temperature: float) -> Optional[str]:
+    if provider == "stub":
+        time.sleep(_stub_delay())
+        return _stub_answer(prompt)
+    client = llm_pool.get_client(provider)
+    if provider == "openai":
+        completion = client.chat.completions.create(
+            model=model,
+            messages=_messages(prompt),
+            temperature=temperature,
+        )
+        return completion.choices[0].message.content
+    if provider == "ollama":
+        r = client.chat(
+            model=model,
+            messages=_messages(prompt),
+            # jeśli Twoja wersja klienta wspiera temperature:
+            # options={"temperature": temperature}
+        )
+        return (r.get("message", {}) or {}).get("content", "")
+    return client.complete(model, _messages(prompt), temperature)
+
+
 def _try_llm(prompt: str, temperature: float = 0.3) -> Optional[str]:
     """
     Próbujemy użyć modelu językowego *jeśli* użytkownik skonfigurował środowisko.
-    Obsługiwani providerzy: openai, ollama.
+    Obsługiwani providerzy: openai, ollama, http (OpenAI-compatible pod LLM_BASE_URL), stub.
+    Klient pochodzi z puli (llm_pool); przy otwartym bezpieczniku od razu None → fallback.
     """
-    provider = os.getenv("LLM_PROVIDER", "").lower()
-    api_key = os.getenv("LLM_API_KEY", "")
+    provider, model = _llm_config()
+    if not _llm_ready(provider):
+        return None
+    br = llm_pool.breaker(provider, model)
+    if not br.allow():
+        return None
+    t0 = time.perf_counter()
     try:
-        if provider == "openai":
-            from openai import OpenAI
-            if not api_key:
-                return None
-            client = OpenAI(api_key=api_key)
-            model = os.getenv("LLM_MODEL", "gpt-4o-mini")
-            completion = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "Jesteś asystentem nieruchomości. Odpowiadasz krótko, konkretnie, po polsku."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=temperature,
-            )
-            return completion.choices[0].message.content.strip()
-        elif provider == "ollama":
-            import ollama
-            model = os.getenv("LLM_MODEL", "llama3")
-            r = ollama.chat(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "Jesteś asystentem nieruchomości. Odpowiadasz krótko, konkretnie, po polsku."},
-                    {"role": "user", "content": prompt},
-                ],
-                # jeśli Twoja wersja klienta wspiera temperature:
-                # options={"temperature": temperature}
-            )
-            return (r.get("message", {}) or {}).get("content", "").strip() or None
-    except Exception:
+        # deadline na całe wywołanie dla każdego providera; przekroczenie = porażka bezpiecznika
+        out = (llm_pool.call_with_deadline(_complete, provider, model, prompt, temperature) or "").strip()
+    except Exception as e:
+        br.record(False, error=f"{type(e).__name__}: {e}")
         return None
-    return None
+    dt = time.perf_counter() - t0
+    br.record(True, dt)
+    metrics.observe("llm", dt)
+    return out or None
+
+
+async def _aiter_blocking(make_iter) -> AsyncIterator[str]:
+    """Blokujący iterator (np. HttpChatClient.stream) w wątku puli, oddawany asynchronicznie."""
+    loop = asyncio.get_running_loop()
+    it = await loop.run_in_executor(None, lambda: iter(make_iter()))
+    done = object()
+    while True:
+        item = await loop.run_in_executor(None, next, it, done)
+        if item is done:
+            return
+        yield item
+
+
+async def _astream_provider(provider: str, model: str, prompt: str, temperature: float) -> AsyncIterator[str]:
+    if provider == "stub":
+        delay = _stub_delay()
+        words = _stub_answer(prompt).split(" ")
+        for i, w in enumerate(words):
+            if delay:
+                await asyncio.sleep(delay / len(words))
+            yield w if i == len(words) - 1 else w + " "
+    elif provider == "openai":
+        client = llm_pool.get_client(provider, "async")
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=_messages(prompt),
+            temperature=temperature,
+            stream=True,
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    elif provider == "ollama":
+        client = llm_pool.get_client(provider, "async")
+        stream = await client.chat(
+            model=model,
+            messages=_messages(prompt),
+            stream=True,
+        )
+        async for part in stream:
+            delta = (part.get("message", {}) or {}).get("content", "")
+            if delta:
+                yield delta
+    elif provider == "http":
+        client = llm_pool.get_client(provider)
+        async for delta in _aiter_blocking(lambda: client.stream(model, _messages(prompt), temperature)):
+            yield delta
+
+
+async def _astream_llm(prompt: str, temperature: float = 0.3) -> AsyncIterator[str]:
+    """
+    Strumieniowa wersja _try_llm: oddaje kolejne fragmenty tekstu w miarę generowania.
+    Bez skonfigurowanego providera albo przy otwartym bezpieczniku nic nie oddaje;
+    błędy klienta (także przekroczony deadline LLM_TIMEOUT) propagują do wołającego.
+    O „wolnym wywołaniu” dla bezpiecznika decyduje czas do pierwszego fragmentu.
+    """
+    provider, model = _llm_config()
+    if not _llm_ready(provider):
+        return
+    br = llm_pool.breaker(provider, model)
+    if not br.allow():
+        return
+    t0 = time.perf_counter()
+    deadline = t0 + llm_pool.call_timeout()
+    ttft = None
+    agen = _astream_provider(provider, model, prompt, temperature)
+    try:
+        while True:
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                raise asyncio.TimeoutError(f"deadline {llm_pool.call_timeout():.0f} s")
+            try:
+                delta = await asyncio.wait_for(agen.__anext__(), timeout=left)
+            except StopAsyncIteration:
+                break
+            if ttft is None:
+                ttft = time.perf_counter() - t0
+            yield delta
+    except GeneratorExit:
+        # konsument przerwał odbiór – liczy się to, co zdążyło przyjść
+        br.record(ttft is not None, ttft or 0.0)
+        raise
+    except Exception as e:
+        br.record(False, error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        try:
+            await agen.aclose()
+        except Exception:
+            pass
+    br.record(ttft is not None, ttft or 0.0, None if ttft is not None else "pusta odpowiedź")
+
+
+def llm_status() -> Dict[str, Any]:
+    """Provider/model i stan bezpiecznika – do podpisu w UI."""
+    provider, model = _llm_config()
+    if not _llm_ready(provider):
+        return {"provider": provider or None, "model": model or None, "state": "off"}
+    return dict(llm_pool.breaker(provider, model).status(), provider=provider, model=model)
+
 
 # -----------------------------
 # Fallbackowy summarizer (bez LLM)
@@ -61,17 +218,17 @@ def _fmt_row_short(r: pd.Series | Dict[str, Any]) -> str:
         parts.append(str(d["lokalizacja"]))
     head = " • ".join(parts) if parts else f"ID {d.get('id','-')}"
     cena = pretty_pln(d.get("cena"))
-    metraz = pretty_pln(d.get("metraz")).replace(" zł", " m²") if d.get("metraz") is not None else "-"
-    pokoje = f"{int(d['pokoje'])} pokoje" if d.get("pokoje") is not None else ""
-    pietro = f"piętro {int(d['pietro'])}" if d.get("pietro") is not None else ""
+    metraz = pretty_pln(d.get("metraz")).replace(" zł", " m²") if not is_missing(d.get("metraz")) else "-"
+    pokoje = f"{int(d['pokoje'])} pokoje" if not is_missing(d.get("pokoje")) else ""
+    pietro = f"piętro {int(d['pietro'])}" if not is_missing(d.get("pietro")) else ""
     extras_core = ", ".join([p for p in [pokoje, pietro] if p])
     bools = []
-    if d.get("balkon") is not None:
+    if not is_missing(d.get("balkon")):
         bools.append("balkon" if d["balkon"] else "bez balkonu")
-    if d.get("winda") is not None:
+    if not is_missing(d.get("winda")):
         bools.append("winda" if d["winda"] else "bez windy")
     extras = (extras_core + (", " if extras_core and bools else "") + ", ".join(bools)).strip(", ").strip()
-    cm2 = f" • {pretty_pln(d.get('cena_m2'))}/m²" if d.get("cena_m2") is not None else ""
+    cm2 = f" • {pretty_pln(d.get('cena_m2'))}/m²" if not is_missing(d.get("cena_m2")) else ""
     return f"- **{head}** — {metraz}, {cena}{cm2}" + (f" ({extras})" if extras else "")
 
 def _human_range(rng, unit: str) -> str:
@@ -148,13 +305,43 @@ def _build_prompt(filters: Dict[str, Any], df: pd.DataFrame, top_k: int, style:
     }.get(style, "krótko i konkretnie")
     max_words = {"krótka": 80, "średnia": 140, "dłuższa": 220}.get(length, 120)
     parts = [f"Odpowiedz po polsku (maks ~{max_words} słów), styl: {tone}."]
-    parts.append("Kryteria: " + str({k: v for k, v in filters.items() if v is not None}))
+    # opis_terms to wewnętrzny sygnał rankingu, nie kryterium użytkownika
+    parts.append("Kryteria: " + str({k: v for k, v in filters.items() if v is not None and k != "opis_terms"}))
     rows = df.head(top_k).to_dict(orient="records")
     lines = [_fmt_row_short(r) for r in rows]
     parts.append("Kandydaci:\n" + "\n".join(lines))
     parts.append("W treści zawrzyj: 1) jednozdaniowy nagłówek dopasowany do kryteriów; 2) listę 2–3 najlepszych; 3) 1 wskazówkę co doprecyzować.")
     return "\n".join(parts)
 
+_CACHE: Optional[AnswerCache] = None
+
+
+def answer_cache() -> Optional[AnswerCache]:
+    """Wspólny cache odpowiedzi LLM (None, gdy LLM_CACHE=0). TTL/rozmiar z LLM_CACHE_TTL / LLM_CACHE_MAX_ROWS."""
+    global _CACHE
+    if os.getenv(CACHE_ENV, "1") == "0":
+        return None
+    if _CACHE is None:
+        _CACHE = AnswerCache(
+            ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+            max_rows=int(os.getenv("LLM_CACHE_MAX_ROWS", "5000")),
+        )
+    return _CACHE
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Liczniki cache odpowiedzi (trafienia pamięć/dysk, chybienia, hit_rate)."""
+    cache = answer_cache()
+    return cache.stats() if cache is not None else {}
+
+
+def _answer_key(prompt: str, temperature: float, dataset_version: Optional[str]) -> Optional[str]:
+    provider, model = _llm_config()
+    if not provider:
+        return None
+    return cache_key(prompt, provider, model, temperature, dataset_version)
+
+
 def generate_answer(
     filters: Dict[str, Any],
     df: pd.DataFrame,
@@ -163,13 +350,198 @@ def generate_answer(
     allow_llm: bool = True,
     length: str = "krótka",
     temperature: float = 0.3,
+    dataset_version: Optional[str] = None,
 ) -> Tuple[str, str]:
     """
-    Zwraca (tekst_odpowiedzi, źródło): źródło to 'llm' lub 'fallback'.
+    Zwraca (tekst_odpowiedzi, źródło): źródło to 'llm', 'llm-cache' lub 'fallback'.
+    `dataset_version` (data.dataset_version) wchodzi do klucza cache odpowiedzi.
     """
     prompt = _build_prompt(filters, df, top_k, style, length)
-    llm_out = _try_llm(prompt, temperature=temperature) if allow_llm else None
-    if llm_out:
-        return llm_out, "llm"
+    if allow_llm:
+        cache = answer_cache()
+        key = _answer_key(prompt, temperature, dataset_version) if cache is not None else None
+        cached = cache.get(key) if key else None
+        if cached:
+            return cached, "llm-cache"
+        llm_out = _try_llm(prompt, temperature=temperature)
+        if llm_out:
+            if key:
+                cache.put(key, llm_out)
+            return llm_out, "llm"
     return summarize_results(filters, df, top_k=top_k), "fallback"
 
+
+
+# -----------------------------
+# Strumieniowanie odpowiedzi
+# -----------------------------
+_LAST_STREAM: Dict[str, Any] = {}
+
+
+def stream_report() -> Dict[str, Any]:
+    """Metryki ostatniej strumieniowanej odpowiedzi (ttft_ms, total_ms, chunks, source, error)."""
+    return dict(_LAST_STREAM)
+
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_DONE = object()
+_LOOP_LOCK = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Jedna pętla asyncio na proces (wątek tła). Asynchroniczni klienci z llm_pool są
+    związani z pętlą, więc wszystkie strumienie idą przez tę samą – pula działa między zapytaniami.
+    """
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="asystent-llm-loop", daemon=True).start()
+        return _LOOP
+
+
+class AnswerStream:
+    """
+    Odpowiedź generowana strumieniowo. Iteracja (async: `async for`, sync: `iter_sync()`)
+    oddaje fragmenty tekstu od razu po nadejściu. Gdy LLM nie odda nic, oddawane jest
+    podsumowanie fallback. Gdy strumień urwie się w połowie, iteracja się kończy,
+    a `text`/`source` wskazują fallback – wołający podmienia wtedy wyrenderowany fragment.
+    """
+
+    def __init__(self, filters: Dict[str, Any], df: pd.DataFrame, top_k: int = 3,
+                 style: str = "zwięzły", allow_llm: bool = True, length: str = "krótka",
+                 temperature: float = 0.3, dataset_version: Optional[str] = None):
+        self.filters, self.df, self.top_k = filters, df, top_k
+        self.allow_llm = allow_llm
+        self.temperature = temperature
+        self.prompt = _build_prompt(filters, df, top_k, style, length)
+        self.dataset_version = dataset_version
+        self.text = ""
+        self.source = "llm"
+        self.metrics: Dict[str, Any] = {}
+        self._queue: Optional[queue.Queue] = None
+        self._fallback_text: Optional[str] = None
+
+    def fallback(self) -> str:
+        """Deterministyczne podsumowanie (summarize_results) – liczone raz."""
+        if self._fallback_text is None:
+            self._fallback_text = summarize_results(self.filters, self.df, top_k=self.top_k)
+        return self._fallback_text
+
+    def _finish(self, t0: float, ttft: Optional[float], chunks: int, error: Optional[str]) -> None:
+        self.metrics = {
+            "ttft_ms": None if ttft is None else ttft * 1000,
+            "total_ms": (time.perf_counter() - t0) * 1000,
+            "chunks": chunks,
+            "source": self.source,
+            "error": error,
+        }
+        _LAST_STREAM.clear()
+        _LAST_STREAM.update(self.metrics)
+        if self.source == "llm":
+            if ttft is not None:
+                metrics.observe("llm_ttft", ttft)
+            metrics.observe("llm", self.metrics["total_ms"] / 1000)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        t0 = time.perf_counter()
+        ttft, chunks, parts, error = None, 0, [], None
+        cache = answer_cache() if self.allow_llm else None
+        key = _answer_key(self.prompt, self.temperature, self.dataset_version) if cache is not None else None
+        cached = cache.get(key) if key else None
+        if cached:
+            self.text, self.source = cached, "llm-cache"
+            yield cached
+            self._finish(t0, time.perf_counter() - t0, 1, None)
+            return
+        try:
+            if self.allow_llm:
+                async for delta in _astream_llm(self.prompt, self.temperature):
+                    if ttft is None:
+                        ttft = time.perf_counter() - t0
+                    chunks += 1
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        text = "".join(parts).strip()
+        if text and error is None:
+            self.text = text
+            if key:
+                cache.put(key, text)
+        else:
+            self.source = "fallback"
+            self.text = self.fallback()
+            if not parts:
+                # nic jeszcze nie pokazano – fallback idzie tym samym strumieniem
+                if ttft is None:
+                    ttft = time.perf_counter() - t0
+                yield self.text
+        self._finish(t0, ttft, chunks, error)
+
+    def start(self) -> "AnswerStream":
+        """
+        Uruchamia generowanie od razu na wspólnej pętli asyncio w wątku tła; fragmenty
+        czekają w kolejce na iter_sync. Pozwala renderować resztę strony w międzyczasie.
+        """
+        if self._queue is None:
+            q = self._queue = queue.Queue()
+
+            async def pump():
+                try:
+                    async for delta in self:
+                        q.put(delta)
+                finally:
+                    q.put(_DONE)
+
+            asyncio.run_coroutine_threadsafe(pump(), _background_loop())
+        return self
+
+    def iter_sync(self) -> Iterator[str]:
+        """
+        Synchroniczny iterator (np. dla st.write_stream): fragmenty przechodzą z wątku
+        tła przez kolejkę, więc pierwszy token jest widoczny od razu.
+        """
+        self.start()
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            yield item
+
+
+def generate_answer_stream(
+    filters: Dict[str, Any],
+    df: pd.DataFrame,
+    top_k: int = 3,
+    style: str = "zwięzły",
+    allow_llm: bool = True,
+    length: str = "krótka",
+    temperature: float = 0.3,
+    dataset_version: Optional[str] = None,
+) -> AnswerStream:
+    """Strumieniowy odpowiednik generate_answer; po iteracji `text`/`source` jak w generate_answer."""
+    return AnswerStream(filters, df, top_k=top_k, style=style, allow_llm=allow_llm,
+                        length=length, temperature=temperature, dataset_version=dataset_version)
+
+
+def speculative_answer(
+    filters: Dict[str, Any],
+    df: pd.DataFrame,
+    top_k: int = 3,
+    style: str = "zwięzły",
+    allow_llm: bool = True,
+    length: str = "krótka",
+    temperature: float = 0.3,
+    dataset_version: Optional[str] = None,
+) -> Tuple[str, AnswerStream]:
+    """
+    Tryb potokowy: (podsumowanie fallback do pokazania od razu, strumień LLM już
+    uruchomiony w tle). Wołający renderuje fallback i wyniki, a potem podmienia
+    podsumowanie tekstem ze strumienia (iter_sync / text, source).
+    """
+    stream = generate_answer_stream(filters, df, top_k=top_k, style=style, allow_llm=allow_llm,
+                                    length=length, temperature=temperature,
+                                    dataset_version=dataset_version)
+    return stream.fallback(), stream.start()
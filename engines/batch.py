@@ -0,0 +1,191 @@
+"""
+Wsadowe wyszukiwanie bez UI: parse_query → filter_and_rank (→ generate_answer).
+
+Wejście to JSONL z zapytaniami ({"query": "...", "id": ..., "top_k": ...} albo sam napis
+w linii), wyjście to JSONL z filtrami, top-k id, wynikami i czasami etapów – w kolejności
+wejścia, zapisywane na bieżąco. Zapytania idą do puli procesów; zbiór jest wczytany raz
+i opublikowany jako plik Arrow w prywatnym katalogu w pamięci (engines.shared), a procesy
+tylko go mapują.
+
+    python -m engines.batch zapytania.jsonl -o wyniki.jsonl --workers 8 --top-k 10
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import data, snapshot
+from .answers import generate_answer
+from .filters import filter_and_rank
+from .nl import parse_query
+from .shared import SharedDatasetStore
+
+DEFAULT_TOP_K = 10
+
+# Stan procesu roboczego (ustawiany przez _init_worker)
+_WORKER: Dict[str, Any] = {}
+
+
+def jsonable(v):
+    """Typy numpy/pandas (np.int64, NaN, pd.NA) → wartości zapisywalne w JSON."""
+    if isinstance(v, (tuple, list)):
+        return [jsonable(x) for x in v]
+    if isinstance(v, dict):
+        return {k: jsonable(x) for k, x in v.items()}
+    if isinstance(v, np.generic):
+        return v.item()
+    if v is pd.NA or (isinstance(v, float) and v != v):
+        return None
+    return v
+
+
+def parse_line(line: str, n: int) -> Optional[Dict[str, Any]]:
+    """
+    Linia JSONL → {"id", "query", ...}; puste linie pomijamy. Linia, która nie jest
+    obiektem ani napisem JSON (także poprawny JSON: 42, [...], null), to tekst zapytania.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError:
+        item = line
+    if not isinstance(item, dict):
+        item = {"query": item if isinstance(item, str) else line}
+    item.setdefault("id", n)
+    return item
+
+
+def search(item: Dict[str, Any], df: pd.DataFrame, top_k: int = DEFAULT_TOP_K,
+           answer: bool = False) -> Dict[str, Any]:
+    """Jedno zapytanie przez cały potok; czasy etapów w ms."""
+    timings: Dict[str, float] = {}
+    out: Dict[str, Any] = {"id": item.get("id"), "query": item.get("query", "")}
+    try:
+        t = time.perf_counter()
+        f = parse_query(out["query"], gazetteer=data.gazetteer(df))
+        f["limit"] = int(item.get("top_k") or top_k)
+        timings["parse"] = (time.perf_counter() - t) * 1000
+
+        t = time.perf_counter()
+        res = filter_and_rank(df, f)
+        timings["filter_rank"] = (time.perf_counter() - t) * 1000
+
+        out["filters"] = jsonable(f)
+        out["ids"] = jsonable(res["id"].tolist()) if "id" in res.columns else []
+        out["scores"] = jsonable(res["score"].round(4).tolist()) if "score" in res.columns else []
+        if answer:
+            t = time.perf_counter()
+            out["answer"], out["source"] = generate_answer(
+                f, res, dataset_version=data.dataset_version(df)
+            )
+            timings["answer"] = (time.perf_counter() - t) * 1000
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+    out["timings_ms"] = {k: round(v, 3) for k, v in timings.items()}
+    return out
+
+
+def _init_worker(root: Optional[str], version: Optional[str], path: str, compact: bool,
+                 top_k: int, answer: bool) -> None:
+    if root and version:
+        df = SharedDatasetStore(root).attach(version)
+    else:
+        df = data.load_csv(path, compact=compact)
+    # struktury pochodne budujemy przy starcie, nie przy pierwszym zapytaniu
+    data.gazetteer(df)
+    data.text_index(df)
+    _WORKER.update(df=df, top_k=top_k, answer=answer)
+
+
+def _run(item: Dict[str, Any]) -> Dict[str, Any]:
+    return search(item, _WORKER["df"], _WORKER["top_k"], _WORKER["answer"])
+
+
+def run_batch(
+    items: Iterable[Dict[str, Any]],
+    path: str = "mieszkania.csv",
+    workers: Optional[int] = None,
+    top_k: int = DEFAULT_TOP_K,
+    answer: bool = False,
+    compact: bool = False,
+    chunksize: int = 16,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Wyniki dla kolejnych zapytań (w kolejności wejścia), oddawane na bieżąco.
+    workers=1 liczy w bieżącym procesie; więcej – w puli procesów dzielących zbiór.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        df = data.load_csv(path, compact=compact)
+        for item in items:
+            yield search(item, df, top_k, answer)
+        return
+
+    root, version = None, None
+    if snapshot.enabled():
+        # zawsze własny katalog: wspólny (ASYSTENT_SHM_DIR) może trzymać zbiór z innego pliku
+        base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        root = tempfile.mkdtemp(prefix="asystent-batch-", dir=base)
+        version = SharedDatasetStore(root).publish(data.load_csv(path, compact=compact))
+    try:
+        with mp.get_context().Pool(
+            workers, initializer=_init_worker,
+            initargs=(root, version, path, compact, top_k, answer),
+        ) as pool:
+            yield from pool.imap(_run, items, chunksize=chunksize)
+    finally:
+        if root:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def _read_items(fh) -> Iterator[Dict[str, Any]]:
+    for n, line in enumerate(fh):
+        item = parse_line(line, n)
+        if item is not None:
+            yield item
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Wsadowe wyszukiwanie ofert (JSONL → JSONL)")
+    ap.add_argument("input", help="plik JSONL z zapytaniami ('-' = stdin)")
+    ap.add_argument("-o", "--output", default="-", help="plik wynikowy JSONL ('-' = stdout)")
+    ap.add_argument("--data", default="mieszkania.csv", help="plik z ofertami")
+    ap.add_argument("--workers", type=int, default=None, help="liczba procesów (domyślnie liczba rdzeni)")
+    ap.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    ap.add_argument("--chunksize", type=int, default=16)
+    ap.add_argument("--answer", action="store_true", help="generuj też odpowiedź (LLM/fallback)")
+    ap.add_argument("--compact", action="store_true", help="kompaktowy układ typów (data.compact_df)")
+    args = ap.parse_args(argv)
+
+    fin = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    fout = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    t0 = time.perf_counter()
+    n = errors = 0
+    try:
+        for res in run_batch(_read_items(fin), args.data, args.workers, args.top_k,
+                             args.answer, args.compact, args.chunksize):
+            fout.write(json.dumps(res, ensure_ascii=False) + "\n")
+            n += 1
+            errors += "error" in res
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+    dt = time.perf_counter() - t0
+    print(f"{n} zapytań w {dt:.2f} s ({n / dt if dt else 0:.0f}/s), błędy: {errors}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
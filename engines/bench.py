@@ -0,0 +1,324 @@
+"""
+Proste benchmarki silników (uruchamiane ręcznie):
+
+    python -m engines.bench topk --rows 200000 --limit 50
+    python -m engines.bench memory --sizes 20000 80000 320000
+    python -m engines.bench parse --repeat 200
+    python -m engines.bench stages --sizes 10k 100k 1m --json wyniki.json --compare poprzednie.json
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import data
+from .answers import summarize_results
+from .data import compact_df, memory_report, normalize_df
+from .filters import add_scores, filter_and_rank, filter_df, sort_results
+from .gazetteer import Gazetteer
+from .index import get_index
+from .nl import parse_cache_clear, parse_cache_info, parse_query
+from .synthetic import generate_listings, parse_size
+
+SAMPLE_QUERIES = [
+    "Poznań, Jeżyce, 60–80 m², do 800k, z balkonem, do 3 piętra",
+    "2 pokoje od 2000 do 3000 zł",
+    "Wilda dla rodziny, winda",
+    "najtańsze mieszkanie dla studenta do 1,2 tys",
+    "Kraków 3-4 pokoje piętro do 2",
+    "kawalerka 25 m2 bez balkonu",
+    "największe na Łazarzu",
+]
+
+
+def _best_of(fn: Callable[[], Any], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _random_scored(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    cena = rng.integers(800, 12_000, rows).astype(float)
+    cena[rng.random(rows) < 0.02] = np.nan
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, rows + 1),
+            "cena": cena,
+            "metraz": rng.uniform(15, 150, rows).round(1),
+            "score": rng.choice(np.arange(0, 9.5, 0.5), rows),
+        }
+    )
+
+
+def _random_listings(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    raw = pd.DataFrame(
+        {
+            "ID": np.arange(1, rows + 1),
+            "Miasto": rng.choice(["Poznań", "Kraków", "Wrocław", "Gdańsk", "Łódź"], rows),
+            "Lokalizacja": rng.choice(["Jeżyce", "Wilda", "Rataje", "Grunwald", "Łazarz"], rows),
+            "Metraż": rng.uniform(15, 150, rows).round(1),
+            "Pokoje": rng.integers(1, 6, rows),
+            "Balkon": rng.choice(["tak", "nie"], rows),
+            "Cena": rng.integers(800, 12_000, rows),
+            "Piętro": rng.integers(0, 11, rows),
+            "Winda": rng.choice(["tak", "nie"], rows),
+        }
+    )
+    return normalize_df(raw)
+
+
+def bench_memory(sizes=(20_000, 80_000, 320_000)) -> Dict[str, Any]:
+    """
+    Szczyt alokacji (tracemalloc) jednego filter_and_rank dla rosnących zbiorów.
+    Zapytanie jest selektywne, więc liczba kandydatów jest podobna dla każdego
+    rozmiaru – szczyt nie powinien rosnąć razem z liczbą wierszy.
+    """
+    out: Dict[str, Any] = {"sizes": {}}
+    for rows in sizes:
+        df = _random_listings(rows)
+        # ~500 kandydatów niezależnie od rozmiaru zbioru
+        width = 500 / rows * 11_200
+        f = {
+            "miasto": "Poznań",
+            "cena_range": (2_000, 2_000 + width * 5),
+            "sort": "score",
+            "limit": 50,
+        }
+        filter_and_rank(df, f)  # rozgrzewka: budowa indeksu
+        tracemalloc.start()
+        filter_and_rank(df, f)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        out["sizes"][rows] = {
+            "peak_kb": peak / 1024,
+            "frame_kb": df.memory_usage(deep=True).sum() / 1024,
+        }
+    return out
+
+
+def bench_layout(rows: int = 100_000) -> Dict[str, Any]:
+    """Pamięć znormalizowanej ramki przed/po compact_df (bajty na ofertę)."""
+    df = _random_listings(rows)
+    return memory_report(df, compact_df(df))
+
+
+def _percentiles(samples) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99))}
+
+
+def bench_parse(repeat: int = 200, gazetteer_size: int = 2_000) -> Dict[str, Any]:
+    """Latencja parse_query (p50/p99) na zimnym i ciepłym cache, ze słownikiem `gazetteer_size` nazw."""
+    locs = [f"Osiedle {i}" for i in range(gazetteer_size)] + ["Jeżyce", "Wilda", "Łazarz"]
+    gaz = Gazetteer(locs, ["Poznań", "Kraków", "Wrocław"])
+    cold, warm = [], []
+    for _ in range(repeat):
+        parse_cache_clear()
+        for q in SAMPLE_QUERIES:
+            t0 = time.perf_counter()
+            parse_query(q, gazetteer=gaz)
+            cold.append(time.perf_counter() - t0)
+        for q in SAMPLE_QUERIES:
+            t0 = time.perf_counter()
+            parse_query(q, gazetteer=gaz)
+            warm.append(time.perf_counter() - t0)
+    return {"cold": _percentiles(cold), "warm": _percentiles(warm), "cache": parse_cache_info()}
+
+
+def bench_topk(rows: int = 200_000, limit: int = 50, repeat: int = 5) -> Dict[str, Any]:
+    """Pełne sort_values + head vs. ścieżka top-k w sort_results, dla każdego trybu sortowania."""
+    df = _random_scored(rows)
+    full_spec = {
+        "score": (["score", "cena", "id"], [False, True, True]),
+        "cena_asc": (["cena", "id"], [True, True]),
+        "cena_desc": (["cena", "id"], [False, True]),
+        "metraz_asc": (["metraz", "id"], [True, True]),
+        "metraz_desc": (["metraz", "id"], [False, True]),
+    }
+    out: Dict[str, Any] = {"rows": rows, "limit": limit, "modes": {}}
+    for mode, (by, asc) in full_spec.items():
+        f = {"sort": mode}
+        full = lambda: df.sort_values(by, ascending=asc, na_position="last").head(limit)
+        topk = lambda: sort_results(df, f, limit=limit)
+        assert full()["id"].tolist() == topk()["id"].tolist()
+        t_full = _best_of(full, repeat)
+        t_topk = _best_of(topk, repeat)
+        out["modes"][mode] = {
+            "full_sort_ms": t_full * 1000,
+            "topk_ms": t_topk * 1000,
+            "speedup": t_full / t_topk if t_topk else None,
+        }
+    return out
+
+
+# Etapy potoku mierzone osobno (ms na zapytanie, najlepszy z `repeat`) i całość
+STAGES = [
+    "parse_query", "filter_df", "add_scores", "sort_results",
+    "price_context", "summarize_results", "end_to_end",
+]
+
+
+def bench_stages(rows: int, repeat: int = 3, seed: int = 0, limit: int = 50) -> Dict[str, Any]:
+    """
+    Czasy etapów na syntetycznym zbiorze `rows` ofert (engines.synthetic).
+    Wczytanie (normalize_df) i budowa struktur pochodnych mierzone raz na zbiór,
+    etapy zapytania – średnio na zapytanie z SAMPLE_QUERIES.
+    """
+    raw = generate_listings(rows, seed)
+    out: Dict[str, Any] = {"rows": rows, "setup_ms": {}, "stages_ms": {}}
+
+    t0 = time.perf_counter()
+    df = normalize_df(raw)
+    out["setup_ms"]["normalize_df"] = (time.perf_counter() - t0) * 1000
+    del raw
+    for name, build in [
+        ("gazetteer", data.gazetteer),
+        ("market_aggregates", data.market_aggregates),
+        ("listing_index", get_index),
+    ]:
+        t0 = time.perf_counter()
+        build(df)
+        out["setup_ms"][name] = (time.perf_counter() - t0) * 1000
+
+    gaz = data.gazetteer(df)
+    totals = {name: 0.0 for name in STAGES}
+    for q in SAMPLE_QUERIES:
+        parse_cache_clear()
+        t0 = time.perf_counter()
+        f = parse_query(q, gazetteer=gaz)
+        totals["parse_query"] += time.perf_counter() - t0
+        f["limit"] = limit
+
+        filtered = filter_df(df, f)
+        scored = add_scores(filtered, f)
+        top = sort_results(scored, f, limit=limit)
+        totals["filter_df"] += _best_of(lambda: filter_df(df, f), repeat)
+        totals["add_scores"] += _best_of(lambda: add_scores(filtered, f), repeat)
+        totals["sort_results"] += _best_of(lambda: sort_results(scored, f, limit=limit), repeat)
+        rows_top = [r for _, r in top.head(10).iterrows()]
+        totals["price_context"] += _best_of(
+            lambda: [data.price_context(r, df) for r in rows_top], repeat
+        )
+        totals["summarize_results"] += _best_of(lambda: summarize_results(f, top), repeat)
+
+        def e2e():
+            parse_cache_clear()
+            ff = parse_query(q, gazetteer=gaz)
+            ff["limit"] = limit
+            summarize_results(ff, filter_and_rank(df, ff))
+
+        totals["end_to_end"] += _best_of(e2e, repeat)
+    out["stages_ms"] = {name: t / len(SAMPLE_QUERIES) * 1000 for name, t in totals.items()}
+    return out
+
+
+def run_stage_suite(sizes, repeat: int = 3, seed: int = 0) -> Dict[str, Any]:
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seed": seed,
+            "repeat": repeat,
+            "queries": len(SAMPLE_QUERIES),
+        },
+        "sizes": {str(rows): bench_stages(rows, repeat, seed) for rows in sizes},
+    }
+
+
+def compare_stage_runs(new: Dict[str, Any], old: Dict[str, Any]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Stosunek czasów nowy/stary per rozmiar i etap (>1 = wolniej niż poprzednio)."""
+    out: Dict[str, Dict[str, Optional[float]]] = {}
+    for size, res in new["sizes"].items():
+        prev = old.get("sizes", {}).get(size)
+        if not prev:
+            continue
+        cur = {**res["setup_ms"], **res["stages_ms"]}
+        base = {**prev.get("setup_ms", {}), **prev.get("stages_ms", {})}
+        out[size] = {k: (v / base[k] if base.get(k) else None) for k, v in cur.items() if k in base}
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarki silników asystenta")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("topk", help="top-k w sort_results vs pełne sortowanie")
+    p.add_argument("--rows", type=int, default=200_000)
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--repeat", type=int, default=5)
+    p = sub.add_parser("memory", help="szczyt alokacji filter_and_rank vs rozmiar zbioru")
+    p.add_argument("--sizes", type=int, nargs="+", default=[20_000, 80_000, 320_000])
+    p = sub.add_parser("layout", help="pamięć ramki: zwykłe dtypes vs compact_df")
+    p.add_argument("--rows", type=int, default=100_000)
+    p = sub.add_parser("stages", help="czasy etapów potoku na syntetycznych zbiorach")
+    p.add_argument("--sizes", nargs="+", default=["10k", "100k"], help="np. 10k 100k 1m")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", help="zapisz wyniki do pliku JSON")
+    p.add_argument("--compare", help="porównaj z wcześniejszym plikiem JSON")
+    p = sub.add_parser("parse", help="latencja parse_query (p50/p99)")
+    p.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "topk":
+        res = bench_topk(args.rows, args.limit, args.repeat)
+        print(f"rows={res['rows']} limit={res['limit']}")
+        for mode, r in res["modes"].items():
+            print(
+                f"  {mode:<12} full {r['full_sort_ms']:8.1f} ms   "
+                f"top-k {r['topk_ms']:8.1f} ms   x{r['speedup']:.1f}"
+            )
+    elif args.cmd == "parse":
+        res = bench_parse(args.repeat)
+        for name in ["cold", "warm"]:
+            r = res[name]
+            print(f"  {name:<5} p50 {r['p50_ms']:.3f} ms   p99 {r['p99_ms']:.3f} ms")
+        print(f"  cache: {res['cache']}")
+    elif args.cmd == "stages":
+        res = run_stage_suite([parse_size(x) for x in args.sizes], args.repeat, args.seed)
+        for size, r in res["sizes"].items():
+            print(f"rows={size}")
+            for name, ms in {**r["setup_ms"], **r["stages_ms"]}.items():
+                print(f"  {name:<18} {ms:10.2f} ms")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as fh:
+                json.dump(res, fh, indent=2)
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as fh:
+                ratios = compare_stage_runs(res, json.load(fh))
+            for size, r in ratios.items():
+                print(f"vs {args.compare} rows={size}")
+                for name, ratio in r.items():
+                    flag = "  ← wolniej" if ratio and ratio > 1.2 else ""
+                    print(f"  {name:<18} x{ratio:.2f}{flag}" if ratio else f"  {name:<18} -")
+    elif args.cmd == "layout":
+        res = bench_layout(args.rows)
+        print(
+            f"rows={res['rows']}  {res['bytes_per_listing_before']:.1f} -> "
+            f"{res['bytes_per_listing_after']:.1f} B/ofertę  (x{res['ratio']:.3f})"
+        )
+        for col, r in res["columns"].items():
+            print(f"  {col:<18} {r['dtype']:<10} {r['before']:>12} -> {r['after']:>12}")
+    elif args.cmd == "memory":
+        res = bench_memory(tuple(args.sizes))
+        for rows, r in res["sizes"].items():
+            print(
+                f"  rows={rows:<9} peak {r['peak_kb']:9.1f} KiB   "
+                f"(ramka {r['frame_kb'] / 1024:8.1f} MiB)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,15 @@
+import csv
+import hashlib
+import time
+import weakref
+import numpy as np
 import pandas as pd
-from typing import Optional, Dict, Any
-from .utils import norm_bool
+from typing import Optional, Dict, Any, Callable, Tuple
+from .utils import norm_bool_series, norm_text
+from .gazetteer import Gazetteer
+from .market import MarketAggregates
+from .textindex import TextIndex
+from . import snapshot
 
 # Mapowanie kolumn CSV → wewnętrzne klucze
 COLUMN_MAP = {
@@ -18,11 +27,113 @@ COLUMN_MAP = {
     # (opcjonalnie) "Garaż": "garaz", "Garaz": "garaz",
 }
 
+# Kolumny tekstowe z towarzyszącą kolumną znormalizowaną (bez ogonków, lower) jako kategoria
+NORM_TEXT_COLS = ["miasto", "lokalizacja"]
+
+
+def norm_col(col: str) -> str:
+    return f"{col}_norm"
+
+
+# Typy znanych kolumn tekstowych/logicznych ustawiamy z góry (bez zgadywania per kolumna).
+# Liczbowe zostawiamy parserowi – w feedach bywają komórki typu „1 200 zł”, które
+# normalize_df i tak konwertuje z errors="coerce".
+_STR_COLS = ["miasto", "lokalizacja", "balkon", "winda"]
+_SNIFF_BYTES = 64 * 1024
+
+_LAST_INGEST: Dict[str, Any] = {}
+
+
+def ingest_report() -> Dict[str, Any]:
+    """Jak wczytano ostatni plik: parser, kodowanie, separator, liczba wierszy, czas."""
+    return dict(_LAST_INGEST)
+
+
+def _known_dtypes() -> Dict[str, str]:
+    names = set(_STR_COLS) | {k for k, v in COLUMN_MAP.items() if v in _STR_COLS}
+    return {name: "str" for name in names}
+
+
+def _sniff_csv(path: str) -> Optional[Tuple[str, str]]:
+    """Kodowanie i separator z próbki początku pliku (jeden odczyt zamiast prób i błędów)."""
+    try:
+        with open(path, "rb") as fh:
+            head = fh.read(_SNIFF_BYTES)
+    except OSError:
+        return None
+    text, encoding = None, None
+    for enc in ("utf-8-sig", "cp1250"):
+        try:
+            text, encoding = head.decode(enc), enc
+            break
+        except UnicodeDecodeError as e:
+            # próbka mogła uciąć znak wielobajtowy na końcu
+            if enc == "utf-8-sig" and e.start >= len(head) - 3:
+                text, encoding = head[: e.start].decode(enc), enc
+                break
+    if text is None:
+        return None
+    lines = text.splitlines()[:50]
+    if not lines:
+        return None
+    try:
+        sep = csv.Sniffer().sniff("\n".join(lines), delimiters=";,\t|").delimiter
+    except csv.Error:
+        sep = max(";,\t|", key=lines[0].count)
+    return encoding, sep
+
+
+def _fast_engines():
+    try:
+        import pyarrow  # noqa: F401
+
+        return ["pyarrow", "c"]
+    except ImportError:
+        return ["c"]
+
 
 def _read_csv_robust(path: str) -> pd.DataFrame:
     """
     Odporny loader CSV: wykrywa separator, BOM/UTF-8, CP1250, pomija uszkodzone wiersze.
+    Najpierw szybka ścieżka (sniff próbki + parser pyarrow/C z typami znanych kolumn),
+    wolny parser "python" zostaje tylko jako ostatnia deska ratunku.
     """
+    t0 = time.perf_counter()
+
+    def done(df: pd.DataFrame, parser: str, encoding=None, sep=None) -> pd.DataFrame:
+        _LAST_INGEST.clear()
+        _LAST_INGEST.update(
+            path=path,
+            parser=parser,
+            encoding=encoding,
+            sep=sep,
+            rows=len(df),
+            seconds=time.perf_counter() - t0,
+        )
+        return df
+
+    if path.lower().endswith((".xls", ".xlsx")):
+        return done(pd.read_excel(path), "excel")
+
+    last_err = None
+    sniffed = _sniff_csv(path)
+    if sniffed:
+        encoding, sep = sniffed
+        for engine in _fast_engines():
+            try:
+                df = pd.read_csv(
+                    path,
+                    sep=sep,
+                    encoding=encoding,
+                    engine=engine,
+                    dtype=_known_dtypes(),
+                    on_bad_lines="skip",
+                )
+                if df.shape[1] > 1:
+                    return done(df, engine, encoding, sep)
+            except Exception as e:
+                last_err = e
+
     attempts = [
         dict(sep=None, engine="python", encoding="utf-8-sig", on_bad_lines="skip"),
         dict(sep=";", engine="python", encoding="utf-8-sig", on_bad_lines="skip"),
@@ -31,27 +142,24 @@ def _read_csv_robust(path: str) -> pd.DataFrame:
         dict(sep=",", engine="python", encoding="cp1250", on_bad_lines="skip"),
         dict(sep=r"[;,]", engine="python", encoding="utf-8-sig", on_bad_lines="skip"),
     ]
-    last_err = None
     for kw in attempts:
         try:
-            return pd.read_csv(path, **kw)
+            return done(pd.read_csv(path, **kw), "python", kw["encoding"], kw["sep"])
         except Exception as e:
             last_err = e
-    if path.lower().endswith((".xls", ".xlsx")):
-        return pd.read_excel(path)
     raise last_err or RuntimeError("Nie udało się wczytać CSV")
 
 
-def normalize_df(df: pd.DataFrame) -> pd.DataFrame:
+def normalize_df(df: pd.DataFrame, compact: bool = False) -> pd.DataFrame:
     df = df.rename(columns={col: COLUMN_MAP.get(col, col) for col in df.columns}).copy()
 
-    # Booleany
+    # Booleany (norm_bool raz na unikalną wartość, nie per komórka)
     if "balkon" in df.columns:
-        df["balkon"] = df["balkon"].map(lambda v: norm_bool(v) if pd.notna(v) else None)
+        df["balkon"] = norm_bool_series(df["balkon"])
     if "winda" in df.columns:
-        df["winda"] = df["winda"].map(lambda v: norm_bool(v) if pd.notna(v) else None)
+        df["winda"] = norm_bool_series(df["winda"])
     # if "garaz" in df.columns:
-    #     df["garaz"] = df["garaz"].map(lambda v: norm_bool(v) if pd.notna(v) else None)
+    #     df["garaz"] = norm_bool_series(df["garaz"])
 
     # Liczbowe
     for col in ["metraz", "pokoje", "cena", "pietro"]:
@@ -67,34 +175,209 @@ def normalize_df(df: pd.DataFrame) -> pd.DataFrame:
         if col in df.columns:
             df[col] = df[col].astype(str)
 
-    return df
+    # Znormalizowane kody – norm_text liczymy raz przy wczytaniu, a nie przy każdym zapytaniu
+    for col in NORM_TEXT_COLS:
+        if col in df.columns:
+            df[norm_col(col)] = _norm_categorical(df[col])
 
+    return compact_df(df) if compact else df
 
-def load_csv(path: str = "mieszkania.csv") -> pd.DataFrame:
-    return normalize_df(_read_csv_robust(path))
 
+# Kolumny tekstowe o małej liczbie wartości – w układzie kompaktowym jako kategorie
+COMPACT_CATEGORY_COLS = ["miasto", "lokalizacja", "typ_najmu", "standard"]
+COMPACT_NUMERIC_COLS = ["id", "metraz", "pokoje", "cena", "pietro", "cena_m2"]
+COMPACT_BOOL_COLS = ["balkon", "winda"]
 
-def locations(df: pd.DataFrame):
+
+def compact_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Kompaktowy układ typów dla znormalizowanej ramki:
+    - teksty o małej liczbie wartości → category,
+    - liczby całkowite bez braków → najmniejszy int (np. int8/int32), pozostałe → float32,
+    - balkon/winda (True/False/None) → nullable "boolean".
+    Silniki działają na obu układach; braki w "boolean" to pd.NA zamiast None.
+    """
+    out = df.copy()
+    for col in COMPACT_CATEGORY_COLS:
+        if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype("category")
+    for col in COMPACT_NUMERIC_COLS:
+        if col not in out.columns or not pd.api.types.is_numeric_dtype(out[col]):
+            continue
+        s = out[col]
+        vals = s.to_numpy(dtype=float, na_value=np.nan)
+        if not np.isnan(vals).any() and np.array_equal(vals, np.round(vals)):
+            out[col] = pd.to_numeric(s.astype("int64"), downcast="integer")
+        else:
+            out[col] = s.astype("float32")
+    for col in COMPACT_BOOL_COLS:
+        if col in out.columns:
+            out[col] = out[col].astype("boolean")
+    return out
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> Dict[str, Any]:
+    """Pamięć ramek przed/po (bajty na ofertę i per kolumna, z deep=True)."""
+    b = before.memory_usage(deep=True, index=False)
+    a = after.memory_usage(deep=True, index=False)
+    n = max(len(before), 1)
+    return {
+        "rows": len(before),
+        "bytes_before": int(b.sum()),
+        "bytes_after": int(a.sum()),
+        "bytes_per_listing_before": float(b.sum()) / n,
+        "bytes_per_listing_after": float(a.sum()) / n,
+        "ratio": float(a.sum()) / float(b.sum()) if b.sum() else None,
+        "columns": {
+            col: {"before": int(b.get(col, 0)), "after": int(a.get(col, 0)), "dtype": str(after[col].dtype)}
+            for col in after.columns
+        },
+    }
+
+
+def _norm_categorical(series: pd.Series) -> pd.Categorical:
+    """
+    Słownikowe kodowanie znormalizowanego tekstu: norm_text wołamy raz na unikalną
+    wartość, a wiersze dostają kod kategorii (posortowane kategorie, NaN → -1).
+    """
+    codes, uniques = pd.factorize(series)
+    normed = [norm_text(str(u)) for u in uniques]
+    cats = sorted(set(normed))
+    lookup = {c: i for i, c in enumerate(cats)}
+    remap = np.array([lookup[x] for x in normed] + [-1], dtype=np.int32)
+    return pd.Categorical.from_codes(remap[codes], categories=cats)
+
+
+def text_mask(
+    df: pd.DataFrame, col: str, value: str, positions: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Maska wierszy, dla których norm_text(df[col]) == norm_text(value).
+    Na ramce z normalize_df to jedno porównanie kodów całkowitych.
+    Z `positions` maska dotyczy tylko tych pozycji (iloc), w tej kolejności.
+    """
+    target = norm_text(value)
+    n = len(df) if positions is None else len(positions)
+    nc = norm_col(col)
+    if nc in df.columns and isinstance(df[nc].dtype, pd.CategoricalDtype):
+        code = df[nc].cat.categories.get_indexer([target])[0]
+        if code < 0:
+            return np.zeros(n, dtype=bool)
+        codes = df[nc].array.codes  # widok, bez kopii
+        return (codes if positions is None else codes[positions]) == code
+    if col not in df.columns:
+        return np.full(n, target == "")
+    # Ramka bez kolumn pochodnych: i tak liczymy norm_text raz na unikalną wartość
+    codes, uniques = pd.factorize(df[col])
+    hit = np.array([norm_text(str(u)) == target for u in uniques] + [False], dtype=bool)
+    return hit[codes if positions is None else codes[positions]]
+
+
+def bool_mask(series: pd.Series, want) -> np.ndarray:
+    """Maska series == want; braki (None/NaN/pd.NA) nigdy nie pasują."""
+    return (series == want).to_numpy(dtype=bool, na_value=False)
+
+
+# =========================
+# Struktury pochodne liczone raz na ramkę
+# =========================
+_DERIVED: Dict[int, Dict[str, Any]] = {}
+
+
+def derived(df: pd.DataFrame, name: str, build: Callable[[pd.DataFrame], Any]) -> Any:
+    """
+    Zwraca strukturę pochodną `name` dla ramki df, budując ją przy pierwszym użyciu.
+    Cache żyje tak długo jak sama ramka – wczytane ramki traktujemy jako niemutowalne.
+    """
+    key = id(df)
+    slot = _DERIVED.get(key)
+    if slot is None:
+        slot = _DERIVED[key] = {}
+        weakref.finalize(df, _DERIVED.pop, key, None)
+    if name not in slot:
+        slot[name] = build(df)
+    return slot[name]
+
+
+def load_csv(
+    path: str = "mieszkania.csv", use_snapshot: bool = True, compact: bool = False
+) -> pd.DataFrame:
+    """
+    Wczytuje i normalizuje oferty. Z `use_snapshot` najpierw szuka binarnego snapshotu
+    (engines.snapshot) pasującego do pliku – wtedy pomija parsowanie CSV i normalize_df.
+    `compact` daje kompaktowy układ typów (compact_df).
+    """
+    if not (use_snapshot and snapshot.enabled()) or path.lower().endswith((".xls", ".xlsx")):
+        return normalize_df(_read_csv_robust(path), compact=compact)
+
+    t0 = time.perf_counter()
+    variant = "compact" if compact else ""
+    fp = snapshot.source_fingerprint(path)
+    df = snapshot.load(path, fp, variant)
+    if df is not None:
+        _LAST_INGEST.clear()
+        _LAST_INGEST.update(
+            path=path, parser="snapshot", encoding=None, sep=None,
+            rows=len(df), seconds=time.perf_counter() - t0,
+        )
+        return df
+    df = normalize_df(_read_csv_robust(path), compact=compact)
+    snapshot.save(df, path, fp, variant)
+    return df
+
+
+def _unique_sorted(df: pd.DataFrame, col: str):
     return (
-        sorted(df["lokalizacja"].dropna().astype(str).unique().tolist())
-        if "lokalizacja" in df.columns
+        sorted(df[col].dropna().astype(str).unique().tolist())
+        if col in df.columns
         else []
     )
 
 
+def locations(df: pd.DataFrame):
+    return list(derived(df, "locations", lambda d: _unique_sorted(d, "lokalizacja")))
+
+
 def cities(df: pd.DataFrame):
-    return (
-        sorted(df["miasto"].dropna().astype(str).unique().tolist())
-        if "miasto" in df.columns
-        else []
-    )
+    return list(derived(df, "cities", lambda d: _unique_sorted(d, "miasto")))
+
+
+def gazetteer(df: pd.DataFrame) -> Gazetteer:
+    """Słownik miast/lokalizacji dla parse_query – budowany raz na wczytaną ramkę."""
+    return derived(df, "gazetteer", lambda d: Gazetteer(locations(d), cities(d)))
+
+
+def market_aggregates(df: pd.DataFrame) -> MarketAggregates:
+    """Statystyki cena_m2 per miasto i per (miasto, lokalizacja) – liczone raz na ramkę."""
+    return derived(df, "market_aggregates", MarketAggregates)
+
+
+def text_index(df: pd.DataFrame) -> TextIndex:
+    """Indeks BM25 opisów ofert (engines.textindex) – budowany raz na ramkę."""
+    return derived(df, "text_index", TextIndex)
+
+
+def dataset_version(df: pd.DataFrame) -> str:
+    """Skrót treści ramki (np. do kluczy cache odpowiedzi) – liczony raz na ramkę."""
+    def build(d: pd.DataFrame) -> str:
+        h = hashlib.blake2b(digest_size=8)
+        h.update("|".join(map(str, d.columns)).encode())
+        h.update(pd.util.hash_pandas_object(d, index=False).to_numpy().tobytes())
+        return f"{len(d)}-{h.hexdigest()}"
+    return derived(df, "version", build)
+
+
+def _delta_pct(a, b):
+    if a is None or b is None or b == 0:
+        return None
+    return (a - b) / b * 100.0
 
 
 def price_context(row: pd.Series, full_df: pd.DataFrame) -> Dict[str, Any]:
     """
     Kontekst cenowy dla oferty:
     - cena_m2 oferty,
-    - średnia m² w mieście i (jeśli możliwe) w lokalizacji,
+    - średnia m² w mieście i (jeśli możliwe) w lokalizacji (z market_aggregates),
     - różnice procentowe.
     """
     try:
@@ -103,28 +386,14 @@ def price_context(row: pd.Series, full_df: pd.DataFrame) -> Dict[str, Any]:
         lok = r.get("lokalizacja")
         cena_m2 = r.get("cena_m2")
 
-        def _avg(series):
-            s = series.dropna()
-            return float(s.mean()) if len(s) else None
-
         avg_city = None
         avg_loc = None
         if "cena_m2" in full_df.columns:
+            agg = market_aggregates(full_df)
             if miasto:
-                avg_city = _avg(full_df.loc[full_df["miasto"] == miasto, "cena_m2"])
+                avg_city = agg.stats(miasto)["mean"]
             if miasto and lok:
-                avg_loc = _avg(
-                    full_df.loc[
-                        (full_df["miasto"] == miasto)
-                        & (full_df["lokalizacja"] == lok),
-                        "cena_m2",
-                    ]
-                )
-
-        def _delta(a, b):
-            if a is None or b is None or b == 0:
-                return None
-            return (a - b) / b * 100.0
+                avg_loc = agg.stats(miasto, lok)["mean"]
 
         return {
             "city": miasto,
@@ -132,8 +401,8 @@ def price_context(row: pd.Series, full_df: pd.DataFrame) -> Dict[str, Any]:
             "cena_m2": cena_m2,
             "avg_city": avg_city,
             "avg_loc": avg_loc,
-            "delta_city_pct": _delta(cena_m2, avg_city),
-            "delta_loc_pct": _delta(cena_m2, avg_loc),
+            "delta_city_pct": _delta_pct(cena_m2, avg_city),
+            "delta_loc_pct": _delta_pct(cena_m2, avg_loc),
         }
     except Exception:
         return {
@@ -146,3 +415,206 @@ def price_context(row: pd.Series, full_df: pd.DataFrame) -> Dict[str, Any]:
             "delta_loc_pct": None,
         }
 
+
+def price_context_frame(results: pd.DataFrame, full_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Kontekst cenowy dla całej ramki wyników naraz – jeden join z market_aggregates
+    zamiast skanu full_df per oferta. Kolumny jak klucze price_context, indeks jak results.
+    """
+    def col(name):
+        if name in results.columns:
+            return results[name].to_numpy(dtype=object)
+        return np.full(len(results), None, dtype=object)
+
+    city, lok = col("miasto"), col("lokalizacja")
+    out = pd.DataFrame({"city": city, "lok": lok}, index=results.index)
+    out["cena_m2"] = pd.to_numeric(pd.Series(col("cena_m2"), index=results.index), errors="coerce")
+    out["avg_city"] = np.nan
+    out["avg_loc"] = np.nan
+    if "cena_m2" in full_df.columns and len(results):
+        agg = market_aggregates(full_df)
+        out["avg_city"] = agg.table("city")["mean"].reindex(city).to_numpy(dtype=float)
+        pairs = pd.MultiIndex.from_arrays([city, lok])
+        out["avg_loc"] = agg.table("loc")["mean"].reindex(pairs).to_numpy(dtype=float)
+    for delta, avg in [("delta_city_pct", "avg_city"), ("delta_loc_pct", "avg_loc")]:
+        b = out[avg].where(out[avg] != 0)
+        out[delta] = (out["cena_m2"] - b) / b * 100.0
+    return out
+
+
+# =========================
+# Odświeżanie przyrostowe (delta po id)
+# =========================
+# Kolumny wyliczane w normalize_df – nie porównujemy ich przy szukaniu zmian
+_DERIVED_COLS = {"cena_m2"} | {norm_col(c) for c in NORM_TEXT_COLS}
+
+
+def _is_compact(df: pd.DataFrame) -> bool:
+    return any(
+        c in df.columns and isinstance(df[c].dtype, pd.CategoricalDtype)
+        for c in COMPACT_CATEGORY_COLS
+    )
+
+
+def _row_hashes(df: pd.DataFrame, cols) -> np.ndarray:
+    """
+    Skrót wiersza po wartościach, niezależny od układu typów: liczby jako float,
+    reszta (kategorie, napisy, bool/None) po tekście wartości.
+    """
+    out = np.zeros(len(df), dtype=np.uint64)
+    for c in cols:
+        s = df[c]
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            s = pd.Series(s.to_numpy(dtype=float, na_value=np.nan))
+        else:
+            s = s.astype(object).where(s.notna(), None).astype(str)
+        out = out * np.uint64(1_000_003) ^ pd.util.hash_pandas_object(s, index=False).to_numpy()
+    return out
+
+
+def _unique_ids(df: pd.DataFrame) -> pd.Index:
+    if "id" not in df.columns:
+        raise ValueError("Odświeżanie przyrostowe wymaga kolumny 'id'")
+    ids = pd.Index(df["id"])
+    if not ids.is_unique:
+        raise ValueError("Odświeżanie przyrostowe wymaga unikalnych id")
+    return ids
+
+
+def diff_by_id(old: pd.DataFrame, new: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Różnica dwóch znormalizowanych ramek po kolumnie id:
+    {"added": ramka, "changed": ramka (nowe wersje), "removed": lista id}.
+    """
+    old_ids, new_ids = _unique_ids(old), _unique_ids(new)
+    pos = old_ids.get_indexer(new_ids)
+    cols = [c for c in new.columns if c in old.columns and c not in _DERIVED_COLS and c != "id"]
+    common = pos >= 0
+    changed = np.zeros(len(new), dtype=bool)
+    if common.any():
+        h_new = _row_hashes(new.iloc[np.flatnonzero(common)], cols)
+        h_old = _row_hashes(old.iloc[pos[common]], cols)
+        changed[np.flatnonzero(common)] = h_new != h_old
+    removed = old_ids[~old_ids.isin(new_ids)]
+    return {
+        "added": new.iloc[np.flatnonzero(~common)],
+        "changed": new.iloc[np.flatnonzero(changed)],
+        "removed": removed.tolist(),
+    }
+
+
+def _concat_normalized(frames) -> pd.DataFrame:
+    """pd.concat, ale kolumny kategoryczne łączymy przez sumę kategorii (posortowanych)."""
+    out = pd.concat(frames, ignore_index=True)
+    for col in frames[0].columns:
+        parts = [f[col] for f in frames if col in f.columns]
+        if len(parts) == len(frames) and all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+            out[col] = pd.api.types.union_categoricals(parts, sort_categories=True)
+    return out
+
+
+def apply_delta(
+    df: pd.DataFrame,
+    added: Optional[pd.DataFrame] = None,
+    changed: Optional[pd.DataFrame] = None,
+    removed=None,
+    raw: bool = True,
+) -> pd.DataFrame:
+    """
+    Nakłada deltę z feedu na ramkę i zwraca nową ramkę (df zostaje nietknięta).
+    `added`/`changed` to wiersze w postaci z CSV (raw=True, przechodzą przez normalize_df
+    tylko one) albo już znormalizowane; `removed` to lista id. Zmienione wiersze zostają
+    na swoich miejscach, nowe trafiają na koniec – jak po pełnym przeładowaniu dopisanego pliku.
+    Struktury pochodne (lokalizacje, miasta, agregaty cen) nowej ramki są wyliczane
+    z tych starej ramki i samej delty.
+    """
+    compact = _is_compact(df)
+    prep = []
+    for part in (changed, added):
+        if part is None or not len(part):
+            prep.append(df.iloc[:0])
+        else:
+            prep.append(normalize_df(part, compact=compact) if raw else part)
+    changed_n, added_n = prep
+    ids = _unique_ids(df)
+    drop_ids = pd.Index(list(removed or []) + changed_n["id"].tolist())
+    keep = ~ids.isin(drop_ids)
+    # Zmienione wiersze wracają na pozycję swojego id; nieznane id traktujemy jak nowe
+    ch_pos = ids.get_indexer(changed_n["id"]).astype(float)
+    ch_pos[ch_pos < 0] = np.inf
+    order_key = np.concatenate([
+        np.flatnonzero(keep).astype(float),
+        ch_pos,
+        np.full(len(added_n), np.inf),
+    ])
+    parts = [df.iloc[np.flatnonzero(keep)], changed_n, added_n]
+    out = _concat_normalized(parts)
+    out = out.take(np.argsort(order_key, kind="stable")).reset_index(drop=True)
+    if compact:
+        out = compact_df(out)
+
+    gone = df.iloc[np.flatnonzero(~keep)]
+    _carry_derived(df, out, gone, pd.concat([changed_n, added_n], ignore_index=True))
+    return out
+
+
+def _distinct(df: pd.DataFrame, col: str) -> set:
+    return set(df[col].dropna().astype(str).unique().tolist()) if col in df.columns else set()
+
+
+def _carry_derived(old: pd.DataFrame, new: pd.DataFrame, gone: pd.DataFrame, came: pd.DataFrame) -> None:
+    """Wypełnia cache pochodny `new` na podstawie `old` i delty (gone → came), bez pełnych skanów."""
+    slot = _DERIVED.get(id(old), {})
+
+    def carry_values(name: str, col: str):
+        if name not in slot or col not in new.columns:
+            return
+        came_vals = _distinct(came, col)
+        gone_vals = _distinct(gone, col)
+        values = set(slot[name]) | came_vals
+        # Wartość z usuniętych wierszy znika z listy tylko, gdy nie ma jej już w nowej ramce
+        maybe_gone = gone_vals - came_vals
+        if maybe_gone:
+            still = _distinct(new[new[col].astype(str).isin(maybe_gone)], col)
+            values -= maybe_gone - still
+        derived(new, name, lambda d: sorted(values))
+
+    carry_values("locations", "lokalizacja")
+    carry_values("cities", "miasto")
+    if "gazetteer" in slot and "locations" in slot and "cities" in slot:
+        same = locations(new) == slot["locations"] and cities(new) == slot["cities"]
+        derived(new, "gazetteer", lambda d: slot["gazetteer"] if same else Gazetteer(locations(d), cities(d)))
+    if "market_aggregates" in slot:
+        agg = slot["market_aggregates"].copy()
+        agg.remove(gone)
+        agg.add(came)
+        derived(new, "market_aggregates", lambda d: agg)
+    if "text_index" in slot:
+        idx = slot["text_index"].copy()
+        idx.remove(gone)
+        idx.add(came)
+        derived(new, "text_index", lambda d: idx)
+
+
+def refresh_from_file(df: pd.DataFrame, path: str = "mieszkania.csv") -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Wczytuje zmieniony plik i przenosi na nową ramkę struktury pochodne starej
+    (aktualizowane tylko o różnicę po id). Zwraca (nowa ramka, raport delty).
+    """
+    t0 = time.perf_counter()
+    new = load_csv(path, compact=_is_compact(df))
+    try:
+        delta = diff_by_id(df, new)
+    except ValueError:
+        return new, {"full": True, "seconds": time.perf_counter() - t0}
+    ids = _unique_ids(df)
+    gone = df.iloc[ids.get_indexer(delta["removed"] + delta["changed"]["id"].tolist())]
+    came = pd.concat([delta["changed"], delta["added"]], ignore_index=True)
+    _carry_derived(df, new, gone, came)
+    return new, {
+        "full": False,
+        "added": len(delta["added"]),
+        "changed": len(delta["changed"]),
+        "removed": len(delta["removed"]),
+        "seconds": time.perf_counter() - t0,
+    }
@@ -1,82 +1,225 @@
+import numpy as np
 import pandas as pd
-from typing import Dict, Any
-from .nl import compute_score
-from .utils import norm_text
+from typing import Dict, Any, List, Optional, Tuple
+from .nl import compute_scores
+from .data import bool_mask, text_index, text_mask
+from .index import RANGE_COLS, get_index, numeric_values
+from . import metrics
 
 
-def _apply_range(series: pd.Series, rng):
-    if rng is None:
-        return pd.Series([True] * len(series), index=series.index)
+# Od tylu wierszy opłaca się indeks posortowanych kolumn (budowany raz na ramkę)
+INDEX_MIN_ROWS = 5_000
+
+
+def _range_mask(values: np.ndarray, rng) -> np.ndarray:
     lo, hi = rng
-    m = pd.Series([True] * len(series), index=series.index)
+    m = np.ones(len(values), dtype=bool)
     if lo is not None:
-        m &= series >= lo
+        m &= values >= lo
     if hi is not None:
-        m &= series <= hi
+        m &= values <= hi
     return m
 
 
-def filter_df(df: pd.DataFrame, f: Dict[str, Any]) -> pd.DataFrame:
-    data = df.copy()
-    mask = pd.Series([True] * len(data), index=data.index)
-
-    if f.get("miasto") and "miasto" in data.columns:
-        mask &= data["miasto"].astype(str).map(norm_text) == norm_text(f["miasto"])
-    if f.get("lokalizacja") and "lokalizacja" in data.columns:
-        mask &= data["lokalizacja"].astype(str).map(norm_text) == norm_text(
-            f["lokalizacja"]
-        )
-
-    for col, key in [
-        ("cena", "cena_range"),
-        ("metraz", "metraz_range"),
-        ("pokoje", "pokoje_range"),
-        ("pietro", "pietro_range"),
-    ]:
-        if col in data.columns:
-            mask &= _apply_range(data[col], f.get(key))
+def filter_positions(df: pd.DataFrame, f: Dict[str, Any]) -> np.ndarray:
+    """
+    Pozycje (iloc, rosnąco) wierszy spełniających filtry – bez kopiowania ramki.
+    Na dużej ramce zakresy i miasto/lokalizację rozwiązuje ListingIndex,
+    a pozostałe warunki sprawdzamy już tylko na kandydatach.
+    """
+    ranges = {
+        col: f.get(key)
+        for col, key in RANGE_COLS
+        if col in df.columns and f.get(key) is not None
+    }
+    texts = {
+        col: f[col] for col in ["miasto", "lokalizacja"] if f.get(col) and col in df.columns
+    }
+    pos = None
+    if (ranges or texts) and len(df) >= INDEX_MIN_ROWS:
+        hit = get_index(df).candidates(ranges, texts)
+        if hit is not None:
+            # resztę (warunki bez indeksu) sprawdzamy niżej, już na kandydatach
+            pos, applied = hit
+            ranges = {c: r for c, r in ranges.items() if c not in applied}
+            texts = {c: v for c, v in texts.items() if c not in applied}
+    if pos is None:
+        pos = np.arange(len(df))
+
+    for col, value in texts.items():
+        pos = pos[text_mask(df, col, value, pos)]
+
+    for col, rng in ranges.items():
+        pos = pos[_range_mask(numeric_values(df[col].iloc[pos]), rng)]
 
     for col in ["balkon", "winda", "garaz"]:
-        if f.get(col) is not None and col in data.columns:
-            mask &= data[col] == f[col]
+        if f.get(col) is not None and col in df.columns:
+            pos = pos[bool_mask(df[col].iloc[pos], f[col])]
 
-    return data[mask].copy()
+    return pos
+
+
+def _filtered(df: pd.DataFrame, f: Dict[str, Any]) -> np.ndarray:
+    with metrics.timer("filter"):
+        pos = filter_positions(df, f)
+    metrics.count("rows_before_filter", len(df))
+    metrics.count("rows_after_filter", len(pos))
+    return pos
+
+
+def _scored(df: pd.DataFrame, f: Dict[str, Any], positions: Optional[np.ndarray] = None) -> np.ndarray:
+    with metrics.timer("score"):
+        scores = compute_scores(df, f, positions=positions)
+    metrics.count("rows_scored", len(scores))
+    return scores
+
+
+# Maksymalny wkład trafności opisu do score i BM25, przy którym dostaje się połowę:
+# skala bezwzględna (bm25 / (bm25 + TEXT_HALF)), więc słaby opis nie dostaje pełnej premii
+# tylko dlatego, że był najlepszy wśród kandydatów
+TEXT_WEIGHT = 2.0
+TEXT_HALF = 2.0
+
+
+def text_relevance(df: pd.DataFrame, f: Dict[str, Any], positions: np.ndarray) -> np.ndarray:
+    """
+    BM25 opisów kandydatów względem f["opis_terms"], nasycone do [0, 1)
+    niezależnie od zbioru kandydatów. Indeks budowany raz na pełną ramkę.
+    """
+    terms = f.get("opis_terms")
+    if not terms or "opis" not in df.columns or not len(positions):
+        return np.zeros(len(positions))
+    with metrics.timer("text"):
+        ids = df["id"].to_numpy()[positions] if "id" in df.columns else positions
+        bm25 = text_index(df).scores(terms, ids)
+    metrics.count("rows_text_matched", int(np.count_nonzero(bm25)))
+    return bm25 / (bm25 + TEXT_HALF)
+
+
+def filter_df(df: pd.DataFrame, f: Dict[str, Any]) -> pd.DataFrame:
+    return df.iloc[_filtered(df, f)]
 
 
 def add_scores(df: pd.DataFrame, f: Dict[str, Any]) -> pd.DataFrame:
-    scores = [compute_score(row.to_dict(), f) for _, row in df.iterrows()]
-    out = df.copy()
-    out["score"] = scores
-    return out
+    return df.assign(score=_scored(df, f))
+
+
+# Top-k przez argpartition opłaca się, gdy wyników jest wyraźnie więcej niż limit
+TOPK_MIN_FACTOR = 4
 
 
-def sort_results(df: pd.DataFrame, f: Dict[str, Any]) -> pd.DataFrame:
+def _sort_spec(columns, f: Dict[str, Any]) -> List[Tuple[str, bool]]:
     sk = f.get("sort", "score")
-    if sk == "cena_asc":
-        return df.sort_values(["cena", "id"], ascending=[True, True], na_position="last")
-    if sk == "cena_desc":
-        return df.sort_values(
-            ["cena", "id"], ascending=[False, True], na_position="last"
-        )
-    if sk == "metraz_asc":
-        return df.sort_values(
-            ["metraz", "id"], ascending=[True, True], na_position="last"
-        )
-    if sk == "metraz_desc":
-        return df.sort_values(
-            ["metraz", "id"], ascending=[False, True], na_position="last"
-        )
-    cols = [c for c in ["score", "cena", "id"] if c in df.columns]
-    asc = [False, True, True][: len(cols)]
-    return df.sort_values(cols, ascending=asc, na_position="last")
+    spec = {
+        "cena_asc": [("cena", True), ("id", True)],
+        "cena_desc": [("cena", False), ("id", True)],
+        "metraz_asc": [("metraz", True), ("id", True)],
+        "metraz_desc": [("metraz", False), ("id", True)],
+    }.get(sk, [("score", False), ("cena", True), ("id", True)])
+    return [(c, a) for c, a in spec if c in columns]
+
+
+def order_positions(
+    keys: List[np.ndarray], ascending: List[bool], limit: Optional[int] = None
+) -> np.ndarray:
+    """
+    Kolejność pozycji taka jak sort_values(..., na_position="last") po kluczach
+    liczbowych (pierwszy klucz najważniejszy). Z `limit` zwraca tylko top-k:
+    najpierw argpartition po pierwszym kluczu (z kompletem remisów na granicy),
+    potem dokładny lexsort tylko tych kandydatów.
+    """
+    cols = []
+    for v, asc in zip(keys, ascending):
+        v = np.asarray(v, dtype=float)
+        nan = np.isnan(v)
+        cols.append((nan, np.where(nan, 0.0, v if asc else -v)))
+    n = len(keys[0]) if keys else 0
+    cand = np.arange(n)
+    if limit is not None and cols and n > limit * TOPK_MIN_FACTOR:
+        if limit <= 0:
+            return cand[:0]
+        nan, v = cols[0]
+        primary = np.where(nan, np.inf, v)
+        kth = np.partition(primary, limit - 1)[limit - 1]
+        cand = np.flatnonzero(primary <= kth)
+    lex = []
+    for nan, v in reversed(cols):
+        lex += [v[cand], nan[cand]]
+    order = cand[np.lexsort(lex)] if lex else cand
+    return order if limit is None else order[:limit]
+
+
+def _sortable(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series)
+
+
+def sort_results(
+    df: pd.DataFrame, f: Dict[str, Any], limit: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Sortowanie wg f["sort"] (remisy: score malejąco, cena rosnąco, id rosnąco, NaN na końcu).
+    Z `limit` zwraca tylko pierwsze `limit` wierszy, bez pełnego sortowania.
+    """
+    with metrics.timer("rank"):
+        return _sorted(df, f, limit)
+
+
+def _sorted(df: pd.DataFrame, f: Dict[str, Any], limit: Optional[int]) -> pd.DataFrame:
+    spec = _sort_spec(df.columns, f)
+    if not spec:
+        return df if limit is None else df.head(limit)
+    by = [c for c, _ in spec]
+    asc = [a for _, a in spec]
+    if not all(_sortable(df[c]) for c in by):
+        out = df.sort_values(by, ascending=asc, na_position="last")
+        return out if limit is None else out.head(limit)
+    keys = [df[c].to_numpy(dtype=float, na_value=np.nan) for c in by]
+    return df.iloc[order_positions(keys, asc, limit)]
+
+
+def rank_positions(
+    df: pd.DataFrame, f: Dict[str, Any], limit: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Filtr + scoring + sortowanie na pozycjach: zwraca (pozycje iloc w kolejności
+    wyników, score'y). Nie kopiuje ramki – alokacje rosną z liczbą kandydatów,
+    a nie z rozmiarem zbioru.
+    """
+    pos = _filtered(df, f)
+    scores = _scored(df, f, pos)
+    if f.get("opis_terms"):
+        # trafność opisu jako osobny składnik obok compute_scores
+        scores = np.round(scores + TEXT_WEIGHT * text_relevance(df, f, pos), 4)
+    with metrics.timer("rank"):
+        return _rank(df, f, pos, scores, limit)
+
+
+def _rank(
+    df: pd.DataFrame, f: Dict[str, Any], pos: np.ndarray, scores: np.ndarray, limit: Optional[int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    spec = _sort_spec(set(df.columns) | {"score"}, f)
+    by = [c for c, _ in spec]
+    asc = [a for _, a in spec]
+    if not all(c == "score" or _sortable(df[c]) for c in by):
+        cand = df.iloc[pos].assign(score=scores, _pos=pos)
+        cand = cand.sort_values(by, ascending=asc, na_position="last")
+        if limit is not None:
+            cand = cand.head(limit)
+        return cand["_pos"].to_numpy(), cand["score"].to_numpy()
+    keys = [
+        scores if c == "score" else df[c].iloc[pos].to_numpy(dtype=float, na_value=np.nan)
+        for c in by
+    ]
+    order = order_positions(keys, asc, limit)
+    return pos[order], scores[order]
 
 
 def filter_and_rank(df: pd.DataFrame, f: Dict[str, Any]) -> pd.DataFrame:
-    return (
-        sort_results(add_scores(filter_df(df, f), f), f)
-        .head(f.get("limit", 50))
-        .reset_index(drop=True)
-    )
+    # Materializujemy tylko końcowe top-k wierszy
+    pos, scores = rank_positions(df, f, limit=f.get("limit", 50))
+    out = df.iloc[pos].reset_index(drop=True)
+    out["score"] = scores
+    return out
 
 
 def roommate_alternatives(
@@ -92,53 +235,45 @@ def roommate_alternatives(
     if df.empty:
         return df
 
-    data = df.copy()
-    if "pokoje" in data.columns:
-        data = data[data["pokoje"].fillna(0) >= 2]
-    if data.empty:
-        return data
+    def values(col, pos):
+        if col not in df.columns:
+            return np.full(len(pos), np.nan)
+        return numeric_values(df[col].iloc[pos])
+
+    pos = np.arange(len(df))
+    if "pokoje" in df.columns:
+        pos = pos[np.nan_to_num(values("pokoje", pos), nan=0.0) >= 2]
+    if not len(pos):
+        return df.iloc[pos]
 
     # Miękkie zawężenie do miasta/lokalizacji (bez braku wyników, ma być użyteczne)
-    if f.get("miasto") and "miasto" in data.columns:
-        data = data[data["miasto"].astype(str).str.lower() == str(f["miasto"]).lower()]
-    if f.get("lokalizacja") and "lokalizacja" in data.columns:
-        data = data[
-            data["lokalizacja"].astype(str).str.lower()
-            == str(f["lokalizacja"]).lower()
-        ]
-
-    data = data.copy()
-    with pd.option_context("mode.use_inf_as_na", True):
-        data["per_room_price"] = (data["cena"] / data["pokoje"]).replace(
-            [float("inf")], pd.NA
-        )
-        data["per_room_area"] = (data["metraz"] / data["pokoje"]).replace(
-            [float("inf")], pd.NA
-        )
+    for col in ["miasto", "lokalizacja"]:
+        if f.get(col) and col in df.columns:
+            pos = pos[text_mask(df, col, f[col], pos)]
+
+    pokoje = values("pokoje", pos)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_room_price = values("cena", pos) / pokoje
+        per_room_area = values("metraz", pos) / pokoje
+    per_room_price[np.isinf(per_room_price)] = np.nan
+    per_room_area[np.isinf(per_room_area)] = np.nan
 
     # Sensowny zakres metrażu pokoju: ~8–20 m²/os.
-    if "per_room_area" in data.columns:
-        mask = data["per_room_area"].between(8, 20)
-        data = data[mask.fillna(True)]
+    keep = (per_room_area >= 8) & (per_room_area <= 20)
+    pos, per_room_price, per_room_area = pos[keep], per_room_price[keep], per_room_area[keep]
 
     # Score z istniejącej logiki
     try:
-        scored = add_scores(data, f)
+        scores = compute_scores(df, f, positions=pos)
     except Exception:
-        scored = data
-        scored["score"] = 0.0
-
-    sort_cols = []
-    if "per_room_price" in scored.columns:
-        sort_cols.append(("per_room_price", True))
-    sort_cols.append(("score", False))
-    if "cena" in scored.columns:
-        sort_cols.append(("cena", True))
-
-    by = [c for c, _ in sort_cols]
-    asc = [a for _, a in sort_cols]
-    scored = scored.sort_values(by=by, ascending=asc, na_position="last")
-
-    return scored.head(max_n).reset_index(drop=True)
-
+        scores = np.zeros(len(pos))
 
+    # Najniższa cena per pokój, potem najlepszy score i całościowa cena
+    order = order_positions(
+        [per_room_price, scores, values("cena", pos)], [True, False, True], max_n
+    )
+    out = df.iloc[pos[order]].reset_index(drop=True)
+    out["per_room_price"] = per_room_price[order]
+    out["per_room_area"] = per_room_area[order]
+    out["score"] = scores[order]
+    return out
@@ -0,0 +1,240 @@
+import hashlib
+import math
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from .utils import norm_text
+
+_TOKEN_RE = re.compile(r"\w+")
+_END = ""  # klucz końca nazwy w węźle trie (pusty token nie występuje)
+# Odmiana: „poznaniu” → „poznan”, „krakowie” → „krakow” – token zapytania może
+# zaczynać się od tokenu nazwy, jeśli ten ma co najmniej tyle znaków
+MIN_PREFIX_LEN = 4
+
+# Dopasowanie rozmyte (trigramy): próg podobieństwa i minimalna długość tokenu
+FUZZY_MIN_SCORE = 0.5
+FUZZY_MIN_LEN = 4
+# Końcówki fleksyjne (po norm_text) odcinane przed porównaniem: „jezycach” → „jezyc”,
+# „grunwaldzie” → „grunwald”; najdłuższa pasująca, o ile zostaje FUZZY_MIN_LEN znaków
+_CASE_ENDINGS = ("ach", "ami", "owi", "iem", "zie", "ie", "em", "om", "ow", "u", "y", "a", "e", "i")
+
+# norm_text zdejmuje ogonki przez NFKD, ale „ł” nie ma rozkładu – składamy je osobno,
+# żeby „Lodz”, „Solacz”, „lazarzu” trafiały w „Łódź”, „Sołacz”, „Łazarz”
+_FOLD = str.maketrans("ł", "l")
+
+
+def tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(norm_text(text).translate(_FOLD))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigramy znaków jak w pg_trgm: każdy token z dwiema spacjami z przodu i jedną z tyłu."""
+    out: Set[str] = set()
+    for tok in tokens(text):
+        padded = f"  {tok} "
+        out.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return out
+
+
+def strip_ending(tok: str) -> str:
+    for end in _CASE_ENDINGS:
+        if tok.endswith(end) and len(tok) - len(end) >= FUZZY_MIN_LEN:
+            return tok[: -len(end)]
+    return tok
+
+
+class TrigramIndex:
+    """
+    Indeks odwrócony trigram → nazwy. Podobieństwo = |wspólne| / |suma| (Jaccard
+    zbiorów trigramów). Z progiem `min_score` search() filtruje prefiksowo: nazwa
+    z podobieństwem ≥ próg dzieli z zapytaniem co najmniej ⌈próg·|q|⌉ trigramów, więc
+    musi wystąpić na jednej z |q| − ⌈próg·|q|⌉ + 1 najkrótszych list – częstych
+    trigramów („  m”, „ie ”) nie przeglądamy, a koszt nie rośnie liniowo ze słownikiem.
+    """
+
+    def __init__(self, entries: Sequence[Tuple[str, str]] = ()):
+        self.entries: List[Tuple[str, str]] = []  # (rodzaj, nazwa)
+        self._grams: List[Set[str]] = []
+        self._postings: Dict[str, List[int]] = {}
+        for kind, name in entries:
+            grams = trigrams(name)
+            if not grams:
+                continue
+            idx = len(self.entries)
+            self.entries.append((kind, name))
+            self._grams.append(grams)
+            for g in grams:
+                self._postings.setdefault(g, []).append(idx)
+
+    def search(self, text: str, kind: Optional[str] = None, limit: int = 3,
+               min_score: float = 0.0) -> List[Tuple[str, str, float]]:
+        """Najbardziej podobne nazwy: [(rodzaj, nazwa, podobieństwo)] malejąco."""
+        grams = trigrams(text)
+        if not grams:
+            return []
+        lists = sorted((self._postings.get(g, ()) for g in grams), key=len)
+        if min_score > 0:
+            need = max(1, math.ceil(min_score * len(grams)))
+            lists = lists[: len(grams) - need + 1]
+        candidates = set().union(*lists)
+        scored = []
+        for idx in candidates:
+            k, name = self.entries[idx]
+            if kind is not None and k != kind:
+                continue
+            other = self._grams[idx]
+            n = len(grams & other)
+            score = n / (len(grams) + len(other) - n)
+            if score >= min_score:
+                scored.append((score, k, name))
+        scored.sort(key=lambda x: -x[0])
+        return [(k, name, score) for score, k, name in scored[:limit]]
+
+
+class Gazetteer:
+    """
+    Słownik miast i lokalizacji jako trie po znormalizowanych tokenach.
+    find() przechodzi zapytanie raz i zwraca najdłuższe dopasowanie
+    dla każdego rodzaju ("miasto", "lokalizacja"). match() dokłada dopasowanie
+    rozmyte (TrigramIndex) dla odmienionych form i literówek.
+    """
+
+    def __init__(self, locations: Sequence[str] = (), cities: Sequence[str] = ()):
+        self._root: Dict[str, dict] = {}
+        self.max_tokens = 1
+        self._stems: Dict[str, Tuple[str, ...]] = {}  # nazwa → tokeny bez końcówek
+        entries = []
+        h = hashlib.blake2b(digest_size=8)
+        for kind, names in (("miasto", cities), ("lokalizacja", locations)):
+            for name in names:
+                h.update(f"{kind}\x1f{name}\x1e".encode("utf-8"))
+                toks = tokens(name)
+                if not toks:
+                    continue
+                entries.append((kind, name))
+                self._stems[name] = tuple(strip_ending(t) for t in toks)
+                self.max_tokens = max(self.max_tokens, len(toks))
+                node = self._root
+                for tok in toks:
+                    node = node.setdefault(tok, {})
+                # Dwie nazwy o tej samej formie znormalizowanej: wygrywa pierwsza
+                node.setdefault(_END, {}).setdefault(kind, name)
+        self.version = h.hexdigest()
+        self.trigrams = TrigramIndex(entries)
+
+    def __hash__(self):
+        return hash(self.version)
+
+    def __eq__(self, other):
+        return isinstance(other, Gazetteer) and other.version == self.version
+
+    @staticmethod
+    def _step(node: dict, tok: str):
+        """Dzieci węzła pasujące do tokenu zapytania: (węzeł, dokładne?)."""
+        child = node.get(tok)
+        if child is not None:
+            yield child, True
+        for k in range(len(tok) - 1, MIN_PREFIX_LEN - 1, -1):
+            child = node.get(tok[:k])
+            if child is not None:
+                yield child, False
+
+    def find(self, text: str) -> Dict[str, str]:
+        toks = tokens(text)
+        best: Dict[str, Tuple[Tuple[int, int, int], str]] = {}
+        for i in range(len(toks)):
+            # (węzeł, pozycja następnego tokenu, liczba dokładnych tokenów)
+            stack = [(self._root, i, 0)]
+            while stack:
+                node, j, exact = stack.pop()
+                if j >= len(toks):
+                    continue
+                for child, is_exact in self._step(node, toks[j]):
+                    ex = exact + int(is_exact)
+                    for kind, name in child.get(_END, {}).items():
+                        # najdłuższe (w tokenach), potem dokładniejsze, potem wcześniejsze
+                        key = (j + 1 - i, ex, -i)
+                        if kind not in best or key > best[kind][0]:
+                            best[kind] = (key, name)
+                    stack.append((child, j + 1, ex))
+        return {kind: name for kind, (_, name) in best.items()}
+
+    def _fuzzy(self, toks: List[str], kind: str) -> Optional[Tuple[str, float]]:
+        best: Optional[Tuple[float, int, str]] = None
+        for i in range(len(toks)):
+            for j in range(i + 1, min(i + self.max_tokens, len(toks)) + 1):
+                window = toks[i:j]
+                if any(len(t) < FUZZY_MIN_LEN or t.isdigit() for t in window):
+                    break
+                stems = tuple(strip_ending(t) for t in window)
+                for text in {" ".join(window), " ".join(stems)}:
+                    for _, name, score in self.trigrams.search(text, kind, limit=5, min_score=FUZZY_MIN_SCORE):
+                        # okno musi pokryć każdy token nazwy: samo „miasto” to nie „Stare Miasto”
+                        if len(self._stems[name]) != j - i:
+                            continue
+                        # ten sam temat po odcięciu końcówek to odmiana („jezycach”), nie literówka
+                        if stems == self._stems[name]:
+                            score = 1.0
+                        if best is None or (score, j - i) > best[:2]:
+                            best = (score, j - i, name)
+                        break
+        return None if best is None else (best[2], best[0])
+
+    def match(self, text: str) -> Dict[str, Tuple[str, float]]:
+        """
+        Jak find(), ale z podobieństwem: {rodzaj: (nazwa, podobieństwo)}. Dokładne
+        dopasowanie trie ma 1.0; dla brakującego rodzaju szukamy rozmycie po trigramach
+        („Jerzyce”, „Grunwaldzie”), pomijając tokeny już dopasowane do innej nazwy.
+        Wynik < 1.0 to tylko podpowiedź – parser nie robi z niej twardego filtra.
+        """
+        out = {kind: (name, 1.0) for kind, name in self.find(text).items()}
+        if len(out) == 2 or not self.trigrams.entries:
+            return out
+        used = {t for name, _ in out.values() for t in tokens(name)}
+        toks = [t for t in tokens(text)
+                if not any(t == u or (len(u) >= MIN_PREFIX_LEN and t.startswith(u)) for u in used)]
+        for kind in ("miasto", "lokalizacja"):
+            if kind not in out:
+                hit = self._fuzzy(toks, kind)
+                if hit is not None:
+                    out[kind] = hit
+        return out
+
+
+def covered_tokens(text: str, names: Sequence[str]) -> Set[str]:
+    """
+    Tokeny zapytania, z których wzięły się dopasowane nazwy: dokładnie, odmianą
+    („poznaniu”) albo rozmycie („jerzycach”) – te same reguły co w match().
+    Zwracane w postaci po norm_text (bez składania „ł”), jak słowa engines.textindex.
+    """
+    parts = [(u, trigrams(u)) for name in names for u in tokens(name)]
+    out: Set[str] = set()
+    for raw in _TOKEN_RE.findall(norm_text(text)):
+        tok = raw.translate(_FOLD)
+        for u, grams in parts:
+            if tok == u or (len(u) >= MIN_PREFIX_LEN and tok.startswith(u)):
+                out.add(raw)
+                break
+            if len(tok) >= FUZZY_MIN_LEN and any(
+                _similarity(trigrams(form), grams) >= FUZZY_MIN_SCORE for form in {tok, strip_ending(tok)}
+            ):
+                out.add(raw)
+                break
+    return out
+
+
+def _similarity(a: Set[str], b: Set[str]) -> float:
+    n = len(a & b)
+    return n / (len(a) + len(b) - n)
+
+
+@lru_cache(maxsize=8)
+def _cached(locations: Tuple[str, ...], cities: Tuple[str, ...]) -> Gazetteer:
+    return Gazetteer(locations, cities)
+
+
+def get_gazetteer(
+    locations: Optional[Sequence[str]] = None, cities: Optional[Sequence[str]] = None
+) -> Gazetteer:
+    """Gazetteer dla list nazw – budowany raz i trzymany w małym cache."""
+    return _cached(tuple(locations or ()), tuple(cities or ()))
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Optional, Set, Tuple
+from .data import NORM_TEXT_COLS, derived, norm_col
+from .utils import norm_text
+
+# Kolumny liczbowe filtrowane zakresami: kolumna → klucz w słowniku filtrów
+RANGE_COLS = [
+    ("cena", "cena_range"),
+    ("metraz", "metraz_range"),
+    ("pokoje", "pokoje_range"),
+    ("pietro", "pietro_range"),
+]
+
+
+def numeric_values(series: pd.Series) -> np.ndarray:
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+class ListingIndex:
+    """
+    Indeks posortowanych kolumn liczbowych dla wczytanej ramki.
+    Dla każdej kolumny trzyma pozycje (iloc) posortowane po wartości – zakres
+    rozwiązujemy wyszukiwaniem binarnym zamiast maski po wszystkich wierszach.
+    NaN nie trafia do indeksu (tak jak `series >= lo` daje dla NaN False).
+    Dla miasta/lokalizacji trzyma listy pozycji per kod kategorii z normalize_df.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n = len(df)
+        self._cols: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        for col, _ in RANGE_COLS:
+            if col not in df.columns:
+                continue
+            vals = numeric_values(df[col])
+            order = np.argsort(vals, kind="stable")
+            valid = int(np.count_nonzero(~np.isnan(vals)))
+            order = order[:valid]  # NaN-y lądują na końcu argsortu
+            self._cols[col] = (vals, order, vals[order])
+
+        self._text: Dict[str, Tuple[np.ndarray, pd.Index, np.ndarray, np.ndarray]] = {}
+        for col in NORM_TEXT_COLS:
+            nc = norm_col(col)
+            if nc not in df.columns or not isinstance(df[nc].dtype, pd.CategoricalDtype):
+                continue
+            codes = df[nc].cat.codes.to_numpy()
+            cats = df[nc].cat.categories
+            order = np.argsort(codes, kind="stable")
+            # wiersze kodu c to order[bounds[c]:bounds[c + 1]] (rosnąco, bo sort stabilny)
+            bounds = np.searchsorted(codes[order], np.arange(len(cats) + 1))
+            self._text[col] = (codes, cats, order, bounds)
+
+    def span(self, col: str, rng) -> Tuple[int, int]:
+        """Przedział [a, b) w posortowanej kolumnie spełniający zakres."""
+        _, order, sorted_vals = self._cols[col]
+        lo, hi = rng
+        a = 0 if lo is None else int(np.searchsorted(sorted_vals, lo, side="left"))
+        b = len(order) if hi is None else int(np.searchsorted(sorted_vals, hi, side="right"))
+        return a, max(a, b)
+
+    def _text_code(self, col: str, value: str) -> int:
+        return int(self._text[col][1].get_indexer([norm_text(value)])[0])
+
+    def candidates(
+        self, ranges: Dict[str, Any], texts: Optional[Dict[str, str]] = None
+    ) -> Optional[Tuple[np.ndarray, Set[str]]]:
+        """
+        (pozycje wierszy rosnąco, kolumny, których warunki zastosowano) albo None,
+        gdy indeks nie obsługuje żadnego z warunków. Kolumn bez indeksu (np. tekst
+        bez kategorii *_norm) nie sprawdzamy – wołający musi je przefiltrować sam.
+        Zaczynamy od najbardziej selektywnego warunku (rozmiar znamy bez
+        materializacji), a pozostałe sprawdzamy już tylko na jego kandydatach.
+        """
+        preds = []
+        for col, rng in ranges.items():
+            if rng is None or col not in self._cols or rng == (None, None):
+                continue
+            a, b = self.span(col, rng)
+            preds.append((b - a, "range", col, (a, b)))
+        for col, value in (texts or {}).items():
+            if col not in self._text:
+                continue
+            code = self._text_code(col, value)
+            bounds = self._text[col][3]
+            size = 0 if code < 0 else int(bounds[code + 1] - bounds[code])
+            preds.append((size, "text", col, code))
+        if not preds:
+            return None
+        preds.sort(key=lambda p: p[0])
+        applied = {col for _, _, col, _ in preds}
+
+        _, kind, col, arg = preds[0]
+        if kind == "range":
+            a, b = arg
+            pos = np.sort(self._cols[col][1][a:b])
+        elif arg < 0:
+            pos = np.zeros(0, dtype=np.intp)
+        else:
+            order, bounds = self._text[col][2], self._text[col][3]
+            pos = order[bounds[arg] : bounds[arg + 1]].copy()
+
+        for _, kind, other, arg in preds[1:]:
+            if not len(pos):
+                break
+            if kind == "text":
+                pos = pos[self._text[other][0][pos] == arg]
+                continue
+            vals = self._cols[other][0][pos]
+            lo, hi = ranges[other]
+            keep = np.ones(len(pos), dtype=bool)
+            if lo is not None:
+                keep &= vals >= lo
+            if hi is not None:
+                keep &= vals <= hi
+            pos = pos[keep]
+        return pos, applied
+
+
+def get_index(df: pd.DataFrame) -> ListingIndex:
+    return derived(df, "listing_index", ListingIndex)
@@ -0,0 +1,99 @@
+"""
+Żywy zbiór ofert: bieżąca ramka + przyrostowe odświeżanie.
+
+Ramki traktujemy jako niemutowalne – każda zmiana (delta z feedu albo zmieniony
+plik CSV) daje nową ramkę, na którą engines.data przenosi struktury pochodne
+starej (lokalizacje, miasta, słownik, agregaty cen) zaktualizowane tylko o deltę.
+Podmiana ramki jest atomowa; trwające zapytania kończą na starej.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from . import data
+
+
+def _stat_key(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class LiveDataset:
+    def __init__(self, path: str = "mieszkania.csv", compact: bool = False):
+        self.path = path
+        self.compact = compact
+        self._lock = threading.Lock()
+        self._stat = _stat_key(path)
+        self._df = data.load_csv(path, compact=compact)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_refresh: Dict[str, Any] = {}
+        self.listeners: List[Callable[[pd.DataFrame], None]] = []
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self._df
+
+    def _swap(self, new: pd.DataFrame, report: Dict[str, Any]) -> None:
+        self._df = new
+        self.last_refresh = dict(report, at=time.time())
+        for fn in self.listeners:
+            try:
+                fn(new)
+            except Exception:
+                pass
+
+    def apply(self, added=None, changed=None, removed=None, raw: bool = True) -> pd.DataFrame:
+        """Nakłada deltę z feedu (wiersze dodane/zmienione, id usunięte) na bieżącą ramkę."""
+        with self._lock:
+            t0 = time.perf_counter()
+            new = data.apply_delta(self._df, added, changed, removed, raw=raw)
+            self._swap(new, {
+                "full": False,
+                "added": 0 if added is None else len(added),
+                "changed": 0 if changed is None else len(changed),
+                "removed": len(removed or []),
+                "seconds": time.perf_counter() - t0,
+            })
+            return new
+
+    def refresh(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Odświeża z pliku, jeśli zmienił się jego rozmiar/mtime; zwraca raport albo None."""
+        with self._lock:
+            key = _stat_key(self.path)
+            if key is None or (key == self._stat and not force):
+                return None
+            new, report = data.refresh_from_file(self._df, self.path)
+            self._stat = key
+            self._swap(new, report)
+            return self.last_refresh
+
+    def _loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # plik w trakcie zapisu / chwilowo niepoprawny – spróbujemy w kolejnym cyklu
+                self.last_refresh = {"error": str(e), "at": time.time()}
+
+    def watch(self, interval: float = 5.0) -> None:
+        """Uruchamia wątek sprawdzający plik co `interval` sekund (idempotentne)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, args=(interval,), name="asystent-csv-watch", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,165 @@
+"""
+Cache odpowiedzi LLM: LRU w pamięci + SQLite na dysku (TTL i limit liczby wpisów).
+
+Klucz to hash (prompt, provider, model, temperature, wersja zbioru), więc zmiana
+danych albo ustawień odpowiedzi nigdy nie trafi na starą odpowiedź.
+Połączenie SQLite otwieramy per operacja – cache jest bezpieczny między wątkami
+(strumieniowanie odpowiedzi) i procesami serwera.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CACHE_ENV = "LLM_CACHE"  # "0" wyłącza cache
+CACHE_PATH_ENV = "LLM_CACHE_PATH"
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_ROWS = 5_000
+DEFAULT_MEMORY_SIZE = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+)
+"""
+
+
+def cache_key(prompt: str, provider: str, model: str, temperature: float, dataset_version: Optional[str]) -> str:
+    payload = json.dumps(
+        [prompt, provider, model, round(float(temperature), 3), dataset_version or ""],
+        ensure_ascii=False,
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def default_path() -> Path:
+    p = os.getenv(CACHE_PATH_ENV)
+    if p:
+        return Path(p)
+    return Path(os.getenv("ASYSTENT_CACHE_DIR") or ".cache") / "llm-answers.sqlite"
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = DEFAULT_TTL,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        memory_size: int = DEFAULT_MEMORY_SIZE,
+    ):
+        self.path = Path(path) if path else default_path()
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory_size = memory_size
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (text, created)
+        self._lock = threading.Lock()
+        self._disk_ok = True
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self._disk_ok:
+            return None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=5)
+            conn.execute(_SCHEMA)
+            return conn
+        except (OSError, sqlite3.Error):
+            # katalog tylko do odczytu itp. – zostaje sam cache w pamięci
+            self._disk_ok = False
+            return None
+
+    def _remember(self, key: str, text: str, created: float) -> None:
+        self._mem[key] = (text, created)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_size:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None and now - hit[1] <= self.ttl:
+                self._mem.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return hit[0]
+            self._mem.pop(key, None)
+        row = None
+        conn = self._connect()
+        if conn is not None:
+            try:
+                with conn:
+                    row = conn.execute(
+                        "SELECT text, created FROM answers WHERE key = ? AND created >= ?",
+                        (key, now - self.ttl),
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute("UPDATE answers SET used = ? WHERE key = ?", (now, key))
+            except sqlite3.Error:
+                row = None
+            finally:
+                conn.close()
+        with self._lock:
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key: str, text: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, text, now)
+            self.counters["stores"] += 1
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO answers (key, text, created, used) VALUES (?, ?, ?, ?)",
+                    (key, text, now, now),
+                )
+                evicted = conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,)).rowcount
+                # limit rozmiaru: wyrzucamy najdawniej używane
+                evicted += conn.execute(
+                    "DELETE FROM answers WHERE key IN ("
+                    " SELECT key FROM answers ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                ).rowcount
+            with self._lock:
+                self.counters["evictions"] += max(evicted, 0)
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        conn = self._connect()
+        if conn is not None:
+            try:
+                with conn:
+                    conn.execute("DELETE FROM answers")
+            finally:
+                conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.counters)
+        hits = c["memory_hits"] + c["disk_hits"]
+        total = hits + c["misses"]
+        c["hit_rate"] = hits / total if total else 0.0
+        c["memory_size"] = len(self._mem)
+        c["path"] = str(self.path) if self._disk_ok else None
+        return c
@@ -0,0 +1,298 @@
+"""
+Klienci LLM współdzieleni w procesie + bezpieczniki.
+
+- Klient per (provider, model, base_url) tworzony raz – połączenia keep-alive
+  i TLS są używane ponownie między zapytaniami.
+- Każde wywołanie ma deadline (LLM_TIMEOUT, s) na całość – połączenie, nagłówki
+  i treść odpowiedzi, a nie tylko na pojedynczy odczyt z gniazda. Klienci openai
+  i ollama pilnują tylko pojedynczych odczytów, więc call_with_deadline() czeka
+  na wynik z wątku puli najwyżej LLM_TIMEOUT – dla każdego providera.
+- CircuitBreaker po serii błędów lub zbyt wolnych odpowiedzi przestaje wołać
+  providera na `reset_after` sekund (od razu fallback), potem wpuszcza jedną próbę.
+- Provider "http" mówi protokołem OpenAI /chat/completions przez samą bibliotekę
+  standardową (LLM_BASE_URL) – serwery zgodne z OpenAI albo lokalny fake w testach.
+"""
+import http.client
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_TIMEOUT = 20.0
+DEFAULT_SLOW_CALL = 15.0
+DEFAULT_FAILURES = 3
+DEFAULT_RESET_AFTER = 30.0
+# wątki na blokujące wywołania LLM (call_with_deadline)
+DEFAULT_CALL_THREADS = 16
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def call_timeout() -> float:
+    return _env_float("LLM_TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def base_url() -> Optional[str]:
+    return os.getenv("LLM_BASE_URL") or None
+
+
+class CircuitBreaker:
+    """closed → (N porażek/wolnych wywołań z rzędu) → open → (reset_after) → half-open → 1 próba."""
+
+    def __init__(self, failures: int = DEFAULT_FAILURES, slow_call: float = DEFAULT_SLOW_CALL,
+                 reset_after: float = DEFAULT_RESET_AFTER):
+        self.max_failures = failures
+        self.slow_call = slow_call
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe = False
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probe:
+                self._probe = True  # tylko jedno wywołanie próbne naraz
+                return True
+            return False
+
+    def record(self, ok: bool, seconds: float = 0.0, error: Optional[str] = None) -> None:
+        """Wynik wywołania; udane, ale wolniejsze niż slow_call liczy się jak porażka."""
+        if ok and seconds > self.slow_call:
+            ok, error = False, f"wolna odpowiedź ({seconds:.1f} s)"
+        with self._lock:
+            self._probe = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            self.last_error = error
+            if self.failures >= self.max_failures or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+    def status(self) -> Dict[str, Any]:
+        retry_in = None
+        if self.opened_at is not None:
+            retry_in = max(0.0, self.reset_after - (time.monotonic() - self.opened_at))
+        return {"state": self.state, "failures": self.failures, "retry_in": retry_in,
+                "last_error": self.last_error}
+
+
+class HttpChatClient:
+    """
+    Minimalny klient OpenAI-compatible /chat/completions z pulą połączeń keep-alive:
+    połączenie jest wypożyczane na czas jednego wywołania (także całego strumienia)
+    i wraca do puli dopiero po pełnym odczycie odpowiedzi. `timeout` to deadline całego
+    wywołania: przed każdym odczytem gniazdo dostaje tylko pozostały czas.
+    """
+
+    def __init__(self, url: str, api_key: str = "", timeout: float = DEFAULT_TIMEOUT, max_idle: int = 8):
+        parts = urlsplit(url.rstrip("/"))
+        self.scheme, self.netloc = parts.scheme or "http", parts.netloc
+        self.path = (parts.path or "") + "/chat/completions"
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.netloc, timeout=self.timeout)
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @staticmethod
+    def _remaining(conn: http.client.HTTPConnection, deadline: float) -> None:
+        """Timeout gniazda = czas do deadline'u; po deadlinie TimeoutError bez kolejnego odczytu."""
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise TimeoutError("przekroczony deadline wywołania LLM")
+        if conn.sock is not None:
+            conn.sock.settimeout(left)
+        else:
+            conn.timeout = left
+
+    def _post(self, body: Dict[str, Any], deadline: float):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        payload = json.dumps(body).encode("utf-8")
+        for attempt in (0, 1):
+            conn = self._acquire()
+            try:
+                self._remaining(conn, deadline)
+                conn.request("POST", self.path, body=payload, headers=headers)
+                self._remaining(conn, deadline)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # serwer zamknął bezczynne połączenie keep-alive – jedna ponowna próba
+                conn.close()
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                conn.close()
+                raise
+            if resp.status >= 400:
+                detail = resp.read()[:200]
+                conn.close()
+                raise RuntimeError(f"HTTP {resp.status}: {detail!r}")
+            return conn, resp
+        raise RuntimeError("unreachable")
+
+    def _chunks(self, conn: http.client.HTTPConnection, resp, deadline: float) -> Iterator[bytes]:
+        """
+        Treść odpowiedzi kawałkami. read1 to co najwyżej jeden odczyt z gniazda, więc
+        serwer sączący bajty (każdy tuż przed timeoutem) nie przeciągnie wywołania poza deadline.
+        """
+        while True:
+            self._remaining(conn, deadline)
+            chunk = resp.read1(1 << 16)
+            if not chunk:
+                break
+            yield chunk
+        resp.read()  # zamyka odpowiedź (read1 nie robi tego po Content-Length)
+
+    def complete(self, model: str, messages, temperature: float) -> str:
+        deadline = time.monotonic() + self.timeout
+        conn, resp = self._post({"model": model, "messages": messages, "temperature": temperature}, deadline)
+        try:
+            data = json.loads(b"".join(self._chunks(conn, resp, deadline)))
+        except Exception:
+            conn.close()
+            raise
+        self._release(conn)
+        return data["choices"][0]["message"]["content"]
+
+    def stream(self, model: str, messages, temperature: float) -> Iterator[str]:
+        deadline = time.monotonic() + self.timeout
+        conn, resp = self._post(
+            {"model": model, "messages": messages, "temperature": temperature, "stream": True}, deadline
+        )
+        try:
+            chunks = self._chunks(conn, resp, deadline)
+            pending = b""
+            for chunk in chunks:
+                *lines, pending = (pending + chunk).split(b"\n")
+                for raw in lines:
+                    line = raw.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        for _ in chunks:  # reszta odpowiedzi, nadal w deadlinie
+                            pass
+                        self._release(conn)
+                        return
+                    choices = json.loads(data).get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+            raise ConnectionError("strumień urwany przed [DONE]")
+        except BaseException:
+            # także przerwany odbiór (GeneratorExit) – połączenie w połowie odpowiedzi nie wraca do puli
+            conn.close()
+            raise
+
+
+_CLIENTS: Dict[Tuple, Any] = {}
+_BREAKERS: Dict[Tuple[str, str], CircuitBreaker] = {}
+_LOCK = threading.Lock()
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def get_client(provider: str, kind: str = "sync"):
+    """
+    Klient dla providera z bieżącej konfiguracji (LLM_API_KEY, LLM_BASE_URL, LLM_TIMEOUT),
+    tworzony raz na proces. `kind` = "sync" albo "async" (openai/ollama mają osobne klasy).
+    """
+    api_key = os.getenv("LLM_API_KEY", "")
+    url = base_url()
+    timeout = call_timeout()
+    key = (provider, kind, api_key, url, timeout)
+    with _LOCK:
+        client = _CLIENTS.get(key)
+        if client is not None:
+            return client
+        if provider == "openai":
+            from openai import AsyncOpenAI, OpenAI
+            cls = AsyncOpenAI if kind == "async" else OpenAI
+            client = cls(api_key=api_key, base_url=url, timeout=timeout, max_retries=0)
+        elif provider == "ollama":
+            import ollama
+            cls = ollama.AsyncClient if kind == "async" else ollama.Client
+            client = cls(host=url, timeout=timeout)
+        elif provider == "http":
+            if not url:
+                raise RuntimeError("LLM_PROVIDER=http wymaga LLM_BASE_URL")
+            client = HttpChatClient(url, api_key, timeout)
+        else:
+            raise ValueError(f"Nieznany provider LLM: {provider}")
+        _CLIENTS[key] = client
+        return client
+
+
+def call_with_deadline(fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+    """
+    fn(*args) w wątku puli, wynik najpóźniej po `timeout` s (domyślnie LLM_TIMEOUT),
+    inaczej TimeoutError. Spóźnione wywołanie dobiega końca w tle, ale nikt na nie nie czeka.
+    """
+    global _EXECUTOR
+    timeout = call_timeout() if timeout is None else timeout
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(DEFAULT_CALL_THREADS, thread_name_prefix="asystent-llm")
+        executor = _EXECUTOR
+    future = executor.submit(fn, *args)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"przekroczony deadline LLM ({timeout:.1f} s)") from None
+
+
+def breaker(provider: str, model: str) -> CircuitBreaker:
+    with _LOCK:
+        b = _BREAKERS.get((provider, model))
+        if b is None:
+            b = _BREAKERS[(provider, model)] = CircuitBreaker(
+                failures=int(_env_float("LLM_BREAKER_FAILURES", DEFAULT_FAILURES)),
+                slow_call=_env_float("LLM_SLOW_CALL", DEFAULT_SLOW_CALL),
+                reset_after=_env_float("LLM_BREAKER_RESET", DEFAULT_RESET_AFTER),
+            )
+        return b
+
+
+def reset() -> None:
+    """Zamyka pulę i zeruje bezpieczniki (testy, zmiana konfiguracji)."""
+    with _LOCK:
+        _CLIENTS.clear()
+        _BREAKERS.clear()
@@ -0,0 +1,185 @@
+"""
+Test obciążeniowy serwisu engines.server: req/s oraz p50/p99 opóźnienia per endpoint.
+
+Każdy z `--concurrency` klientów trzyma własne połączenie keep-alive i wysyła kolejne
+zapytania (SAMPLE_QUERIES z engines.bench albo JSONL jak w engines.batch) przez
+`--duration` sekund lub `--requests` żądań. Z `--serve` skrypt sam uruchamia serwis
+z lokalnym LLM "stub" (LLM_STUB_DELAY = czas generowania, cache odpowiedzi wyłączony),
+więc mierzy też równoległe wywołania LLM bez sieci.
+
+    python -m engines.loadtest --serve --endpoint search answer --concurrency 32 --duration 10
+    python -m engines.loadtest --url http://127.0.0.1:8080 --endpoint search --requests 5000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+
+from .batch import parse_line
+from .bench import SAMPLE_QUERIES
+
+
+async def _request(reader, writer, host: str, path: str):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    body = await reader.readexactly(length) if length else b""
+    return status, body
+
+
+async def _client(host: str, port: int, endpoint: str, queries, deadline: float, budget, samples,
+                  errors: Counter, sources: Counter) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline and next(budget, None) is not None:
+            path = f"/{endpoint}?q={quote(next(queries))}"
+            t = time.perf_counter()
+            try:
+                status, body = await _request(reader, writer, host, path)
+            except (ConnectionError, asyncio.IncompleteReadError, IndexError, ValueError) as e:
+                errors[type(e).__name__] += 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            samples.append(time.perf_counter() - t)
+            if status != 200:
+                errors[f"HTTP {status}"] += 1
+            elif endpoint == "answer":
+                sources[json.loads(body).get("source")] += 1
+    finally:
+        writer.close()
+
+
+async def run_load(url: str, endpoint: str, queries: List[str], concurrency: int = 32,
+                   duration: float = 10.0, requests: Optional[int] = None) -> Dict[str, Any]:
+    """Obciążenie jednego endpointu; wynik: req/s, p50/p90/p99 ms, błędy (i źródła odpowiedzi)."""
+    parts = urlsplit(url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    deadline = time.perf_counter() + (duration if requests is None else 1e9)
+    budget = itertools.repeat(1) if requests is None else iter(range(requests))
+    cycle = itertools.cycle(queries)
+    samples: List[float] = []
+    errors: Counter = Counter()
+    sources: Counter = Counter()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, endpoint, cycle, deadline, budget, samples, errors, sources)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - t0
+    out: Dict[str, Any] = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": dict(errors),
+        "seconds": round(elapsed, 3),
+        "req_per_s": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+    }
+    if samples:
+        ms = np.asarray(samples) * 1000
+        out.update({f"p{q}_ms": round(float(np.percentile(ms, q)), 2) for q in (50, 90, 99)})
+    if sources:
+        out["sources"] = dict(sources)
+    return out
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub_server(data: str, stub_delay: float, threads: Optional[int] = None,
+                      timeout: float = 120.0):
+    """Serwis w podprocesie z LLM_PROVIDER=stub; zwraca (proces, url), gdy port przyjmuje połączenia."""
+    port = _free_port()
+    env = dict(os.environ, LLM_PROVIDER="stub", LLM_STUB_DELAY=str(stub_delay), LLM_CACHE="0")
+    cmd = [sys.executable, "-m", "engines.server", "--port", str(port), "--data", data]
+    if threads:
+        cmd += ["--threads", str(threads)]
+    proc = subprocess.Popen(cmd, env=env)
+    url = f"http://127.0.0.1:{port}"
+    until = time.time() + timeout
+    while time.time() < until:
+        if proc.poll() is not None:
+            raise RuntimeError(f"serwis zakończył się kodem {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return proc, url
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("serwis nie wystartował")
+
+
+def _load_queries(path: Optional[str]) -> List[str]:
+    if not path:
+        return list(SAMPLE_QUERIES)
+    with open(path, encoding="utf-8") as fh:
+        items = [parse_line(line, n) for n, line in enumerate(fh)]
+    return [it["query"] for it in items if it and it.get("query")]
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Test obciążeniowy engines.server")
+    ap.add_argument("--url", default=None, help="adres działającego serwisu")
+    ap.add_argument("--serve", action="store_true", help="uruchom serwis ze stub LLM w podprocesie")
+    ap.add_argument("--data", default="mieszkania.csv", help="plik z ofertami (dla --serve)")
+    ap.add_argument("--stub-delay", type=float, default=0.2, help="czas generowania stub LLM (s)")
+    ap.add_argument("--threads", type=int, default=None, help="wątki serwisu (dla --serve)")
+    ap.add_argument("--endpoint", nargs="+", default=["search"], choices=["parse", "search", "answer"])
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--duration", type=float, default=10.0, help="sekundy na endpoint")
+    ap.add_argument("--requests", type=int, default=None, help="liczba żądań zamiast czasu")
+    ap.add_argument("--queries", default=None, help="JSONL z zapytaniami (jak engines.batch)")
+    ap.add_argument("--json", default=None, help="zapisz wyniki do pliku JSON")
+    args = ap.parse_args(argv)
+    if not args.url and not args.serve:
+        ap.error("podaj --url albo --serve")
+
+    queries = _load_queries(args.queries)
+    proc, url = (None, args.url)
+    if args.serve:
+        proc, url = start_stub_server(args.data, args.stub_delay, args.threads)
+    results = []
+    try:
+        for endpoint in args.endpoint:
+            res = asyncio.run(run_load(url, endpoint, queries, args.concurrency,
+                                       args.duration, args.requests))
+            results.append(res)
+            print(
+                f"/{endpoint:<7} {res['requests']:>7} żądań  {res['req_per_s']:>8.1f} req/s  "
+                f"p50 {res.get('p50_ms', 0):>8.2f} ms  p99 {res.get('p99_ms', 0):>8.2f} ms  "
+                f"błędy {sum(res['errors'].values())}"
+                + (f"  źródła {res['sources']}" if "sources" in res else "")
+            )
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"url": url, "results": results}, fh, ensure_ascii=False, indent=2)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
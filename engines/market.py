@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Hashable, Optional, Tuple
+
+# Percentyle cena_m2 trzymane w agregatach (oprócz średniej, mediany i liczności)
+PERCENTILES = (10, 25, 75, 90)
+STAT_COLS = ["mean", "median", "count"] + [f"p{p}" for p in PERCENTILES]
+
+
+def _summary(vals: np.ndarray) -> Dict[str, Any]:
+    if not len(vals):
+        return {c: (0 if c == "count" else None) for c in STAT_COLS}
+    q = np.percentile(vals, (50,) + PERCENTILES)
+    out = {"mean": float(vals.mean()), "median": float(q[0]), "count": int(len(vals))}
+    out.update({f"p{p}": float(v) for p, v in zip(PERCENTILES, q[1:])})
+    return out
+
+
+class MarketAggregates:
+    """
+    Agregaty cena_m2 per miasto i per (miasto, lokalizacja), liczone raz przy wczytaniu.
+    Każda grupa trzyma posortowane wartości, więc dodanie/usunięcie ofert aktualizuje
+    tylko dotknięte grupy (mediana i percentyle zostają dokładne).
+    """
+
+    def __init__(self, df: Optional[pd.DataFrame] = None):
+        self._city: Dict[Hashable, np.ndarray] = {}
+        self._loc: Dict[Tuple[Hashable, Hashable], np.ndarray] = {}
+        self._summaries: Dict[Tuple[str, Hashable], Dict[str, Any]] = {}
+        self._tables: Dict[str, pd.DataFrame] = {}
+        if df is not None:
+            self.add(df)
+
+    @staticmethod
+    def _rows(df: pd.DataFrame):
+        """(klucze miasta, klucze lokalizacji, cena_m2) dla wierszy z ceną za m²."""
+        if df is None or df.empty or "cena_m2" not in df.columns or "miasto" not in df.columns:
+            return None
+        vals = pd.to_numeric(df["cena_m2"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        keep = ~np.isnan(vals)
+        city = df["miasto"].to_numpy(dtype=object)[keep]
+        loc = (
+            df["lokalizacja"].to_numpy(dtype=object)[keep]
+            if "lokalizacja" in df.columns
+            else None
+        )
+        return city, loc, vals[keep]
+
+    @staticmethod
+    def _split(keys: pd.Index, codes: np.ndarray, vals: np.ndarray):
+        """Wartości posortowane w obrębie grup: {klucz: posortowana tablica}."""
+        order = np.lexsort((vals, codes))
+        codes, vals = codes[order], vals[order]
+        bounds = np.searchsorted(codes, np.arange(len(keys) + 1))
+        return {keys[i]: vals[bounds[i] : bounds[i + 1]] for i in range(len(keys))}
+
+    @staticmethod
+    def _without(cur: np.ndarray, vals: np.ndarray) -> np.ndarray:
+        """Posortowane `cur` bez po jednym wystąpieniu każdej wartości z posortowanego `vals`."""
+        rank = np.arange(len(vals)) - np.searchsorted(vals, vals, side="left")
+        idx = np.searchsorted(cur, vals, side="left") + rank
+        ok = idx < len(cur)
+        ok[ok] = cur[idx[ok]] == vals[ok]
+        return np.delete(cur, idx[ok])
+
+    def _merge(self, kind: str, store: Dict, groups: Dict, sign: int):
+        for key, vals in groups.items():
+            cur = store.get(key, np.zeros(0))
+            new = np.sort(np.concatenate([cur, vals])) if sign > 0 else self._without(cur, vals)
+            if len(new):
+                store[key] = new
+            else:
+                store.pop(key, None)
+            self._summaries.pop((kind, key), None)
+        if groups:
+            self._tables.pop(kind, None)
+
+    def _apply(self, df: pd.DataFrame, sign: int):
+        rows = self._rows(df)
+        if rows is None:
+            return
+        city, loc, vals = rows
+        codes, keys = pd.factorize(city)
+        self._merge("city", self._city, self._split(pd.Index(keys, dtype=object), codes, vals), sign)
+        if loc is not None:
+            pairs = pd.MultiIndex.from_arrays([city, loc])
+            codes, keys = pd.factorize(pairs)
+            self._merge("loc", self._loc, self._split(keys, codes, vals), sign)
+
+    def copy(self) -> "MarketAggregates":
+        """Niezależna kopia (tablice grup są współdzielone – _merge ich nie modyfikuje w miejscu)."""
+        out = MarketAggregates()
+        out._city = dict(self._city)
+        out._loc = dict(self._loc)
+        out._summaries = dict(self._summaries)
+        out._tables = dict(self._tables)
+        return out
+
+    def add(self, df: pd.DataFrame) -> None:
+        """Dolicza oferty z ramki (np. nowe ogłoszenia z feedu)."""
+        self._apply(df, +1)
+
+    def remove(self, df: pd.DataFrame) -> None:
+        """Odejmuje oferty z ramki (wiersze w postaci sprzed usunięcia/zmiany)."""
+        self._apply(df, -1)
+
+    def stats(self, miasto, lokalizacja=None) -> Dict[str, Any]:
+        if lokalizacja is None:
+            kind, key, store = "city", miasto, self._city
+        else:
+            kind, key, store = "loc", (miasto, lokalizacja), self._loc
+        sk = (kind, key)
+        if sk not in self._summaries:
+            self._summaries[sk] = _summary(store.get(key, np.zeros(0)))
+        return self._summaries[sk]
+
+    def table(self, kind: str = "city") -> pd.DataFrame:
+        """Tabela statystyk: indeks miasto ("city") albo (miasto, lokalizacja) ("loc")."""
+        if kind not in self._tables:
+            store = self._city if kind == "city" else self._loc
+            keys = list(store.keys())
+            rows = [self.stats(*((k,) if kind == "city" else k)) for k in keys]
+            if kind == "city":
+                index = pd.Index(keys, dtype=object, name="miasto")
+            else:
+                index = pd.MultiIndex.from_tuples(keys, names=["miasto", "lokalizacja"])
+            self._tables[kind] = pd.DataFrame(rows, index=index, columns=STAT_COLS)
+        return self._tables[kind]
@@ -0,0 +1,169 @@
+"""
+Lekka instrumentacja silników: czasy etapów i liczniki wierszy.
+
+    with metrics.timer("filter"):
+        ...
+    metrics.count("rows_scored", n)
+
+Każdy etap ma histogram kroczący (ostatnie WINDOW próbek → p50/p90/p99) oraz
+skumulowane kubełki do eksportu w formacie Prometheus. Domyślnie wyłączone
+(ASYSTENT_METRICS=1 albo enable()); wyłączony timer to jeden wspólny obiekt
+bez pomiaru czasu, a count() kończy się na jednym sprawdzeniu flagi.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+import numpy as np
+
+WINDOW = 1024
+# Granice kubełków histogramu w sekundach (jak w klientach Prometheus)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.getenv("ASYSTENT_METRICS", "0") == "1"
+_lock = threading.Lock()
+
+
+class _Histogram:
+    __slots__ = ("window", "buckets", "count", "total")
+
+    def __init__(self):
+        self.window: Deque[float] = deque(maxlen=WINDOW)
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.window.append(seconds)
+        self.count += 1
+        self.total += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"count": self.count, "sum_ms": self.total * 1000}
+        if self.window:
+            q = np.percentile(np.fromiter(self.window, float), (50, 90, 99)) * 1000
+            out.update(p50_ms=float(q[0]), p90_ms=float(q[1]), p99_ms=float(q[2]),
+                       last_ms=self.window[-1] * 1000)
+        return out
+
+
+_stages: Dict[str, _Histogram] = {}
+_counters: Dict[str, float] = {}
+_last: Dict[str, float] = {}
+
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _Noop()
+
+
+class _Timer:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = on
+
+
+def timer(stage: str):
+    """Context manager mierzący etap `stage`; przy wyłączonych metrykach nic nie robi."""
+    return _Timer(stage) if _enabled else _NOOP
+
+
+def observe(stage: str, seconds: float) -> None:
+    if not _enabled:
+        return
+    with _lock:
+        h = _stages.get(stage)
+        if h is None:
+            h = _stages[stage] = _Histogram()
+        h.add(seconds)
+
+
+def count(name: str, n: float = 1) -> None:
+    """Licznik narastający (np. wiersze po filtrze); ostatnia wartość trafia też do `last`."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+        _last[name] = n
+
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _last.clear()
+
+
+def snapshot() -> Dict[str, Any]:
+    """Stan metryk jako słownik (do JSON / panelu debug)."""
+    with _lock:
+        return {
+            "enabled": _enabled,
+            "stages": {k: h.summary() for k, h in sorted(_stages.items())},
+            "counters": dict(sorted(_counters.items())),
+            "last": dict(sorted(_last.items())),
+        }
+
+
+def to_json() -> str:
+    return json.dumps(snapshot(), ensure_ascii=False)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def to_prometheus(prefix: str = "asystent") -> str:
+    """Eksport w formacie tekstowym Prometheus (histogramy etapów + liczniki)."""
+    lines: List[str] = []
+    with _lock:
+        stages = {k: (list(h.buckets), h.count, h.total) for k, h in _stages.items()}
+        counters = dict(_counters)
+    if stages:
+        name = f"{prefix}_stage_seconds"
+        lines += [f"# HELP {name} Czas etapu potoku.", f"# TYPE {name} histogram"]
+        for stage, (buckets, n, total) in sorted(stages.items()):
+            cum = 0
+            for bound, c in zip(BUCKETS, buckets):
+                cum += c
+                lines.append(f'{name}_bucket{{stage="{_label(stage)}",le="{bound}"}} {cum}')
+            lines.append(f'{name}_bucket{{stage="{_label(stage)}",le="+Inf"}} {n}')
+            lines.append(f'{name}_sum{{stage="{_label(stage)}"}} {total}')
+            lines.append(f'{name}_count{{stage="{_label(stage)}"}} {n}')
+    for key, value in sorted(counters.items()):
+        name = f"{prefix}_{key}_total"
+        lines += [f"# TYPE {name} counter", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -1,23 +1,45 @@
 import re
+from functools import lru_cache
 from typing import Dict, Any, Optional, Tuple, List
-from .utils import norm_text, to_int_safe, safe_range
+import numpy as np
+import pandas as pd
+from .utils import norm_text, to_int_safe, safe_range, is_missing, truthy
+from .data import bool_mask, norm_col, text_mask
+from .gazetteer import Gazetteer, covered_tokens, get_gazetteer
+from .textindex import matched_words, query_terms, terms
+from . import metrics
+
+# Wzorce parsera kompilowane raz, przy imporcie modułu
+_RE_DASH_RANGE = re.compile(r"(\d[\d\s\.,]*)\s*[-–—]\s*(\d[\d\s\.,]*)")
+_RE_FROM_TO = re.compile(r"od\s*([0-9][\d\s\.,]*)\s*do\s*([0-9][\d\s\.,]*)")
+_RE_FROM = re.compile(r"od\s*([0-9][\d\s\.,]*)")
+_RE_TO = re.compile(r"do\s*([0-9][\d\s\.,]*)")
+_RE_NUMBER = re.compile(r"([0-9][\d\s\.,]*)")
+_RE_PRICE_TO = re.compile(r"do\s*([0-9][\d\s\.,]*)(?:\s*(mln|mili|tys|k|zł|pln))?")
+_RE_PRICE_UNIT = re.compile(r"([0-9][\d\s\.,]*)(?:\s*(mln|mili|tys|k|zł|pln))")
+_RE_AREA = re.compile(r"(?:m2|m\u00b2|metraz|metraż|metr).*")
+_RE_ROOMS = re.compile(r"(poko(?:j|je|i).*)")
+_RE_FLOOR = re.compile(r"(pi[eę]tro.*)")
+
+# Cache wyników parse_query: popularne sformułowania się powtarzają
+PARSE_CACHE_SIZE = 4096
 
 
 def _parse_range_generic(text: str) -> Tuple[Optional[int], Optional[int]]:
     t = norm_text(text)
-    m = re.search(r"(\d[\d\s\.,]*)\s*[-–—]\s*(\d[\d\s\.,]*)", t)
+    m = _RE_DASH_RANGE.search(t)
     if m:
         return safe_range(to_int_safe(m.group(1)), to_int_safe(m.group(2)))
-    m = re.search(r"od\s*([0-9][\d\s\.,]*)\s*do\s*([0-9][\d\s\.,]*)", t)
+    m = _RE_FROM_TO.search(t)
     if m:
         return safe_range(to_int_safe(m.group(1)), to_int_safe(m.group(2)))
-    m = re.search(r"od\s*([0-9][\d\s\.,]*)", t)
+    m = _RE_FROM.search(t)
     if m:
         return (to_int_safe(m.group(1)), None)
-    m = re.search(r"do\s*([0-9][\d\s\.,]*)", t)
+    m = _RE_TO.search(t)
     if m:
         return (None, to_int_safe(m.group(1)))
-    m = re.search(r"([0-9][\d\s\.,]*)", t)
+    m = _RE_NUMBER.search(t)
     if m:
         x = to_int_safe(m.group(1))
         return (x, x)
@@ -27,12 +49,12 @@ def _parse_range_generic(text: str) -> Tuple[Optional[int], Optional[int]]:
 def parse_price_range(t: str):
     txt = norm_text(t)
     # „do 900k / do 900 tys / do 900000 zł”
-    m = re.search(r"do\s*([0-9][\d\s\.,]*)(?:\s*(mln|mili|tys|k|zł|pln))?", txt)
+    m = _RE_PRICE_TO.search(txt)
     if m:
         num = (m.group(1) or "") + (m.group(2) or "")
         return (None, to_int_safe(num))
     # Pojedyncza liczba z jednostką → traktujemy jako max
-    m = re.search(r"([0-9][\d\s\.,]*)(?:\s*(mln|mili|tys|k|zł|pln))", txt)
+    m = _RE_PRICE_UNIT.search(txt)
     if m:
         num = (m.group(1) or "") + (m.group(2) or "")
         return (None, to_int_safe(num))
@@ -40,12 +62,12 @@ def parse_price_range(t: str):
 
 
 def parse_area_range(t: str):
-    m = re.search(r"(?:m2|m\u00b2|metraz|metraż|metr).*", norm_text(t))
+    m = _RE_AREA.search(norm_text(t))
     return _parse_range_generic(m.group(0) if m else t)
 
 
 def parse_rooms_range(t: str):
-    m = re.search(r"(poko(?:j|je|i).*)", norm_text(t))
+    m = _RE_ROOMS.search(norm_text(t))
     return _parse_range_generic(m.group(1) if m else t)
 
 
@@ -53,14 +75,60 @@ def parse_floor_range(t: str):
     txt = norm_text(t)
     if "parter" in txt:
         return (0, 0)
-    m = re.search(r"(pi[eę]tro.*)", txt)
+    m = _RE_FLOOR.search(txt)
     return _parse_range_generic(m.group(1) if m else t)
 
 
 def parse_query(
-    q: str, locations: Optional[List[str]] = None, cities: Optional[List[str]] = None
+    q: str,
+    locations: Optional[List[str]] = None,
+    cities: Optional[List[str]] = None,
+    gazetteer: Optional[Gazetteer] = None,
 ) -> Dict[str, Any]:
-    t = norm_text(q)
+    """
+    Zapytanie w języku naturalnym → słownik filtrów. Wynik jest cache'owany (LRU)
+    po znormalizowanym zapytaniu i wersji słownika miast/lokalizacji.
+    """
+    with metrics.timer("parse"):
+        if gazetteer is None and (locations or cities):
+            gazetteer = get_gazetteer(locations, cities)
+        return dict(_parse_normalized(norm_text(q), gazetteer))
+
+
+def parse_cache_info() -> Dict[str, Any]:
+    info = _parse_normalized.cache_info()
+    total = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hit_rate": info.hits / total if total else None,
+    }
+
+
+def parse_cache_clear() -> None:
+    _parse_normalized.cache_clear()
+
+
+# Słowa person i współlokatora (dopasowanie podciągiem)
+_SINGLE_WORDS = ["singiel", "singla", "singlowe", "singlem", "solo", "dla singla", "dla singli"]
+_COUPLE_WORDS = ["para", "pary", "dla pary", "we dwoje", "dla dwojga", "małżeństwo", "malzenstwo"]
+_STUDENT_WORDS = ["student", "studenci", "dla studenta", "dla studentów", "dla studentow", "stud"]
+_FAMILY_WORDS = ["rodzina", "rodzinne", "dla rodziny", "dzieci", "2+1", "2+2", "3+1"]
+_ROOMMATE_WORDS = ["współlokator", "wspollokator", "roommate", "co-living", "coliving", "pokój", "pokoj", "pokojowe", "na pokój"]
+# Rdzenie słów, które parser zamienia na filtry – nie liczą się drugi raz w trafności opisu
+_STRUCTURED_STEMS = frozenset(
+    s
+    for w in ["balkon", "winda", "najtańsze", "dwoje", "dwojga"]
+    + _SINGLE_WORDS + _COUPLE_WORDS + _STUDENT_WORDS + _FAMILY_WORDS + _ROOMMATE_WORDS
+    for s in terms(w)
+)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_normalized(t: str, gazetteer: Optional[Gazetteer]) -> Dict[str, Any]:
+    # Wynik trafia do cache – parse_query oddaje jego kopię
     res: Dict[str, Any] = {
         "miasto": None,
         "lokalizacja": None,
@@ -72,27 +140,30 @@ def parse_query(
         "winda": None,
         "sort": "score",
         "limit": 50,
+        # dopasowanie rozmyte (literówka) to nie filtr, tylko podpowiedź: nazwa i podobieństwo;
+        # oferty z tej lokalizacji dostają premię w score pomnożoną przez podobieństwo
+        "miasto_fuzzy": None,
+        "miasto_score": None,
+        "lokalizacja_fuzzy": None,
+        "lokalizacja_score": None,
+        # słowa do dopasowania z opisem oferty (BM25, engines.textindex), bez słów
+        # użytych już przez parser – ustawiane na końcu
+        "opis_terms": None,
         # nowe sygnały:
         "persona": None,
         "roommate_intent": False,
     }
 
-    # Miasto / lokalizacja (słownikami)
-    if cities:
-        for c in cities:
-            if norm_text(c) in t:
-                res["miasto"] = c
-                break
-    if locations:
-        for loc in locations:
-            ln = norm_text(loc)
-            if ln and (
-                ln in t
-                or re.search(rf"\bna\s+{ln}\b", t)
-                or re.search(rf"\bw\s+{ln}\b", t)
-            ):
-                res["lokalizacja"] = loc
-                break
+    # Miasto / lokalizacja (słownikami) – jedno przejście trie, najdłuższe dopasowanie;
+    # czego trie nie znalazło, szukamy rozmycie po trigramach („Jerzyce”) – bez twardego filtra,
+    # bo fałszywe trafienie („rata” → Rataje) usuwałoby poprawne wyniki
+    if gazetteer is not None:
+        for kind, (name, score) in gazetteer.match(t).items():
+            if score < 1.0:
+                res[f"{kind}_fuzzy"] = name
+                res[f"{kind}_score"] = round(score, 3)
+            else:
+                res[kind] = name
 
     # Zakresy
     cr = parse_price_range(t)
@@ -118,13 +189,12 @@ def parse_query(
     # =========================
     # Persony / kategorie użytkownika + roommate intent
     # =========================
-    is_single = any(w in t for w in ["singiel", "singla", "singlowe", "singlem", "solo", "dla singla", "dla singli"])
-    is_couple = any(w in t for w in ["para", "pary", "dla pary", "we dwoje", "dla dwojga", "małżeństwo", "malzenstwo"])
-    is_students = any(w in t for w in ["student", "studenci", "dla studenta", "dla studentów", "dla studentow", "stud"])
-    is_family = any(w in t for w in ["rodzina", "rodzinne", "dla rodziny", "dzieci", "2+1", "2+2", "3+1"])
+    is_single = any(w in t for w in _SINGLE_WORDS)
+    is_couple = any(w in t for w in _COUPLE_WORDS)
+    is_students = any(w in t for w in _STUDENT_WORDS)
+    is_family = any(w in t for w in _FAMILY_WORDS)
 
-    roommate_words = ["współlokator", "wspollokator", "roommate", "co-living", "coliving", "pokój", "pokoj", "pokojowe", "na pokój"]
-    res["roommate_intent"] = any(w in t for w in roommate_words)
+    res["roommate_intent"] = any(w in t for w in _ROOMMATE_WORDS)
 
     if is_family:
         res["persona"] = "family"
@@ -161,25 +231,54 @@ def parse_query(
     elif "najmniejsz" in t or "metraż rosn" in t:
         res["sort"] = "metraz_asc"
 
+    res["opis_terms"] = _opis_terms(t, res)
     return res
 
 
+def _opis_terms(t: str, res: Dict[str, Any]) -> Optional[Tuple[str, ...]]:
+    """Słowa zapytania dla BM25 opisu – bez tych, które zużył już parser (nazwy, balkon, persony…)."""
+    words = query_terms(t)
+    if not words:
+        return None
+    names = [res[k] for k in ("miasto", "lokalizacja", "miasto_fuzzy", "lokalizacja_fuzzy") if res.get(k)]
+    used = covered_tokens(t, names) if names else set()
+    out = tuple(w for w in words if w not in used and not any(_structured(s) for s in terms(w)))
+    return out or None
+
+
+def _structured(stem: str) -> bool:
+    # dłuższe rdzenie także jako prefiks: „dziecmi” ~ „dziec”, „balkonowe” ~ „balkon”
+    return stem in _STRUCTURED_STEMS or any(
+        len(s) >= 5 and stem.startswith(s) for s in _STRUCTURED_STEMS
+    )
+
+
+def _row_norm(row, col: str) -> str:
+    # Wiersz z normalize_df ma już gotową wartość znormalizowaną (kategoria)
+    v = row.get(norm_col(col))
+    if isinstance(v, str):
+        return v
+    raw = row.get(col, "")
+    return "" if is_missing(raw) else norm_text(str(raw))
+
+
 def compute_score(row, f: Dict[str, Any]) -> float:
     # Prostota i stabilność; w razie potrzeby doważymy pod persony na Twoje zlecenie
     score = 0.0
-    if f.get("balkon") is not None:
-        score += 2.0 if row.get("balkon") == f["balkon"] else 0.0
-    if f.get("winda") is not None:
-        score += 2.0 if row.get("winda") == f["winda"] else 0.0
-    if f.get("miasto") and norm_text(row.get("miasto", "")) == norm_text(f["miasto"]):
-        score += 1.5
-    if f.get("lokalizacja") and norm_text(row.get("lokalizacja", "")) == norm_text(
-        f["lokalizacja"]
-    ):
-        score += 2.0
+    for col in ["balkon", "winda"]:
+        if f.get(col) is not None:
+            v = row.get(col)
+            score += 2.0 if v is not pd.NA and v == f[col] else 0.0
+    for col, bonus in [("miasto", 1.5), ("lokalizacja", 2.0)]:
+        if f.get(col):
+            score += bonus if _row_norm(row, col) == norm_text(f[col]) else 0.0
+        elif f.get(f"{col}_fuzzy"):
+            if _row_norm(row, col) == norm_text(f[f"{col}_fuzzy"]):
+                score += bonus * float(f.get(f"{col}_score") or 0.0)
 
     def rs(val, rng, scale=1.0):
-        if val is None or rng is None:
+        # pd.NA jak None (row.to_dict() i tak zamienia pd.NA na None)
+        if val is None or val is pd.NA or rng is None:
             return 0.0
         lo, hi = rng
         if lo is not None and val < lo:
@@ -195,15 +294,88 @@ def compute_score(row, f: Dict[str, Any]) -> float:
     return float(round(score, 4))
 
 
+# =========================
+# Kolumnowy scoring (te same reguły co compute_score, ale na całej ramce naraz)
+# =========================
+_is_none = np.frompyfunc(lambda v: v is None or v is pd.NA, 1, 1)
+
+
+def _rs_vec(series: Optional[pd.Series], n: int, rng, scale: float = 1.0) -> np.ndarray:
+    if series is None or rng is None:
+        return np.zeros(n)
+    vals = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    out = np.full(n, float(scale))
+    lo, hi = rng
+    below = np.zeros(n, dtype=bool)
+    if lo is not None:
+        below = vals < lo
+        near = np.maximum(0.0, 1 - (lo - vals) / max(lo, 1)) * scale * 0.5
+        out = np.where(below, near, out)
+    if hi is not None:
+        above = (vals > hi) & ~below
+        near = np.maximum(0.0, 1 - (vals - hi) / max(hi, 1)) * scale * 0.5
+        out = np.where(above, near, out)
+    # None i pd.NA w kolumnie object → 0 pkt, jak w compute_score; NaN zostaje jak jest
+    # (porównania z NaN są fałszywe → pełna skala) – dlatego nie series.isna()
+    if series.dtype == object:
+        out = np.where(_is_none(series.to_numpy()), 0.0, out)
+    return out
+
+
+def compute_scores(
+    df: pd.DataFrame, f: Dict[str, Any], positions: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Wektorowa wersja compute_score: zwraca tablicę score'ów (float64) w kolejności wierszy df
+    (albo tylko dla pozycji iloc z `positions`, bez kopiowania ramki).
+    Wyniki są identyczne z compute_score(row.to_dict(), f) dla każdego wiersza.
+    """
+    n = len(df) if positions is None else len(positions)
+
+    def column(col):
+        return df[col] if positions is None else df[col].iloc[positions]
+
+    score = np.zeros(n)
+    for col in ["balkon", "winda"]:
+        if f.get(col) is not None and col in df.columns:
+            score += np.where(bool_mask(column(col), f[col]), 2.0, 0.0)
+    for col, bonus in [("miasto", 1.5), ("lokalizacja", 2.0)]:
+        if f.get(col):
+            score += np.where(text_mask(df, col, f[col], positions), bonus, 0.0)
+        elif f.get(f"{col}_fuzzy"):
+            fuzzy_bonus = bonus * float(f.get(f"{col}_score") or 0.0)
+            score += np.where(text_mask(df, col, f[f"{col}_fuzzy"], positions), fuzzy_bonus, 0.0)
+
+    for col, key, scale in [
+        ("cena", "cena_range", 2.0),
+        ("metraz", "metraz_range", 1.5),
+        ("pokoje", "pokoje_range", 1.2),
+        ("pietro", "pietro_range", 0.8),
+    ]:
+        score += _rs_vec(column(col) if col in df.columns else None, n, f.get(key), scale)
+
+    out = np.round(score, 4)
+    # np.round i round() potrafią się rozjechać na „połówkach” – te nieliczne
+    # przypadki zaokrąglamy dokładnie tak jak compute_score
+    frac = score * 1e4 - np.floor(score * 1e4)
+    for i in np.flatnonzero(np.abs(frac - 0.5) < 1e-6):
+        out[i] = round(float(score[i]), 4)
+    return out
+
+
 def why_match(row, f: Dict[str, Any]) -> List[str]:
     reasons = []
     if f.get("miasto") and row.get("miasto"):
         reasons.append(f"Miasto: {row.get('miasto')}")
     if f.get("lokalizacja") and row.get("lokalizacja"):
         reasons.append(f"Lokalizacja: {row.get('lokalizacja')}")
+    for col, label in [("miasto", "Miasto"), ("lokalizacja", "Lokalizacja")]:
+        hint = f.get(f"{col}_fuzzy")
+        if hint and not f.get(col) and _row_norm(row, col) == norm_text(hint):
+            reasons.append(f"{label}: {row.get(col)} (podobna do zapytania)")
 
     def add(name, val, rng, unit=""):
-        if rng is None or val is None:
+        if rng is None or is_missing(val):
             return
         lo, hi = rng
         if (lo is None or val >= lo) and (hi is None or val <= hi):
@@ -216,9 +388,13 @@ def why_match(row, f: Dict[str, Any]) -> List[str]:
     add("Pokoje", row.get("pokoje"), f.get("pokoje_range"))
     add("Piętro", row.get("pietro"), f.get("pietro_range"))
     if f.get("balkon") is not None:
-        reasons.append("Balkon: tak" if row.get("balkon") else "Balkon: nie")
+        reasons.append("Balkon: tak" if truthy(row.get("balkon")) else "Balkon: nie")
     if f.get("winda") is not None:
-        reasons.append("Winda: tak" if row.get("winda") else "Winda: nie")
+        reasons.append("Winda: tak" if truthy(row.get("winda")) else "Winda: nie")
+    if f.get("opis_terms"):
+        words = matched_words(f["opis_terms"], row.get("opis"))
+        if words:
+            reasons.append("Opis: " + ", ".join(words))
     # persona i roommate tylko jako meta (nie wpływa na pojedynczą kartę w tekście powodów)
     return reasons
 
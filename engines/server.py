@@ -0,0 +1,309 @@
+"""
+Samodzielny serwis HTTP/JSON nad silnikami (bez Streamlit) – dla aplikacji mobilnej i widżetów.
+
+    GET  /parse?q=...                    → {"filters"}
+    GET  /search?q=...&top_k=10          → {"filters", "count", "results", "timings_ms"}
+    GET  /answer?q=...&style=zwięzły     → {"answer", "source", "ids", "timings_ms", ...}
+    POST na te same ścieżki z JSON {"query": ..., "top_k": ..., ...}
+    GET  /health, /metrics (Prometheus, engines.metrics)
+
+Zbiór jest wczytany raz (engines.live – z odświeżaniem po zmianie pliku). Pętla asyncio
+obsługuje połączenia (HTTP/1.1 keep-alive), parsowanie i ranking idą do puli wątków,
+a odpowiedzi LLM są strumieniami asynchronicznymi (AnswerStream) na tej samej pętli –
+wiele wywołań LLM naraz, ograniczonych semaforem. Tylko biblioteka standardowa.
+
+    python -m engines.server --port 8080 --data mieszkania.csv --threads 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+
+from . import data, metrics
+from .answers import AnswerStream, llm_status
+from .batch import DEFAULT_TOP_K, jsonable
+from .filters import filter_and_rank
+from .live import LiveDataset
+from .nl import parse_query
+
+MAX_BODY = 1 << 20
+MAX_TOP_K = 200
+DEFAULT_LLM_CONCURRENCY = 32
+_ANSWER_OPTS = ("style", "length", "temperature", "allow_llm")
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 431: "Request Header Fields Too Large",
+            500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _truthy_param(v: Any) -> bool:
+    if isinstance(v, bool):
+        return v
+    return str(v).strip().lower() in ("1", "true", "tak", "yes")
+
+
+def _params(query: str, body: bytes) -> Dict[str, Any]:
+    params: Dict[str, Any] = dict(parse_qsl(query))
+    if body:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HttpError(400, "niepoprawny JSON")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "oczekiwano obiektu JSON")
+        params.update(payload)
+    q = params.get("query", params.get("q"))
+    if not isinstance(q, str) or not q.strip():
+        raise HttpError(400, "brak zapytania (query / q)")
+    params["query"] = q
+    try:
+        params["top_k"] = max(1, min(int(params.get("top_k") or DEFAULT_TOP_K), MAX_TOP_K))
+        if "temperature" in params:
+            params["temperature"] = float(params["temperature"])
+    except (TypeError, ValueError):
+        raise HttpError(400, "top_k / temperature muszą być liczbami")
+    if "allow_llm" in params:
+        params["allow_llm"] = _truthy_param(params["allow_llm"])
+    return params
+
+
+def _records(df: pd.DataFrame) -> list:
+    return [jsonable(r) for r in df.to_dict("records")]
+
+
+class SearchService:
+    """Stan serwisu: bieżąca ramka, pula wątków na CPU i limit równoległych wywołań LLM."""
+
+    def __init__(self, live: LiveDataset, threads: Optional[int] = None,
+                 llm_concurrency: int = DEFAULT_LLM_CONCURRENCY):
+        self.live = live
+        self.executor = ThreadPoolExecutor(threads or min(8, os.cpu_count() or 1),
+                                           thread_name_prefix="asystent-rank")
+        self.llm_slots = asyncio.Semaphore(llm_concurrency)
+        self.started = time.time()
+        # struktury pochodne budujemy przy starcie, nie przy pierwszym zapytaniu
+        data.gazetteer(live.df)
+        data.text_index(live.df)
+
+    async def _cpu(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    @staticmethod
+    def _parse(df: pd.DataFrame, query: str) -> Dict[str, Any]:
+        return parse_query(query, gazetteer=data.gazetteer(df))
+
+    @staticmethod
+    def _search(df: pd.DataFrame, query: str, top_k: int) -> Tuple[Dict[str, Any], pd.DataFrame, Dict[str, float]]:
+        timings: Dict[str, float] = {}
+        t = time.perf_counter()
+        f = parse_query(query, gazetteer=data.gazetteer(df))
+        f["limit"] = top_k
+        timings["parse"] = (time.perf_counter() - t) * 1000
+        t = time.perf_counter()
+        res = filter_and_rank(df, f)
+        timings["filter_rank"] = (time.perf_counter() - t) * 1000
+        return f, res, timings
+
+    async def parse(self, p: Dict[str, Any]) -> Dict[str, Any]:
+        f = await self._cpu(self._parse, self.live.df, p["query"])
+        return {"query": p["query"], "filters": jsonable(f)}
+
+    async def search(self, p: Dict[str, Any]) -> Dict[str, Any]:
+        f, res, timings = await self._cpu(self._search, self.live.df, p["query"], p["top_k"])
+        return {
+            "query": p["query"],
+            "filters": jsonable(f),
+            "count": len(res),
+            "results": await self._cpu(_records, res),
+            "timings_ms": {k: round(v, 3) for k, v in timings.items()},
+        }
+
+    async def answer(self, p: Dict[str, Any]) -> Dict[str, Any]:
+        df = self.live.df
+        f, res, timings = await self._cpu(self._search, df, p["query"], p["top_k"])
+        opts = {k: p[k] for k in _ANSWER_OPTS if k in p}
+        stream = AnswerStream(f, res, top_k=min(3, p["top_k"]),
+                              dataset_version=data.dataset_version(df), **opts)
+        t = time.perf_counter()
+        async with self.llm_slots:
+            async for _ in stream:
+                pass
+        timings["answer"] = (time.perf_counter() - t) * 1000
+        return {
+            "query": p["query"],
+            "filters": jsonable(f),
+            "answer": stream.text,
+            "source": stream.source,
+            "ids": jsonable(res["id"].tolist()) if "id" in res.columns else [],
+            "ttft_ms": stream.metrics.get("ttft_ms"),
+            "timings_ms": {k: round(v, 3) for k, v in timings.items()},
+        }
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "rows": len(self.live.df),
+            "uptime_s": round(time.time() - self.started, 1),
+            "last_refresh": jsonable(self.live.last_refresh),
+            "llm": llm_status(),
+        }
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, str, bytes]:
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        if path == "/health":
+            return 200, "application/json", _dump(self.health())
+        if path == "/metrics":
+            return 200, "text/plain; version=0.0.4", metrics.to_prometheus().encode("utf-8")
+        handler = {"/parse": self.parse, "/search": self.search, "/answer": self.answer}.get(path)
+        if handler is None:
+            raise HttpError(404, f"nieznana ścieżka {path}")
+        if method not in ("GET", "POST"):
+            raise HttpError(405, "dozwolone GET i POST")
+        with metrics.timer("http" + path.replace("/", "_")):
+            out = await handler(_params(url.query, body))
+        return 200, "application/json", _dump(out)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Jedno połączenie: kolejne żądania HTTP/1.1 aż do Connection: close / EOF."""
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+                try:
+                    status, ctype, payload = await self.dispatch(method, target, body)
+                except HttpError as e:
+                    status, ctype, payload = e.status, "application/json", _dump({"error": str(e)})
+                except Exception as e:
+                    status, ctype = 500, "application/json"
+                    payload = _dump({"error": f"{type(e).__name__}: {e}"})
+                writer.write(_response(status, ctype, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as e:
+            writer.write(_response(e.status, "application/json", _dump({"error": str(e)}), False))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+
+def _dump(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def _response(status: int, ctype: str, payload: bytes, keep_alive: bool) -> bytes:
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {ctype}\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + payload
+
+
+async def _readline(reader: asyncio.StreamReader, status: int, message: str) -> bytes:
+    # linia dłuższa niż limit StreamReadera: readline rzuca ValueError (LimitOverrunError)
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HttpError(status, message)
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """(method, target, headers, body, keep_alive) albo None przy zamkniętym połączeniu."""
+    line = await _readline(reader, 400, "za długa linia żądania")
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "niepoprawna linia żądania")
+    headers: Dict[str, str] = {}
+    while True:
+        h = await _readline(reader, 431, "za długi nagłówek")
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HttpError(400, "niepoprawny Content-Length")
+    if length > MAX_BODY:
+        raise HttpError(413, "za duże żądanie")
+    body = await reader.readexactly(length) if length else b""
+    conn = headers.get("connection", "").lower()
+    keep_alive = conn != "close" if version == "HTTP/1.1" else conn == "keep-alive"
+    return method.upper(), target, headers, body, keep_alive
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8080, path: str = "mieszkania.csv",
+                compact: bool = False, threads: Optional[int] = None,
+                llm_concurrency: int = DEFAULT_LLM_CONCURRENCY, watch: float = 0.0,
+                ready: Optional[asyncio.Event] = None) -> None:
+    live = LiveDataset(path, compact=compact)
+    if watch > 0:
+        live.watch(watch)
+    service = SearchService(live, threads, llm_concurrency)
+    server = await asyncio.start_server(service.handle, host, port, backlog=512)
+    if ready is not None:
+        ready.set()
+    addrs = ", ".join(str(s.getsockname()) for s in server.sockets)
+    print(f"Asystent API: {addrs} ({len(live.df)} ofert)", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        live.stop()
+        service.close()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Serwis HTTP/JSON: /parse, /search, /answer")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--data", default="mieszkania.csv", help="plik z ofertami")
+    ap.add_argument("--compact", action="store_true", help="kompaktowy układ typów (data.compact_df)")
+    ap.add_argument("--threads", type=int, default=None, help="wątki na parsowanie i ranking")
+    ap.add_argument("--llm-concurrency", type=int, default=DEFAULT_LLM_CONCURRENCY,
+                    help="maks. równoległych odpowiedzi LLM")
+    ap.add_argument("--watch", type=float, default=0.0, help="co ile sekund sprawdzać plik (0 = nie)")
+    ap.add_argument("--metrics", action="store_true", help="włącz engines.metrics (/metrics)")
+    args = ap.parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+    try:
+        asyncio.run(serve(args.host, args.port, args.data, args.compact, args.threads,
+                          args.llm_concurrency, args.watch))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
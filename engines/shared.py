@@ -0,0 +1,139 @@
+"""
+Zbiór ofert współdzielony między procesami serwera.
+
+Jeden proces publikuje znormalizowaną ramkę jako plik Arrow IPC w katalogu
+w pamięci (domyślnie /dev/shm), pozostałe mapują go tylko do odczytu – kolumny
+liczbowe (także float z NaN), kody kategorii i tekst w dtype "str" to widoki na te
+same strony pamięci, bez kopii per proces. Kopiowane są kolumny bool, nullable
+("Int32", "boolean" – także z compact_df) i tekst w dtype object.
+Nowa wersja to nowy plik + atomowa podmiana wskaźnika CURRENT (os.replace);
+publikacje są serializowane blokadą flock, a CURRENT trzyma też odcisk pliku źródłowego.
+"""
+import fcntl
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+
+import pandas as pd
+
+from . import snapshot
+
+SHARED_DIR_ENV = "ASYSTENT_SHM_DIR"
+DEFAULT_SHARED_DIR = "/dev/shm/asystent-mieszkaniowy"
+_POINTER = "CURRENT"
+_LOCK = ".publish.lock"
+# attach_or_publish: tyle razy próbujemy dołączyć, zanim zgłosimy błąd
+ATTACH_ATTEMPTS = 5
+
+
+class SharedDatasetStore:
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or os.getenv(SHARED_DIR_ENV) or DEFAULT_SHARED_DIR)
+        # (wersja, ramka) jedną krotką – wątki czytają zawsze spójną parę
+        self._attached: Tuple[Optional[str], Optional[pd.DataFrame]] = (None, None)
+
+    def _data_path(self, version: str) -> Path:
+        return self.root / f"dataset-{version}.arrow"
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        """Wyłączna blokada publikacji (flock) – współbieżni wydawcy idą po kolei."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / _LOCK, "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _pointer(self) -> Tuple[Optional[str], Optional[str]]:
+        """(wersja, odcisk źródła) z CURRENT; odcisk w drugiej linii, może go nie być."""
+        try:
+            lines = (self.root / _POINTER).read_text().splitlines()
+        except OSError:
+            return None, None
+        version = lines[0].strip() if lines else ""
+        if not version or not self._data_path(version).exists():
+            return None, None
+        return version, (lines[1].strip() or None) if len(lines) > 1 else None
+
+    def current_version(self) -> Optional[str]:
+        return self._pointer()[0]
+
+    def current_source(self) -> Optional[str]:
+        """Odcisk pliku źródłowego, z którego zbudowano bieżącą wersję (None gdy brak)."""
+        return self._pointer()[1]
+
+    def publish(self, df: pd.DataFrame, source: Optional[str] = None) -> str:
+        """
+        Publikuje nową wersję zbioru i zwraca jej identyfikator. `source` to odcisk
+        pliku źródłowego (np. snapshot.source_fingerprint) zapisywany przy wersji.
+        """
+        with self._lock():
+            return self._publish_locked(df, source)
+
+    def _publish_locked(self, df: pd.DataFrame, source: Optional[str]) -> str:
+        version = f"{time.time_ns()}-{os.getpid()}"
+        snapshot.write_frame(df, self._data_path(version))
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            fh.write(f"{version}\n{source or ''}\n")
+        os.replace(tmp, self.root / _POINTER)
+        # Usuwamy tylko pliki, na które CURRENT (czytany ponownie) nie wskazuje.
+        # Procesy, które je zmapowały, zachowują dostęp do stron aż do zamknięcia mapowania.
+        keep = self.current_version()
+        for old in self.root.glob("dataset-*.arrow"):
+            if keep is None or old != self._data_path(keep):
+                old.unlink(missing_ok=True)
+        return version
+
+    def attach_version(
+        self, version: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[pd.DataFrame]]:
+        """
+        (wersja, ramka) dla wersji (domyślnie bieżącej), mapowana tylko do odczytu;
+        (None, None) gdy brak. Gdy plik wersji zdążył zniknąć, mapujemy aktualną –
+        zwrócona wersja to ta faktycznie zmapowana, nie ta, o którą pytano.
+        """
+        version = version or self.current_version()
+        if version is None:
+            return None, None
+        attached = self._attached
+        if attached[0] != version:
+            try:
+                df = snapshot.read_frame(self._data_path(version))
+            except FileNotFoundError:
+                # wersja podmieniona w międzyczasie – bierzemy aktualną
+                return self.attach_version() if version != self.current_version() else (None, None)
+            attached = self._attached = (version, df)
+        return attached
+
+    def attach(self, version: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """Ramka dla wersji (domyślnie bieżącej), mapowana tylko do odczytu; None gdy brak."""
+        return self.attach_version(version)[1]
+
+    def attach_or_publish(
+        self, load: Callable[[], pd.DataFrame], source: Optional[str] = None
+    ) -> Tuple[str, pd.DataFrame]:
+        """
+        (wersja, ramka): dołącza do bieżącej wersji, a gdy jej nie ma albo zbudowano ją
+        z innego pliku (odcisk `source` się nie zgadza) – wczytuje przez `load` i publikuje.
+        Pod blokadą sprawdzamy ponownie, więc równolegle startujące procesy publikują raz.
+        Gdy mimo ATTACH_ATTEMPTS prób nie da się dołączyć – RuntimeError, nigdy None.
+        """
+        for _ in range(ATTACH_ATTEMPTS):
+            current, current_source = self._pointer()
+            if current is not None and (source is None or current_source == source):
+                version, df = self.attach_version(current)
+                # zmapowana wersja mogła zostać podmieniona na inną – sprawdzamy jeszcze raz
+                if df is not None and (version == current or source is None):
+                    return version, df
+                continue
+            with self._lock():
+                current, current_source = self._pointer()
+                if current is None or (source is not None and current_source != source):
+                    self._publish_locked(load(), source)
+        raise RuntimeError(f"nie udało się dołączyć do zbioru w {self.root}")
@@ -0,0 +1,151 @@
+"""
+Binarny snapshot znormalizowanej ramki (Arrow IPC / Feather, bez kompresji).
+Klucz snapshotu to rozmiar, mtime i hash treści pliku źródłowego, więc zmieniony
+CSV nigdy nie trafi na stary snapshot. Odczyt idzie przez memory-map.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Zmieniamy, gdy zmienia się wynik normalize_df – stare snapshoty przestają pasować
+SNAPSHOT_SCHEMA = 3
+CACHE_DIR_ENV = "ASYSTENT_CACHE_DIR"
+SNAPSHOT_ENV = "ASYSTENT_SNAPSHOT"  # "0" wyłącza snapshoty
+
+
+def enabled() -> bool:
+    if os.getenv(SNAPSHOT_ENV, "1") == "0":
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def source_fingerprint(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": h.hexdigest()}
+
+
+def cache_dir(path: str) -> Path:
+    d = os.getenv(CACHE_DIR_ENV)
+    return Path(d) if d else Path(path).resolve().parent / ".cache"
+
+
+def snapshot_path(path: str, fp: Optional[Dict[str, Any]] = None, variant: str = "") -> Path:
+    """`variant` rozróżnia snapshoty tego samego pliku w innym układzie (np. "compact")."""
+    fp = fp or source_fingerprint(path)
+    key = hashlib.blake2b(
+        f"{SNAPSHOT_SCHEMA}|{variant}|{fp['size']}|{fp['mtime_ns']}|{fp['hash']}".encode(),
+        digest_size=10,
+    ).hexdigest()
+    suffix = f"-{variant}" if variant else ""
+    return cache_dir(path) / f"{Path(path).stem}{suffix}-{key}.arrow"
+
+
+def _zero_copy(col, pandas_type: Optional[str]):
+    """
+    Kolumna Arrow → tablica bez kopiowania (widok tylko do odczytu na zmapowany plik)
+    albo None. Dotyczy liczb bez nulli (NaN w float to nie null – patrz write_frame)
+    i kodów kategorii, o ile pandas zapisał zwykły typ numpy (nie nullable "Int32",
+    "boolean" itp.). Tekst w dtype "str" to_pandas i tak zostawia na buforach pliku.
+    """
+    import pyarrow as pa
+
+    if col.num_chunks != 1 or col.null_count:
+        return None
+    chunk = col.chunk(0)
+    if pa.types.is_integer(chunk.type) or pa.types.is_floating(chunk.type):
+        arr = chunk.to_numpy(zero_copy_only=True)
+        return arr if pandas_type in (None, arr.dtype.name) else None
+    if pa.types.is_dictionary(chunk.type) and pandas_type == "categorical":
+        cats = chunk.dictionary.to_pandas()
+        codes = chunk.indices.to_numpy(zero_copy_only=True)
+        return pd.Categorical.from_codes(codes, categories=cats)
+    return None
+
+
+def read_frame(snap: Path) -> pd.DataFrame:
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(str(snap), "r")).read_all()
+    meta = table.schema.pandas_metadata or {}
+    types = {c.get("name"): c.get("pandas_type") if c.get("pandas_type") == "categorical"
+             else c.get("numpy_type") for c in meta.get("columns", [])}
+    cols = {name: _zero_copy(table.column(name), types.get(name)) for name in table.column_names}
+    rest = [name for name, arr in cols.items() if arr is None]
+    if rest:
+        # pozostałe kolumny konwertujemy z metadanymi pandas (zachowują dtype)
+        converted = table.select(rest).to_pandas()
+        for name in rest:
+            cols[name] = converted[name]
+    return pd.DataFrame(cols, copy=False)
+
+
+def write_frame(df: pd.DataFrame, snap: Path) -> None:
+    """Zapis atomowy: plik tymczasowy w tym samym katalogu + os.replace."""
+    import pyarrow as pa
+
+    df = df.reset_index(drop=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # from_pandas zamienia NaN na null, a kolumna z nullami nie da się zmapować bez kopii;
+    # numpy float zapisujemy więc dosłownie (NaN zostaje NaN, jak w ramce)
+    for i, name in enumerate(table.column_names):
+        if isinstance(df[name].dtype, np.dtype) and df[name].dtype.kind == "f":
+            table = table.set_column(i, table.field(i), pa.array(df[name].to_numpy(), from_pandas=False))
+    # jeden chunk na kolumnę – warunek odczytu bez kopiowania
+    table = table.combine_chunks()
+    snap.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=snap.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+        os.replace(tmp, snap)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def load(
+    path: str, fp: Optional[Dict[str, Any]] = None, variant: str = ""
+) -> Optional[pd.DataFrame]:
+    """Ramka ze snapshotu pasującego do `path` albo None (brak/uszkodzony snapshot)."""
+    if not enabled():
+        return None
+    try:
+        snap = snapshot_path(path, fp, variant)
+        return read_frame(snap) if snap.exists() else None
+    except Exception:
+        return None
+
+
+def save(
+    df: pd.DataFrame, path: str, fp: Optional[Dict[str, Any]] = None, variant: str = ""
+) -> Optional[Path]:
+    """Zapisuje snapshot i sprząta stare snapshoty tego samego pliku. Błędy nie są krytyczne."""
+    if not enabled():
+        return None
+    try:
+        snap = snapshot_path(path, fp, variant)
+        write_frame(df, snap)
+        suffix = f"-{variant}" if variant else ""
+        same = re.compile(re.escape(f"{Path(path).stem}{suffix}") + r"-[0-9a-f]{20}\.arrow")
+        for old in snap.parent.glob("*.arrow"):
+            if old != snap and same.fullmatch(old.name):
+                old.unlink(missing_ok=True)
+        return snap
+    except Exception:
+        return None
@@ -0,0 +1,173 @@
+"""
+Deterministyczny generator syntetycznych ofert w formacie mieszkania.csv (do benchmarków).
+
+Miasta i dzielnice z typowymi stawkami najmu za m², metraż zależny od liczby pokoi,
+udogodnienia w różnych zapisach (tak/nie, True/False, „z balkonem”) i odsetek
+zepsutych komórek („1 200 zł”, „3,5 tys”, „brak”, puste), jak w prawdziwych feedach.
+Ten sam `seed` daje zawsze ten sam plik.
+
+    python -m engines.synthetic 100k -o /tmp/mieszkania-100k.csv
+"""
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# miasto → (udział w ofertach, średnia cena najmu zł/m², dzielnice z mnożnikiem ceny)
+CITIES: Dict[str, Tuple[float, float, List[Tuple[str, float]]]] = {
+    "Warszawa": (0.26, 85.0, [("Śródmieście", 1.35), ("Mokotów", 1.15), ("Wola", 1.1), ("Praga-Południe", 0.95),
+                              ("Ursynów", 1.0), ("Bielany", 0.95), ("Targówek", 0.85), ("Bemowo", 0.9)]),
+    "Kraków": (0.18, 70.0, [("Stare Miasto", 1.3), ("Kazimierz", 1.25), ("Krowodrza", 1.05), ("Podgórze", 1.0),
+                            ("Nowa Huta", 0.8), ("Bronowice", 0.95), ("Czyżyny", 0.9)]),
+    "Wrocław": (0.15, 65.0, [("Stare Miasto", 1.25), ("Krzyki", 1.0), ("Fabryczna", 0.9), ("Psie Pole", 0.85),
+                             ("Śródmieście", 1.1), ("Nadodrze", 0.95)]),
+    "Poznań": (0.14, 58.0, [("Jeżyce", 1.1), ("Wilda", 1.0), ("Grunwald", 0.95), ("Łazarz", 0.95),
+                            ("Rataje", 0.9), ("Stare Miasto", 1.2), ("Winogrady", 0.9), ("Piątkowo", 0.85)]),
+    "Gdańsk": (0.12, 68.0, [("Wrzeszcz", 1.1), ("Oliwa", 1.05), ("Śródmieście", 1.25), ("Przymorze", 1.0),
+                            ("Orunia", 0.8), ("Zaspa", 0.95)]),
+    "Łódź": (0.10, 45.0, [("Śródmieście", 1.1), ("Bałuty", 0.85), ("Widzew", 0.9), ("Polesie", 0.95),
+                          ("Górna", 0.85)]),
+    "Lublin": (0.05, 48.0, [("Śródmieście", 1.1), ("Czechów", 0.95), ("Kalinowszczyzna", 0.9), ("Wrotków", 0.9)]),
+}
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+_BOOL_SPELLINGS = {
+    True: np.array(["True", "tak", "Tak", "TAK", "1", "yes"]),
+    False: np.array(["False", "nie", "Nie", "NIE", "0", "brak"]),
+}
+_BOOL_WEIGHTS = np.array([0.55, 0.25, 0.1, 0.04, 0.04, 0.02])
+_TYP_NAJMU = np.array(["dlugoterminowy", "krotkoterminowy", "pokoj"])
+_STANDARD = np.array(["nowe", "dobry", "do odświeżenia", "wysoki"])
+_OPIS = np.array([
+    "Jasne mieszkanie w spokojnej okolicy",
+    "Blisko tramwaju i sklepów",
+    "Po remoncie, w pełni umeblowane",
+    "Widok na park, ciche sąsiedztwo",
+    "Idealne dla studentów, blisko uczelni",
+    "Nowe budownictwo z miejscem postojowym",
+    "Kamienica po rewitalizacji, wysokie sufity",
+])
+
+
+def parse_size(text: str) -> int:
+    """„10k” / „100k” / „1m” albo liczba wierszy."""
+    t = text.strip().lower()
+    if t in SIZES:
+        return SIZES[t]
+    mult = 1
+    if t.endswith("k"):
+        t, mult = t[:-1], 1_000
+    elif t.endswith("m"):
+        t, mult = t[:-1], 1_000_000
+    return int(float(t) * mult)
+
+
+def _bool_text(rng: np.random.Generator, values: np.ndarray, wordy_yes: str, wordy_no: str) -> np.ndarray:
+    out = np.where(
+        values,
+        rng.choice(_BOOL_SPELLINGS[True], len(values), p=_BOOL_WEIGHTS),
+        rng.choice(_BOOL_SPELLINGS[False], len(values), p=_BOOL_WEIGHTS),
+    ).astype(object)
+    # część ofert z opisowym zapisem („z balkonem” / „bez balkonu”)
+    wordy = rng.random(len(values)) < 0.03
+    out[wordy & values] = wordy_yes
+    out[wordy & ~values] = wordy_no
+    return out
+
+
+def _malformed_prices(rng: np.random.Generator, cena: np.ndarray) -> np.ndarray:
+    """Zapisy ceny z feedów: „1 200 zł”, „3,5 tys”, „2.5k”, „brak”, pusta komórka."""
+    kinds = rng.integers(0, 5, len(cena))
+    out = np.empty(len(cena), dtype=object)
+    for i, (c, k) in enumerate(zip(cena, kinds)):
+        if k == 0:
+            out[i] = f"{c:,} zł".replace(",", " ")
+        elif k == 1:
+            out[i] = f"{c / 1000:.1f} tys".replace(".", ",")
+        elif k == 2:
+            out[i] = f"{c / 1000:g}k"
+        elif k == 3:
+            out[i] = "brak"
+        else:
+            out[i] = ""
+    return out
+
+
+def generate_listings(rows: int, seed: int = 0, malformed: float = 0.01) -> pd.DataFrame:
+    """Surowe oferty (kolumny jak w mieszkania.csv + miasto), przed normalize_df."""
+    rng = np.random.default_rng(seed)
+    names = list(CITIES)
+    shares = np.array([CITIES[c][0] for c in names])
+    city_idx = rng.choice(len(names), rows, p=shares / shares.sum())
+
+    miasto = np.array(names, dtype=object)[city_idx]
+    lokalizacja = np.empty(rows, dtype=object)
+    base = np.empty(rows)
+    for i, name in enumerate(names):
+        sel = np.flatnonzero(city_idx == i)
+        if not len(sel):
+            continue
+        _, rate, districts = CITIES[name]
+        d = rng.integers(0, len(districts), len(sel))
+        lokalizacja[sel] = np.array([x[0] for x in districts], dtype=object)[d]
+        base[sel] = rate * np.array([x[1] for x in districts])[d]
+
+    pokoje = rng.choice([1, 2, 3, 4, 5], rows, p=[0.22, 0.38, 0.27, 0.1, 0.03])
+    metraz = np.clip(rng.lognormal(np.log(14 + 17 * pokoje), 0.18), 12, 250).round(0)
+    cena_m2 = base * rng.lognormal(0, 0.15, rows) * np.where(metraz < 30, 1.15, 1.0)
+    cena = (np.round(cena_m2 * metraz / 50) * 50).astype(np.int64)
+    pietro = rng.choice(np.arange(0, 11), rows, p=[0.14, 0.16, 0.15, 0.14, 0.12, 0.09, 0.06, 0.05, 0.04, 0.03, 0.02])
+    winda = rng.random(rows) < np.clip(0.15 + 0.12 * pietro, 0, 0.97)
+    balkon = rng.random(rows) < 0.6
+
+    df = pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "miasto": miasto,
+        "lokalizacja": lokalizacja,
+        "pokoje": pokoje.astype(object),
+        "metraz": metraz.astype(object),
+        "pietro": pietro,
+        "winda": _bool_text(rng, winda, "z windą", "bez windy"),
+        "balkon": _bool_text(rng, balkon, "z balkonem", "bez balkonu"),
+        "typ_najmu": rng.choice(_TYP_NAJMU, rows, p=[0.8, 0.12, 0.08]),
+        "cena": cena.astype(object),
+        "standard": rng.choice(_STANDARD, rows),
+        "dostepne_od": (np.datetime64("2025-09-01") + rng.integers(0, 180, rows)).astype(str),
+        "opis": rng.choice(_OPIS, rows),
+    })
+
+    # Zepsute komórki: ceny w zapisie tekstowym, metraż z przecinkiem, braki
+    if malformed > 0:
+        bad = np.flatnonzero(rng.random(rows) < malformed)
+        df.loc[bad, "cena"] = _malformed_prices(rng, cena[bad])
+        bad = np.flatnonzero(rng.random(rows) < malformed)
+        df.loc[bad, "metraz"] = [f"{m:g}".replace(".", ",") + " m²" for m in metraz[bad] + 0.5]
+        bad = np.flatnonzero(rng.random(rows) < malformed / 2)
+        df.loc[bad, "pokoje"] = None
+        bad = np.flatnonzero(rng.random(rows) < malformed / 2)
+        df.loc[bad, "lokalizacja"] = None
+    return df
+
+
+def write_csv(path: str, rows: int, seed: int = 0, malformed: float = 0.01) -> str:
+    """Zapisuje oferty jak mieszkania.csv (separator ';', UTF-8)."""
+    generate_listings(rows, seed, malformed).to_csv(path, sep=";", index=False)
+    return path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generator syntetycznych ofert (CSV jak mieszkania.csv)")
+    ap.add_argument("size", help="liczba wierszy: 10k, 100k, 1m albo liczba")
+    ap.add_argument("-o", "--output", required=True)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--malformed", type=float, default=0.01, help="odsetek zepsutych komórek")
+    args = ap.parse_args(argv)
+    rows = parse_size(args.size)
+    write_csv(args.output, rows, args.seed, args.malformed)
+    print(f"{rows} ofert → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Pełnotekstowa trafność opisów ofert (kolumna `opis`): indeks odwrócony + BM25.
+
+Tokeny po norm_text z lekkim stemmingiem (odcięcie jednej końcówki fleksyjnej:
+„zielonej okolicy” i „zielona okolica” → „zielon okolic”). Listy postingów są
+rzadkie i kluczowane id oferty, więc indeks aktualizuje się deltą (add/remove,
+jak MarketAggregates) bez przeliczania całego zbioru. Wszystko lokalnie, bez
+usług zewnętrznych.
+"""
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .utils import norm_text
+
+_TOKEN_RE = re.compile(r"\w+")
+MIN_STEM_LEN = 3
+# Końcówki po norm_text (bez ogonków), najdłuższe najpierw
+_ENDINGS = tuple(sorted(
+    ["ach", "ami", "ego", "emu", "ich", "ych", "imi", "ymi", "iem", "owi", "ow", "om", "em",
+     "ej", "ia", "ie", "iu", "im", "ym", "a", "e", "i", "o", "u", "y"],
+    key=len, reverse=True,
+))
+# Rdzenie bez wartości dla trafności opisu (spójniki, słowa obecne w każdym zapytaniu)
+STOP_STEMS = frozenset({
+    "dla", "lub", "bez", "przy", "oraz", "albo", "jest", "sie", "pod", "nad", "ten", "tak",
+    "mieszkan", "pokoj", "pokoi", "pietr", "parter", "metr", "metraz", "cen",
+    "najtansz", "najdrozsz", "najwieksz", "najmniejsz", "rosnac", "malejac",
+    "tys", "mln", "pln",
+})
+
+K1 = 1.2
+B = 0.75
+
+
+def stem(tok: str) -> str:
+    for end in _ENDINGS:
+        if tok.endswith(end) and len(tok) - len(end) >= MIN_STEM_LEN:
+            return tok[: -len(end)]
+    return tok
+
+
+def terms(text: Any) -> List[str]:
+    """Rdzenie tokenów tekstu (bez liczb, krótkich słów i STOP_STEMS)."""
+    if not isinstance(text, str):
+        return []
+    out = []
+    for tok in _TOKEN_RE.findall(norm_text(text)):
+        if len(tok) < MIN_STEM_LEN or any(ch.isdigit() for ch in tok):
+            continue
+        s = stem(tok)
+        if s not in STOP_STEMS:
+            out.append(s)
+    return out
+
+
+def query_terms(text: str) -> Optional[Tuple[str, ...]]:
+    """Słowa zapytania istotne dla opisu (oryginalna forma, bez powtórzeń) albo None."""
+    seen, out = set(), []
+    for tok in _TOKEN_RE.findall(norm_text(text)):
+        s = terms(tok)
+        if s and s[0] not in seen:
+            seen.add(s[0])
+            out.append(tok)
+    return tuple(out) or None
+
+
+def _docs(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    ids = df["id"].to_numpy() if "id" in df.columns else np.arange(len(df))
+    texts = df["opis"].astype(object).to_numpy() if "opis" in df.columns else np.full(len(df), None)
+    return ids, texts
+
+
+def _counted(texts: np.ndarray) -> Tuple[np.ndarray, List[Counter]]:
+    """Kody opisów i Counter rdzeni liczony raz na unikalny opis (feedy dużo powtarzają)."""
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object), use_na_sentinel=True)
+    return codes, [Counter(terms(t)) for t in uniques]
+
+
+class TextIndex:
+    """
+    BM25 po opisach. scores(terms, ids) liczy trafność tylko dla podanych ofert
+    (kandydatów po filtrach) – koszt rośnie z listami postingów terminów zapytania.
+    Po zbudowaniu indeksu nie zmieniamy w miejscu (współdzielą go wątki) – delta idzie na copy().
+    """
+
+    def __init__(self, df: Optional[pd.DataFrame] = None):
+        self._postings: Dict[str, Dict[Any, int]] = {}
+        self._lengths: Dict[Any, int] = {}
+        self._total = 0
+        self._weights: Dict[str, Tuple[pd.Index, np.ndarray]] = {}
+        if df is not None:
+            self.add(df)
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    @property
+    def avgdl(self) -> float:
+        return self._total / len(self._lengths) if self._lengths else 0.0
+
+    def add(self, df: pd.DataFrame) -> None:
+        """Dokłada oferty (id, opis); istniejące id najpierw usuń przez remove()."""
+        ids, texts = _docs(df)
+        codes, counted = _counted(texts)
+        for doc_id, code in zip(ids.tolist(), codes.tolist()):
+            tf = counted[code] if code >= 0 else {}
+            self._lengths[doc_id] = n = sum(tf.values())
+            self._total += n
+            for term, c in tf.items():
+                self._postings.setdefault(term, {})[doc_id] = c
+        self._weights.clear()
+
+    def remove(self, df: pd.DataFrame) -> None:
+        """Usuwa oferty – `df` to wiersze w wersji sprzed zmiany (z ich starym opisem)."""
+        ids, texts = _docs(df)
+        codes, counted = _counted(texts)
+        for doc_id, code in zip(ids.tolist(), codes.tolist()):
+            n = self._lengths.pop(doc_id, None)
+            if n is None:
+                continue
+            self._total -= n
+            for term in (counted[code] if code >= 0 else ()):
+                plist = self._postings.get(term)
+                if plist is not None:
+                    plist.pop(doc_id, None)
+                    if not plist:
+                        del self._postings[term]
+        self._weights.clear()
+
+    def copy(self) -> "TextIndex":
+        other = TextIndex()
+        other._postings = {t: dict(p) for t, p in self._postings.items()}
+        other._lengths = dict(self._lengths)
+        other._total = self._total
+        return other
+
+    def _term_weights(self, term: str) -> Optional[Tuple[pd.Index, np.ndarray]]:
+        """(id ofert, waga BM25) dla terminu – liczone raz do następnej zmiany indeksu."""
+        hit = self._weights.get(term)
+        if hit is not None:
+            return hit
+        plist = self._postings.get(term)
+        if not plist:
+            return None
+        n_docs = len(self._lengths)
+        idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+        ids = list(plist)
+        tf = np.fromiter(plist.values(), dtype=float, count=len(ids))
+        dl = np.fromiter((self._lengths[i] for i in ids), dtype=float, count=len(ids))
+        norm = K1 * (1 - B + B * dl / max(self.avgdl, 1e-9))
+        hit = self._weights[term] = (pd.Index(ids), idf * tf * (K1 + 1) / (tf + norm))
+        return hit
+
+    def scores(self, query: Iterable[str], ids: Sequence[Any]) -> np.ndarray:
+        """BM25 zapytania (słowa albo tekst) dla ofert o podanych id, w ich kolejności."""
+        ids = np.asarray(ids)
+        out = np.zeros(len(ids))
+        if not len(ids):
+            return out
+        wanted = {t for word in query for t in terms(word)}
+        for term in wanted:
+            hit = self._term_weights(term)
+            if hit is None:
+                continue
+            index, weights = hit
+            pos = index.get_indexer(ids)
+            found = pos >= 0
+            out[found] += weights[pos[found]]
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "docs": len(self._lengths),
+            "terms": len(self._postings),
+            "postings": sum(len(p) for p in self._postings.values()),
+            "avgdl": self.avgdl,
+        }
+
+
+def matched_words(query: Iterable[str], text: Any) -> List[str]:
+    """Słowa zapytania, których rdzeń występuje w opisie (do „dlaczego pasuje”)."""
+    have = set(terms(text))
+    return [w for w in query if any(t in have for t in terms(w))]
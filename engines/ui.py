@@ -2,7 +2,8 @@ import streamlit as st
 import pandas as pd
 from typing import Dict, Any, Optional
 from .nl import why_match
-from .utils import pretty_pln, pretty_m2
+from . import metrics
+from .utils import pretty_pln, pretty_m2, is_missing, truthy
 
 
 def render_offer_card(
@@ -23,14 +24,14 @@ def render_offer_card(
             st.metric("Metraż", pretty_m2(r.get("metraz")))
         with cols[3]:
             st.metric(
-                "Pokoje", int(r.get("pokoje")) if r.get("pokoje") is not None else "-"
+                "Pokoje", int(r.get("pokoje")) if not is_missing(r.get("pokoje")) else "-"
             )
         with cols[4]:
             st.metric(
-                "Piętro", int(r.get("pietro")) if r.get("pietro") is not None else "-"
+                "Piętro", int(r.get("pietro")) if not is_missing(r.get("pietro")) else "-"
             )
         st.caption(
-            f"Balkon: {'tak' if r.get('balkon') else 'nie'} • Winda: {'tak' if r.get('winda') else 'nie'} • Cena/m²: {pretty_pln(r.get('cena_m2')) if r.get('cena_m2') is not None else '-'}"
+            f"Balkon: {'tak' if truthy(r.get('balkon')) else 'nie'} • Winda: {'tak' if truthy(r.get('winda')) else 'nie'} • Cena/m²: {pretty_pln(r.get('cena_m2')) if not is_missing(r.get('cena_m2')) else '-'}"
         )
         if "score" in r:
             st.progress(
@@ -45,7 +46,69 @@ def render_offer_card(
                         st.write("• " + reason)
 
 
-def render_results(df: pd.DataFrame, f: Dict[str, Any], show_why: bool = False):
+# Tyle kart na stronę; resztę wyników widać po przejściu dalej albo w trybie tabeli
+PAGE_SIZE = 10
+
+# Kolumny trybu tabeli (w tej kolejności, o ile są w wynikach)
+_TABLE_COLS = ["id", "miasto", "lokalizacja", "cena", "metraz", "cena_m2", "pokoje",
+               "pietro", "balkon", "winda", "score"]
+
+
+def _table_config(max_score: float = 1.0) -> Dict[str, Any]:
+    """Konfiguracja kolumn; skala paska „Dopasowanie” to najwyższy wynik na liście."""
+    cc = st.column_config
+    return {
+        "id": cc.NumberColumn("ID", format="%d"),
+        "miasto": "Miasto",
+        "lokalizacja": "Lokalizacja",
+        "cena": cc.NumberColumn("Cena", format="%d zł"),
+        "metraz": cc.NumberColumn("Metraż", format="%.0f m²"),
+        "cena_m2": cc.NumberColumn("Cena/m²", format="%.0f zł"),
+        "pokoje": cc.NumberColumn("Pokoje", format="%d"),
+        "pietro": cc.NumberColumn("Piętro", format="%d"),
+        "balkon": cc.CheckboxColumn("Balkon"),
+        "winda": cc.CheckboxColumn("Winda"),
+        "score": cc.ProgressColumn("Dopasowanie", min_value=0.0, max_value=max_score, format="%.2f"),
+    }
+
+
+def render_results_table(df: pd.DataFrame):
+    """Wszystkie wyniki jako jedna tabela (st.dataframe) – bez widżetów per oferta."""
+    table = df[[c for c in _TABLE_COLS if c in df.columns]]
+    kwargs: Dict[str, Any] = {"use_container_width": True, "hide_index": True}
+    if hasattr(st, "column_config"):
+        # wynik nie ma górnej granicy (premie sumują się, np. 8.7) – skalujemy do maksimum
+        top = float(df["score"].max()) if "score" in df.columns and len(df) else 0.0
+        kwargs["column_config"] = _table_config(top if top > 0 else 1.0)
+    st.dataframe(table, **kwargs)
+
+
+def _current_page(count: int, page_size: int, key: str, signature) -> int:
+    """Numer strony (od 1) z session_state; nowa lista wyników wraca na pierwszą stronę."""
+    pages = max(1, -(-count // page_size))
+    page_key, sig_key = f"{key}_page", f"{key}_sig"
+    if st.session_state.get(sig_key) != signature:
+        st.session_state[sig_key] = signature
+        st.session_state[page_key] = 1
+    if pages == 1:
+        return 1
+    page = st.number_input(
+        f"Strona (z {pages})", min_value=1, max_value=pages, step=1, key=page_key
+    )
+    return int(page)
+
+
+def render_results(
+    df: pd.DataFrame,
+    f: Dict[str, Any],
+    show_why: bool = False,
+    page_size: int = PAGE_SIZE,
+    key: str = "results",
+):
+    """
+    Wyniki jako karty (stronicowane po `page_size`) albo jako tabela.
+    Karty – i why_match – liczymy tylko dla bieżącej strony.
+    """
     count = len(df)
     if count == 0:
         st.info(
@@ -53,8 +116,20 @@ def render_results(df: pd.DataFrame, f: Dict[str, Any], show_why: bool = False):
         )
         return
     st.success(f"✅ Znalazłem {count} ofert.")
-    for _, row in df.iterrows():
-        render_offer_card(row, filters=f, show_why=show_why)
+    mode = "Karty"
+    if count > page_size:
+        mode = st.radio("Widok", ["Karty", "Tabela"], horizontal=True, key=f"{key}_mode")
+    with metrics.timer("render"):
+        if mode == "Tabela":
+            render_results_table(df)
+            return
+        ids = tuple(df["id"].tolist()) if "id" in df.columns else count
+        page = _current_page(count, page_size, key, hash(ids))
+        start = (page - 1) * page_size
+        for r in df.iloc[start:start + page_size].to_dict("records"):
+            render_offer_card(r, filters=f, show_why=show_why)
+        if count > page_size:
+            st.caption(f"Oferty {start + 1}–{min(start + page_size, count)} z {count}")
 
 
 def render_debug(filters: Dict[str, Any]):
@@ -62,6 +137,20 @@ def render_debug(filters: Dict[str, Any]):
         st.json({k: v for k, v in filters.items() if v is not None})
 
 
+def render_metrics():
+    """Panel czasów etapów (p50/p90/p99) i liczników wierszy – tylko przy włączonych metrykach."""
+    if not metrics.enabled():
+        return
+    snap = metrics.snapshot()
+    with st.expander("📈 Metryki etapów", expanded=False):
+        if snap["stages"]:
+            table = pd.DataFrame.from_dict(snap["stages"], orient="index")
+            st.dataframe(table.round(3), use_container_width=True)
+        if snap["last"]:
+            st.caption("Ostatnie zapytanie: " + ", ".join(f"{k}={v:g}" for k, v in snap["last"].items()))
+        st.code(metrics.to_prometheus(), language="text")
+
+
 def render_primary_offer(
     row: pd.Series | Dict[str, Any],
     context: Optional[Dict[str, Any]],
@@ -135,7 +224,7 @@ def render_roommate_alternatives(df: pd.DataFrame, filters: Dict[str, Any]):
                 st.metric("Cena całość", pretty_pln(r.get("cena")))
             with cols[2]:
                 st.metric(
-                    "Pokoje", int(r.get("pokoje")) if r.get("pokoje") is not None else "-"
+                    "Pokoje", int(r.get("pokoje")) if not is_missing(r.get("pokoje")) else "-"
                 )
             with cols[3]:
                 st.metric(
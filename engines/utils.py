@@ -1,6 +1,12 @@
 import re
 import unicodedata
 from typing import Optional, Tuple, Any
+import numpy as np
+import pandas as pd
+
+_RE_NUMBER = re.compile(r"(\d+(?:\.\d+)?)")
+_RE_MLN = re.compile(r"(?:mln|mili|m\b)")
+_RE_TYS = re.compile(r"(?:tys|k\b)")
 
 
 def strip_accents(text: str) -> str:
@@ -22,13 +28,13 @@ def to_int_safe(x, default: Optional[int] = None) -> Optional[int]:
         if isinstance(x, (int, float)):
             return int(round(float(x)))
         s = str(x).strip().replace(" ", "").replace("\u00a0", "").replace(",", ".")
-        m = re.search(r"(\d+(?:\.\d+)?)", s)
+        m = _RE_NUMBER.search(s)
         if not m:
             return default
         num = float(m.group(1))
-        if re.search(r"(mln|mili|m\b)", s):
+        if _RE_MLN.search(s):
             num *= 1_000_000
-        elif re.search(r"(tys|k\b)", s):
+        elif _RE_TYS.search(s):
             num *= 1_000
         return int(round(num))
     except Exception:
@@ -67,6 +73,62 @@ def norm_bool(val) -> Optional[bool]:
     return None
 
 
+def norm_bool_series(series: pd.Series) -> pd.Series:
+    """
+    norm_bool dla całej kolumny: funkcję wołamy raz na unikalną wartość (w kolumnach
+    tak/nie jest ich kilka), wiersze dostają wynik przez tablicę kodów. Braki → None.
+    Kolumna bez None wychodzi jako bool, z None jako object (jak .map(norm_bool)).
+    """
+    codes, uniques = pd.factorize(series)
+    lookup = np.array([norm_bool(u) for u in uniques] + [None], dtype=object)
+    vals = lookup[codes]
+    if len(vals) and not any(v is None for v in lookup[np.unique(codes)]):
+        vals = vals.astype(bool)
+    return pd.Series(vals, index=series.index, name=series.name)
+
+
+def to_int_series(series: pd.Series) -> pd.Series:
+    """
+    to_int_safe dla całej kolumny (metody .str zamiast pętli): "1 200 zł" → 1200,
+    "900k" → 900000, "1,2 mln" → 1200000. Wynik float64, NaN tam gdzie to_int_safe daje None
+    (także tekst bez liczby: "parter", "brak").
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return pd.Series(np.round(series.to_numpy(dtype=float, na_value=np.nan)), index=series.index, name=series.name)
+    # Liczymy na unikalnych wartościach (ceny w feedach mocno się powtarzają),
+    # napisy metodami .str, pozostałe (liczby w kolumnie object) jak w to_int_safe
+    codes, uniques = pd.factorize(series)
+    u = pd.Series(uniques, dtype=object)
+    vals = np.full(len(u) + 1, np.nan)
+    is_str = u.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    if is_str.any():
+        s = (
+            u[is_str].str.strip()
+            .str.replace(" ", "", regex=False)
+            .str.replace("\u00a0", "", regex=False)
+            .str.replace(",", ".", regex=False)
+        )
+        num = s.str.extract(_RE_NUMBER, expand=False).astype(float)
+        mult = np.where(
+            s.str.contains(_RE_MLN), 1_000_000.0, np.where(s.str.contains(_RE_TYS), 1_000.0, 1.0)
+        )
+        vals[:-1][is_str] = np.round(num.to_numpy(dtype=float, na_value=np.nan) * mult)
+    for i in np.flatnonzero(~is_str):
+        v = to_int_safe(u[i])
+        vals[i] = np.nan if v is None else v
+    return pd.Series(vals[codes], index=series.index, name=series.name)
+
+
+def is_missing(v) -> bool:
+    """None, NaN albo pd.NA (kolumny nullable w układzie kompaktowym)."""
+    return v is None or v is pd.NA or (isinstance(v, float) and v != v)
+
+
+def truthy(v) -> bool:
+    """bool(v), ale brak wartości (też pd.NA) to False zamiast wyjątku."""
+    return False if is_missing(v) else bool(v)
+
+
 def safe_range(min_v, max_v) -> Optional[Tuple[Optional[float], Optional[float]]]:
     if min_v is None and max_v is None:
         return None
@@ -0,0 +1,41 @@
+import pytest
+
+from engines import data, snapshot
+from engines.batch import parse_line, run_batch
+from engines.shared import SHARED_DIR_ENV, SharedDatasetStore
+from engines.synthetic import generate_listings
+
+
+@pytest.mark.skipif(not snapshot.enabled(), reason="wymaga pyarrow")
+def test_run_batch_uses_path_not_dataset_already_in_shared_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("ASYSTENT_CACHE_DIR", str(tmp_path / "cache"))
+    csv = tmp_path / "oferty.csv"
+    generate_listings(60, seed=1, malformed=0).to_csv(csv, index=False)
+    other = data.normalize_df(generate_listings(90, seed=2, malformed=0))
+    other["id"] += 10_000
+    shared = tmp_path / "shm"
+    SharedDatasetStore(str(shared)).publish(other)
+    monkeypatch.setenv(SHARED_DIR_ENV, str(shared))
+
+    items = [{"id": i, "query": "mieszkanie", "top_k": 500} for i in range(4)]
+    out = list(run_batch(items, path=str(csv), workers=2, chunksize=1))
+
+    expected = set(data.load_csv(str(csv))["id"].tolist())
+    assert [r["id"] for r in out] == [0, 1, 2, 3]
+    assert all("error" not in r and set(r["ids"]) == expected for r in out)
+
+
+def test_parse_line_treats_non_object_json_as_query_text():
+    assert parse_line('{"query": "Jeżyce", "top_k": 3}', 0) == {"query": "Jeżyce", "top_k": 3, "id": 0}
+    assert parse_line('"Wilda"', 1) == {"query": "Wilda", "id": 1}
+    assert parse_line("Wilda do 3000", 2) == {"query": "Wilda do 3000", "id": 2}
+    for n, line in enumerate(["42", "[1, 2]", "null", "true"], start=3):
+        assert parse_line(line, n) == {"query": line, "id": n}
+    assert parse_line("   ", 9) is None
+
+
+def test_run_batch_survives_non_object_json_lines():
+    items = [parse_line(line, n) for n, line in enumerate(["42", "null", '"Jeżyce"'])]
+    out = list(run_batch(items, path="mieszkania.csv", workers=1))
+    assert [r["id"] for r in out] == [0, 1, 2]
+    assert all("error" not in r for r in out)
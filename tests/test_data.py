@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from engines import data
+from engines.utils import norm_bool, norm_bool_series, to_int_safe, to_int_series
+
+
+def test_normalize_df_text_cells_in_numeric_columns_become_nan():
+    raw = pd.DataFrame({
+        "id": [1, 2, 3, 4],
+        "cena": ["2500", "1 150 zł", "900k", None],
+        "pokoje": ["2", "3 pokoje", "1", "x"],
+        "pietro": ["4", "parter", "10", "2"],
+        "metraz": ["48.5", "50 m2", "", "31"],
+    })
+    df = data.normalize_df(raw)
+    # jak pd.to_numeric(errors="coerce"): liczby w napisach tak, „1 150 zł” / „900k” → NaN
+    np.testing.assert_array_equal(df["cena"], [2500, np.nan, np.nan, np.nan])
+    np.testing.assert_array_equal(df["pokoje"], [2, np.nan, 1, np.nan])
+    np.testing.assert_array_equal(df["pietro"], [4, np.nan, 10, 2])
+    np.testing.assert_array_equal(df["metraz"], [48.5, np.nan, np.nan, 31])
+
+
+def test_norm_bool_series_matches_norm_bool():
+    values = pd.Series(["tak", "Nie", "TAK", None, "1", "0", "true", "brak", np.nan, "tak"], dtype=object)
+    expected = [norm_bool(v) if pd.notna(v) else None for v in values]
+    assert norm_bool_series(values).tolist() == expected
+    assert norm_bool_series(pd.Series(["tak", "nie"])).dtype == bool
+
+
+def test_to_int_series_matches_to_int_safe():
+    values = pd.Series(
+        ["2500", "1 150 zł", "900k", "1,2 mln", "3 tys.", "parter", "brak", "", None, np.nan,
+         "48.5 m2", "\u00a01\u00a0200", 7, 2.5, True, "2500"],
+        dtype=object,
+    )
+    expected = [np.nan if (v := to_int_safe(x)) is None else float(v) for x in values]
+    np.testing.assert_array_equal(to_int_series(values), expected)
+    floats = pd.Series([1.4, np.nan, 2.6])
+    np.testing.assert_array_equal(to_int_series(floats), [1.0, np.nan, 3.0])
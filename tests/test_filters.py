@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from engines import data, filters
+from engines.synthetic import generate_listings
+from engines.utils import norm_text
+
+
+def _reference_positions(df: pd.DataFrame, f) -> np.ndarray:
+    m = np.ones(len(df), dtype=bool)
+    for col in ["miasto", "lokalizacja"]:
+        if f.get(col):
+            vals = df[col].astype(object).where(df[col].notna(), "")
+            m &= (vals.map(lambda v: norm_text(str(v))) == norm_text(f[col])).to_numpy()
+    for col, key in [("cena", "cena_range"), ("metraz", "metraz_range"),
+                     ("pokoje", "pokoje_range"), ("pietro", "pietro_range")]:
+        rng = f.get(key)
+        if rng:
+            vals = pd.to_numeric(df[col], errors="coerce")
+            if rng[0] is not None:
+                m &= (vals >= rng[0]).to_numpy()
+            if rng[1] is not None:
+                m &= (vals <= rng[1]).to_numpy()
+    return np.flatnonzero(m)
+
+
+def test_index_path_keeps_text_filters_without_norm_columns():
+    # Ramka bez kolumn *_norm (nie z normalize_df): indeks obsłuży tylko zakresy,
+    # miasto musi zostać sprawdzone osobno
+    raw = generate_listings(20_000, seed=1, malformed=0)
+    df = raw.assign(
+        cena=pd.to_numeric(raw["cena"]),
+        metraz=pd.to_numeric(raw["metraz"]),
+        pokoje=pd.to_numeric(raw["pokoje"]),
+    )
+    assert len(df) >= filters.INDEX_MIN_ROWS
+    assert not any(c.endswith("_norm") for c in df.columns)
+
+    f = {"miasto": "Warszawa", "pokoje_range": (2, 3)}
+    pos = filters.filter_positions(df, f)
+    assert set(df["miasto"].iloc[pos]) == {"Warszawa"}
+    np.testing.assert_array_equal(pos, _reference_positions(df, f))
+
+    rng = np.random.default_rng(0)
+    cities = df["miasto"].unique().tolist()
+    locs = df["lokalizacja"].dropna().unique().tolist()
+    for _ in range(50):
+        f = {
+            "miasto": rng.choice(cities) if rng.random() < 0.5 else None,
+            "lokalizacja": rng.choice(locs) if rng.random() < 0.5 else None,
+            "cena_range": (int(rng.integers(1000, 4000)), None) if rng.random() < 0.5 else None,
+            "pokoje_range": (1, int(rng.integers(1, 5))) if rng.random() < 0.5 else None,
+        }
+        np.testing.assert_array_equal(filters.filter_positions(df, f), _reference_positions(df, f))
+
+
+def test_index_path_matches_scan_on_normalized_frame():
+    df = data.normalize_df(generate_listings(20_000, seed=2))
+    f = {"miasto": "Kraków", "lokalizacja": "Kazimierz", "metraz_range": (30, 60)}
+    np.testing.assert_array_equal(filters.filter_positions(df, f), _reference_positions(df, f))
+
+
+def _frame_with_cheap_rows(rows: int, cheap: int) -> pd.DataFrame:
+    """Oferty z ceną ≥ 2000 zł poza `cheap` wierszami po 500 zł (kandydaci filtru cena ≤ 1000)."""
+    df = data.normalize_df(generate_listings(rows, seed=0, malformed=0))
+    cena = np.maximum(df["cena"].to_numpy(), 2000)
+    cena[np.linspace(0, rows - 1, cheap).astype(int)] = 500
+    return df.assign(cena=cena)
+
+
+def _peak_bytes(df: pd.DataFrame, f) -> int:
+    import tracemalloc
+
+    filters.filter_and_rank(df, f)  # struktury pochodne (indeks) budujemy przed pomiarem
+    tracemalloc.start()
+    try:
+        filters.filter_and_rank(df, f)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_filter_and_rank_memory_scales_with_candidates_not_rows():
+    f = {"cena_range": (None, 1000), "limit": 10, "sort": "score"}
+    small = _peak_bytes(_frame_with_cheap_rows(20_000, 500), f)
+    large = _peak_bytes(_frame_with_cheap_rows(160_000, 500), f)
+    more_candidates = _peak_bytes(_frame_with_cheap_rows(160_000, 8_000), f)
+    # 8× więcej wierszy przy tych samych kandydatach – szczyt pamięci praktycznie ten sam
+    assert large <= small * 1.2 + 16_384
+    # 16× więcej kandydatów – szczyt rośnie
+    assert more_candidates >= large * 4
@@ -0,0 +1,56 @@
+import pytest
+
+from engines import data
+from engines.filters import filter_and_rank
+from engines.gazetteer import Gazetteer, covered_tokens
+from engines.nl import parse_query
+
+LOCATIONS = ["Grunwald", "Jeżyce", "Rataje", "Sołacz", "Stare Miasto", "Wilda", "Łacina", "Łazarz"]
+CITIES = ["Poznań", "Łódź", "Kraków"]
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer(LOCATIONS, CITIES)
+
+
+@pytest.mark.parametrize("query, kind, name", [
+    ("Jeżyce", "lokalizacja", "Jeżyce"),
+    ("na jezycach", "lokalizacja", "Jeżyce"),
+    ("stare miasto", "lokalizacja", "Stare Miasto"),
+    # bez ogonków, także bez „ł” (norm_text go nie zdejmuje)
+    ("solacz", "lokalizacja", "Sołacz"),
+    ("na lazarzu", "lokalizacja", "Łazarz"),
+    ("lacina", "lokalizacja", "Łacina"),
+    ("lodz", "miasto", "Łódź"),
+    ("w poznaniu", "miasto", "Poznań"),
+])
+def test_exact_and_inflected_names_score_one(gazetteer, query, kind, name):
+    assert gazetteer.match(query)[kind] == (name, 1.0)
+
+
+def test_typo_is_fuzzy_below_one(gazetteer):
+    name, score = gazetteer.match("jerzyce")["lokalizacja"]
+    assert name == "Jeżyce" and 0.5 <= score < 1.0
+
+
+def test_single_word_does_not_match_multi_token_name(gazetteer):
+    assert "lokalizacja" not in gazetteer.match("mieszkanie w centrum, miasto")
+    assert "lokalizacja" not in gazetteer.match("stare")
+
+
+def test_covered_tokens_keep_query_form(gazetteer):
+    assert covered_tokens("na łazarzu blisko parku", ["Łazarz"]) == {"łazarzu"}
+
+
+def test_fuzzy_hit_is_a_score_hint_not_a_filter():
+    df = data.load_csv("mieszkania.csv", use_snapshot=False)
+    f = parse_query("mieszkanie rata", gazetteer=data.gazetteer(df))
+    assert f["lokalizacja"] is None and f["lokalizacja_fuzzy"] == "Rataje"
+    assert len(filter_and_rank(df, dict(f, limit=None))) == len(filter_and_rank(df, {"limit": None}))
+
+    f = parse_query("Jerzyce", gazetteer=data.gazetteer(df))
+    assert f["lokalizacja"] is None and f["lokalizacja_fuzzy"] == "Jeżyce"
+    res = filter_and_rank(df, dict(f, limit=None))
+    assert len(res) == len(df)
+    assert (res["lokalizacja"].iloc[: (df["lokalizacja"] == "Jeżyce").sum()] == "Jeżyce").all()
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from engines import answers, data, llm_pool
+from engines.filters import filter_and_rank
+from engines.llm_cache import AnswerCache
+from engines.nl import parse_query
+from engines.synthetic import generate_listings
+
+
+@pytest.fixture
+def stub_llm(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_PROVIDER", "stub")
+    monkeypatch.setenv("LLM_STUB_DELAY", "0")
+    monkeypatch.delenv("LLM_CACHE", raising=False)
+    llm_pool.reset()
+
+    def use(**kwargs):
+        cache = AnswerCache(path=str(tmp_path / "answers.sqlite"), **kwargs)
+        monkeypatch.setattr(answers, "_CACHE", cache)
+        return cache
+
+    yield use
+    llm_pool.reset()
+
+
+@pytest.fixture(scope="module")
+def listings():
+    df = data.normalize_df(generate_listings(300, seed=3))
+
+    def ask(query, **kwargs):
+        f = parse_query(query, gazetteer=data.gazetteer(df))
+        return answers.generate_answer(f, filter_and_rank(df, f), **kwargs)
+
+    return ask
+
+
+def test_memory_hit(stub_llm, listings):
+    cache = stub_llm()
+    text, source = listings("2 pokoje do 3000 zł", dataset_version="v1")
+    assert source == "llm"
+    assert listings("2 pokoje do 3000 zł", dataset_version="v1") == (text, "llm-cache")
+    assert cache.counters["memory_hits"] == 1 and cache.counters["disk_hits"] == 0
+
+
+def test_sqlite_hit_after_new_instance(stub_llm, listings):
+    stub_llm()
+    text, _ = listings("2 pokoje do 3000 zł", dataset_version="v1")
+    cache = stub_llm()  # nowa instancja, pusta pamięć – ten sam plik
+    assert listings("2 pokoje do 3000 zł", dataset_version="v1") == (text, "llm-cache")
+    assert cache.counters["disk_hits"] == 1 and cache.counters["memory_hits"] == 0
+
+
+def test_ttl_expiry(stub_llm, listings):
+    cache = stub_llm(ttl=0.2)
+    listings("2 pokoje do 3000 zł", dataset_version="v1")
+    time.sleep(0.3)
+    assert listings("2 pokoje do 3000 zł", dataset_version="v1")[1] == "llm"
+    # po wygaśnięciu także SQLite nie oddaje wpisu
+    stub_llm(ttl=0.2)
+    time.sleep(0.3)
+    assert listings("2 pokoje do 3000 zł", dataset_version="v1")[1] == "llm"
+    assert cache.counters["misses"] == 2
+
+
+def test_max_rows_evicts_least_recently_used(stub_llm, listings):
+    stub_llm(max_rows=2, memory_size=1)
+    queries = ["1 pokój do 2000 zł", "2 pokoje do 3000 zł", "3 pokoje do 5000 zł"]
+    for q in queries:
+        assert listings(q, dataset_version="v1")[1] == "llm"
+        time.sleep(0.01)
+    stub_llm(max_rows=2, memory_size=1)
+    assert listings(queries[2], dataset_version="v1")[1] == "llm-cache"
+    assert listings(queries[1], dataset_version="v1")[1] == "llm-cache"
+    assert listings(queries[0], dataset_version="v1")[1] == "llm"
+
+
+def test_other_dataset_version_misses(stub_llm, listings):
+    cache = stub_llm()
+    listings("2 pokoje do 3000 zł", dataset_version="v1")
+    assert listings("2 pokoje do 3000 zł", dataset_version="v2")[1] == "llm"
+    assert listings("2 pokoje do 3000 zł", dataset_version="v1")[1] == "llm-cache"
+    assert cache.counters["misses"] == 2
@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from engines import answers, llm_pool
+from engines.llm_pool import HttpChatClient
+
+ANSWER = json.dumps({"choices": [{"message": {"content": "Fake answer ok"}}]}).encode()
+
+
+class _FakeLLM(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions; tryb z server.mode: ok, error, drip (bajt co 0.1 s)."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.server.requests += 1
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.server.mode == "error":
+            self.send_response(500)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+            return
+        if body.get("stream"):
+            lines = [
+                b'data: {"choices": [{"delta": {"content": "Fake answer ok"}}]}\n\n',
+                b"data: [DONE]\n\n",
+            ]
+            out = b"".join(lines)
+            ctype = "text/event-stream"
+        else:
+            out, ctype = ANSWER, "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        if self.server.mode != "drip":
+            self.wfile.write(out)
+            return
+        # każdy odczyt klienta dostaje bajt szybciej niż timeout, ale całość trwa sekundy
+        try:
+            for i in range(len(out)):
+                self.wfile.write(out[i:i + 1])
+                self.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _FakeLLM)
+    srv.daemon_threads = True
+    srv.mode, srv.requests = "ok", 0
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def http_llm(server, monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "http")
+    monkeypatch.setenv("LLM_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setenv("LLM_CACHE", "0")
+    monkeypatch.setenv("LLM_TIMEOUT", "0.5")
+    monkeypatch.setenv("LLM_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("LLM_BREAKER_RESET", "0.3")
+    llm_pool.reset()
+    yield server
+    llm_pool.reset()
+
+
+def _messages():
+    return [{"role": "user", "content": "test"}]
+
+
+@pytest.mark.parametrize("call", ["complete", "stream"])
+def test_deadline_covers_whole_response_not_single_reads(server, call):
+    client = HttpChatClient(f"http://127.0.0.1:{server.server_port}/v1", timeout=0.5)
+
+    def ask():
+        if call == "stream":
+            return "".join(client.stream("m", _messages(), 0.1))
+        return client.complete("m", _messages(), 0.1)
+
+    assert ask() == "Fake answer ok"
+    server.mode = "drip"
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        ask()
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_breaker_opens_on_slow_and_failing_calls_then_recovers(http_llm):
+    server = http_llm
+    state = lambda: answers.llm_status()["state"]
+    assert answers._try_llm("test") == "Fake answer ok" and state() == "closed"
+
+    server.mode = "drip"
+    t0 = time.monotonic()
+    assert answers._try_llm("test") is None
+    assert time.monotonic() - t0 < 1.0
+    server.mode = "error"
+    assert answers._try_llm("test") is None
+    assert state() == "open"
+
+    # otwarty bezpiecznik: od razu fallback, bez żądania do serwera
+    n = server.requests
+    assert answers._try_llm("test") is None and server.requests == n
+
+    server.mode = "ok"
+    time.sleep(0.35)
+    assert state() == "half-open"
+    assert answers._try_llm("test") == "Fake answer ok"
+    assert state() == "closed" and server.requests == n + 1
+
+
+def test_deadline_enforced_for_provider_without_own_timeout(monkeypatch):
+    # stub śpi jak openai/ollama czekające na odpowiedź – klient sam deadline'u nie pilnuje
+    monkeypatch.setenv("LLM_PROVIDER", "stub")
+    monkeypatch.setenv("LLM_STUB_DELAY", "1.0")
+    monkeypatch.setenv("LLM_TIMEOUT", "0.2")
+    monkeypatch.setenv("LLM_CACHE", "0")
+    llm_pool.reset()
+    try:
+        t0 = time.monotonic()
+        assert answers._try_llm("test") is None
+        assert time.monotonic() - t0 < 0.6
+        status = answers.llm_status()
+        assert status["failures"] == 1 and "TimeoutError" in status["last_error"]
+    finally:
+        llm_pool.reset()
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engines import data
+from engines.nl import compute_score, compute_scores
+from engines.synthetic import generate_listings
+
+
+def _random_filters(rng, df):
+    def rng_pair(lo, hi):
+        a = int(rng.integers(lo, hi)) if rng.random() < 0.7 else None
+        b = int(rng.integers(lo, hi)) if rng.random() < 0.7 else None
+        if a is not None and b is not None and a > b:
+            a, b = b, a
+        return (a, b) if rng.random() < 0.8 else None
+
+    cities = df["miasto"].dropna().astype(str).unique().tolist() + ["Nieistniejące"]
+    locs = df["lokalizacja"].dropna().astype(str).unique().tolist()
+    return {
+        "miasto": rng.choice(cities) if rng.random() < 0.5 else None,
+        "lokalizacja": rng.choice(locs) if rng.random() < 0.4 else None,
+        # podpowiedź z dopasowania rozmytego – premia razy podobieństwo
+        "lokalizacja_fuzzy": rng.choice(locs) if rng.random() < 0.3 else None,
+        "lokalizacja_score": round(float(rng.uniform(0.5, 1.0)), 3),
+        "cena_range": rng_pair(500, 8000),
+        "metraz_range": rng_pair(15, 120),
+        "pokoje_range": rng_pair(1, 5),
+        "pietro_range": rng_pair(0, 10),
+        "balkon": [None, True, False][int(rng.integers(0, 3))],
+        "winda": [None, True, False][int(rng.integers(0, 3))],
+    }
+
+
+def _with_missing(df: pd.DataFrame, seed: int) -> pd.DataFrame:
+    """Kolumny object z mieszanką braków: None, NaN i pd.NA."""
+    rng = np.random.default_rng(seed)
+    out = df.copy()
+    for col in ["cena", "metraz", "pokoje", "pietro", "balkon", "winda"]:
+        vals = np.array(out[col].astype(object), dtype=object)
+        holes = rng.random(len(vals)) < 0.15
+        vals[holes] = rng.choice(np.array([None, np.nan, pd.NA], dtype=object), holes.sum())
+        out[col] = pd.Series(vals, index=out.index, dtype=object)
+    return out
+
+
+def _frames():
+    norm = data.normalize_df(generate_listings(1_500, seed=5, malformed=0.05))
+    return {
+        "normalized": norm,
+        "compact": data.compact_df(norm),
+        "object_missing": _with_missing(norm, seed=7),
+    }
+
+
+@pytest.mark.parametrize("layout", ["normalized", "compact", "object_missing"])
+def test_compute_scores_matches_scalar_compute_score(layout):
+    df = _frames()[layout]
+    rows = df.to_dict("records")
+    rng = np.random.default_rng(11)
+    for _ in range(60):
+        f = _random_filters(rng, df)
+        expected = np.array([compute_score(r, f) for r in rows])
+        np.testing.assert_array_equal(compute_scores(df, f), expected, err_msg=str(f))
+        pos = np.sort(rng.choice(len(df), 200, replace=False))
+        np.testing.assert_array_equal(compute_scores(df, f, positions=pos), expected[pos], err_msg=str(f))
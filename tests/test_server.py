@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from engines.live import LiveDataset
+from engines.server import SearchService
+
+
+async def _exchange(raw: bytes) -> bytes:
+    service = SearchService(LiveDataset("mieszkania.csv"), threads=1)
+    server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        out = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return out
+    finally:
+        server.close()
+        await server.wait_closed()
+        service.close()
+
+
+@pytest.mark.parametrize("raw, status", [
+    (b"GET /search?q=" + b"a" * 70_000 + b" HTTP/1.1\r\n\r\n", b"400"),
+    (b"GET /health HTTP/1.1\r\nX-Big: " + b"a" * 70_000 + b"\r\n\r\n", b"431"),
+    (b"POST /search HTTP/1.1\r\nContent-Length: -5\r\n\r\n", b"400"),
+    (b"POST /search HTTP/1.1\r\nContent-Length: abc\r\n\r\n", b"400"),
+])
+def test_malformed_requests_get_error_response(raw, status):
+    out = asyncio.run(_exchange(raw))
+    assert out.startswith(b"HTTP/1.1 " + status + b" ")
+
+
+def test_valid_request_still_served():
+    out = asyncio.run(_exchange(b"GET /search?q=Wilda&top_k=2 HTTP/1.1\r\nConnection: close\r\n\r\n"))
+    assert out.startswith(b"HTTP/1.1 200 OK")
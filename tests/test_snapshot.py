@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engines import data, snapshot
+from engines.shared import SharedDatasetStore
+from engines.synthetic import generate_listings
+
+pytestmark = pytest.mark.skipif(not snapshot.enabled(), reason="wymaga pyarrow")
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_round_trip_keeps_float_gaps_and_text(tmp_path, compact):
+    df = data.normalize_df(generate_listings(3_000, seed=4, malformed=0.05))
+    if compact:
+        df = data.compact_df(df)
+    assert df["metraz"].isna().any()
+    snap = tmp_path / "oferty.arrow"
+    snapshot.write_frame(df, snap)
+    out = snapshot.read_frame(snap)
+    pd.testing.assert_frame_equal(out, df)
+    assert isinstance(out["opis"].array, pd.arrays.ArrowStringArray)
+
+
+def test_read_frame_does_not_copy_floats_with_nan_or_text(tmp_path):
+    import pyarrow as pa
+
+    n = 200_000
+    rng = np.random.default_rng(0)
+    floats = rng.random(n) * 1000
+    floats[::7] = np.nan
+    text = pd.Series([f"opis oferty numer {i}" for i in range(n)], dtype="str")
+    text[::11] = None
+    df = pd.DataFrame({"cena": floats, "metraz": floats / 10, "opis": text})
+    snap = tmp_path / "duze.arrow"
+    snapshot.write_frame(df, snap)
+
+    before = pa.total_allocated_bytes()
+    out = snapshot.read_frame(snap)
+    # kopia kolumn float to 3.2 MB w puli Arrow; mapowanie – praktycznie nic
+    assert pa.total_allocated_bytes() - before < 64 * 1024
+    pd.testing.assert_frame_equal(out, df)
+
+
+def test_attach_version_reports_version_actually_mapped(tmp_path):
+    publisher = SharedDatasetStore(str(tmp_path))
+    first = data.normalize_df(generate_listings(50, seed=1, malformed=0))
+    second = data.normalize_df(generate_listings(70, seed=2, malformed=0))
+    old = publisher.publish(first)
+    new = publisher.publish(second)  # usuwa plik starej wersji
+
+    reader = SharedDatasetStore(str(tmp_path))
+    version, df = reader.attach_version(old)
+    assert version == new and len(df) == len(second)
+    assert reader.attach_version() == (new, df)
+
+
+def test_concurrent_publishers_leave_current_dataset_attachable(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    frames = [data.normalize_df(generate_listings(40 + i, seed=i, malformed=0)) for i in range(6)]
+
+    def run(i):
+        store = SharedDatasetStore(str(tmp_path))
+        store.publish(frames[i], source=f"src-{i}")
+        return store.attach_version()
+
+    with ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(run, range(6)))
+    assert all(df is not None for _, df in results)
+    current = SharedDatasetStore(str(tmp_path)).current_version()
+    assert [p.name for p in tmp_path.glob("dataset-*.arrow")] == [f"dataset-{current}.arrow"]
+
+
+def test_attach_or_publish_republishes_when_source_changes(tmp_path):
+    first = data.normalize_df(generate_listings(50, seed=1, malformed=0))
+    second = data.normalize_df(generate_listings(70, seed=2, malformed=0))
+    loads = []
+
+    def loader(df):
+        return lambda: loads.append(len(df)) or df
+
+    v1, df = SharedDatasetStore(str(tmp_path)).attach_or_publish(loader(first), source="a")
+    assert len(df) == 50
+    # inny proces, ten sam plik źródłowy – tylko dołącza
+    assert SharedDatasetStore(str(tmp_path)).attach_or_publish(loader(second), source="a")[0] == v1
+    v2, df = SharedDatasetStore(str(tmp_path)).attach_or_publish(loader(second), source="b")
+    assert v2 != v1 and len(df) == 70 and loads == [50, 70]
+    assert SharedDatasetStore(str(tmp_path)).current_source() == "b"
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from engines import data
+from engines.answers import _build_prompt
+from engines.filters import TEXT_WEIGHT, filter_and_rank, text_relevance
+from engines.nl import parse_query, why_match
+
+
+def _frame():
+    return data.normalize_df(pd.DataFrame({
+        "id": [1, 2, 3, 4],
+        "miasto": ["Poznań"] * 4,
+        "lokalizacja": ["Jeżyce", "Jeżyce", "Jeżyce", "Wilda"],
+        "cena": [2500, 2500, 2500, 2500],
+        "metraz": [40, 40, 40, 40],
+        "pokoje": [2, 2, 2, 2],
+        "pietro": [1, 1, 1, 1],
+        "balkon": [True, True, True, True],
+        "winda": [False, False, False, False],
+        "opis": [
+            "Mieszkanie na Jeżycach z balkonem",
+            "Cicha okolica blisko parku, balkon",
+            "Balkon od podwórza",
+            "Blisko parku",
+        ],
+    }))
+
+
+def test_opis_terms_skip_words_used_by_parser():
+    g = data.gazetteer(_frame())
+    f = parse_query("mieszkanie dla studenta na Jeżycach z balkonem i windą, blisko parku", gazetteer=g)
+    assert f["lokalizacja"] == "Jeżyce" and f["balkon"] and f["winda"] and f["persona"] == "students"
+    assert f["opis_terms"] == ("blisko", "parku")
+    # odmiana z literówką też jest zużyta przez parser
+    assert parse_query("Jerzyce z balkonem", gazetteer=g)["opis_terms"] is None
+
+
+def test_structured_only_query_gets_no_text_bonus_or_opis_reason():
+    df = _frame()
+    f = parse_query("Jeżyce z balkonem", gazetteer=data.gazetteer(df))
+    res = filter_and_rank(df, f)
+    assert res["score"].nunique() == 1
+    assert not any(r.startswith("Opis:") for r in why_match(res.iloc[0].to_dict(), f))
+    assert "opis_terms" not in _build_prompt(f, res, 3, "zwięzły", "krótka")
+
+
+def test_text_relevance_is_absolute_not_relative_to_best_candidate():
+    df = _frame()
+    f = {"opis_terms": ("blisko", "parku", "cicha", "okolica")}
+    rel = text_relevance(df, f, np.arange(len(df)))
+    assert np.all((rel >= 0) & (rel < 1))
+    assert rel[1] > rel[3] > 0 and rel[0] == rel[2] == 0
+    # najlepszy z kandydatów bez opisu „cichej okolicy” nie dostaje pełnej premii
+    only_weak = text_relevance(df, f, np.array([3]))
+    assert only_weak[0] == rel[3] and TEXT_WEIGHT * only_weak[0] < TEXT_WEIGHT